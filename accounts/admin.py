@@ -2,13 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from import_export.admin import ExportActionModelAdmin, ImportExportModelAdmin
 from django.utils.translation import gettext_lazy as _
-from .models import MyUser, OTP, Author, Teacher, Organizer, Profile
-
-@admin.register(OTP)
-class OTPAdmin(admin.ModelAdmin):
-    list_display = ("__str__", "secret")
-    search_fields = ("email", "phone")
-
+from .models import MyUser, Author, Teacher, Organizer, Profile
 
 class ProfileInline(admin.StackedInline):
     model = Profile
@@ -49,6 +43,10 @@ class MyUserAdmin(UserAdmin, ExportActionModelAdmin, ImportExportModelAdmin):
         ),
     )
     
+    def get_queryset(self, request):
+        # get_roles_display reads every listed user's groups
+        return super().get_queryset(request).prefetch_related('groups')
+
     def get_roles_display(self, obj):
         return ", ".join(obj.get_roles())
     get_roles_display.short_description = 'نقش‌ها'
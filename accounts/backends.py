@@ -1,6 +1,8 @@
 from django.contrib.auth.backends import BaseBackend
 from django.contrib.auth import get_user_model
 
+from .user_cache import get_cached_user
+
 User = get_user_model()
 
 class EmailOrPhoneBackend(BaseBackend):
@@ -19,7 +21,5 @@ class EmailOrPhoneBackend(BaseBackend):
             return None
 
     def get_user(self, user_id):
-        try:
-            return User.objects.get(pk=user_id)
-        except User.DoesNotExist:
-            return None
\ No newline at end of file
+        # Session requests read the user from its cached snapshot
+        return get_cached_user(user_id)
\ No newline at end of file
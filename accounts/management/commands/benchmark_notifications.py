@@ -0,0 +1,96 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand, CommandError
+from redis.exceptions import RedisError
+
+from accounts import notifications
+from accounts.notifications import (
+    StubEmailBackend, StubSMSProvider, build_email, flush_notifications, get_notification_metrics,
+    get_sms_provider, push_notifications, send_sms,
+)
+from core.redis_client import get_redis
+
+# Keys of the benchmark's pending lists, slots and metrics, apart from the
+# real ones so queued messages and counters are never touched
+BENCHMARK_NAMESPACE = 'notifications-benchmark'
+
+
+class Command(BaseCommand):
+    help = ('Measure notification throughput against the stub providers, sending '
+            'one message per call and then in batches')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--channel', choices=['sms', 'email'], default='sms')
+        parser.add_argument('--count', type=int, default=500,
+                            help='Messages to send in each run.')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Threads sending at the same time, like worker processes.')
+        parser.add_argument('--latency', type=float, default=notifications.NOTIFICATION_STUB_LATENCY,
+                            help='Seconds taken by each stub provider call.')
+
+    def check_stub_providers(self, channel):
+        if channel == 'sms' and not isinstance(get_sms_provider(), StubSMSProvider):
+            raise CommandError('Run the SMS benchmark with SMS_PROVIDER=stub')
+        if channel == 'email' and not isinstance(get_connection(), StubEmailBackend):
+            raise CommandError(
+                'Run the email benchmark with EMAIL_BACKEND=accounts.notifications.StubEmailBackend')
+
+    def clear_keys(self):
+        redis = get_redis()
+        keys = list(redis.scan_iter(f"{BENCHMARK_NAMESPACE}:*"))
+        if keys:
+            redis.delete(*keys)
+
+    def handle(self, *args, **options):
+        channel, count, workers = options['channel'], options['count'], options['workers']
+        self.check_stub_providers(channel)
+        notifications.NOTIFICATION_STUB_LATENCY = options['latency']
+        provider = get_sms_provider()
+
+        if channel == 'sms':
+            payloads = [{'phone': f"benchmark-{i}", 'message': 'benchmark'} for i in range(count)]
+
+            def send_one(payload):
+                send_sms(provider, [payload['phone']], payload['message'], BENCHMARK_NAMESPACE)
+        else:
+            payloads = [{'subject': 'benchmark', 'message': 'benchmark',
+                         'recipient_list': [f"benchmark-{i}@example.invalid"], 'html_message': None}
+                        for i in range(count)]
+
+            def send_one(payload):
+                # A new connection per message, like send_mail
+                get_connection().send_messages([build_email(
+                    payload['subject'], payload['message'], payload['recipient_list'])])
+
+        try:
+            self.clear_keys()
+        except RedisError as e:
+            raise CommandError(f"The benchmark needs Redis: {e}")
+
+        try:
+            start = time.monotonic()
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(send_one, payloads))
+            self.report('One message per call', count, time.monotonic() - start)
+
+            push_notifications(channel, payloads, namespace=BENCHMARK_NAMESPACE)
+            notifications._close_email_connection()
+            start = time.monotonic()
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                sent = sum(executor.map(
+                    lambda _: flush_notifications(channel, provider, BENCHMARK_NAMESPACE), range(workers)))
+            elapsed = time.monotonic() - start
+            notifications._close_email_connection()
+            metrics = get_notification_metrics(channel, BENCHMARK_NAMESPACE)
+        finally:
+            self.clear_keys()
+
+        self.report('Batched', sent, elapsed)
+        self.stdout.write(
+            f"  {metrics['batches']} batches, {metrics['average_latency_ms']:.0f}ms average latency")
+
+    def report(self, label, count, elapsed):
+        self.stdout.write(f"{label}: {count} messages in {elapsed:.2f}s, {count / elapsed:.0f} messages/s")
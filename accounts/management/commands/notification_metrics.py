@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from accounts.notifications import CHANNELS, get_notification_metrics, reset_notification_metrics
+
+
+class Command(BaseCommand):
+    help = 'Show how many notifications were sent per channel and their delivery latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='Reset the counters after showing them.')
+
+    def handle(self, *args, **options):
+        for channel in CHANNELS:
+            metrics = get_notification_metrics(channel)
+            self.stdout.write(
+                f"{channel}: {metrics['sent']} sent, {metrics['failed']} failed, "
+                f"{metrics['batches']} batches, {metrics['average_latency_ms']:.0f}ms average latency")
+        if options['reset']:
+            reset_notification_metrics()
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
@@ -0,0 +1,101 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What each process imports before serving its first request or task
+STARTUP_CODE = {
+    'web': (
+        "import django; django.setup()\n"
+        "from django.urls import get_resolver; get_resolver().url_patterns\n"
+    ),
+    'worker': (
+        "from core.celery import app\n"
+        "import django; django.setup()\n"
+        "app.loader.import_default_modules()\n"
+    ),
+}
+
+
+def parse_importtime(output):
+    """[(module, self_us, cumulative_us)] from the stderr of python -X importtime"""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        modules.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return modules
+
+
+class Command(BaseCommand):
+    help = ('Report the imports of a fresh web or Celery process, to track cold start time '
+            'and find modules doing work at import')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=STARTUP_CODE, default='web')
+        parser.add_argument('--limit', type=int, default=15,
+                            help='Rows shown in each section.')
+        parser.add_argument('--json', action='store_true',
+                            help='Print the totals and the slowest modules as JSON, to keep over time.')
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'core.settings')}
+        start = time.monotonic()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE[options['target']]],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        elapsed = time.monotonic() - start
+        if result.returncode:
+            raise CommandError(f"Startup failed:\n{result.stderr[-2000:]}")
+
+        modules = parse_importtime(result.stderr)
+        project_packages = {entry.name for entry in os.scandir(settings.BASE_DIR)
+                            if os.path.isfile(os.path.join(entry.path, '__init__.py'))}
+        project = [module for module in modules if module[0].split('.')[0] in project_packages]
+        by_package = defaultdict(int)
+        for name, self_us, _ in modules:
+            by_package[name.split('.')[0]] += self_us
+
+        limit = options['limit']
+        slowest = sorted(modules, key=lambda module: module[1], reverse=True)[:limit]
+        project_slowest = sorted(project, key=lambda module: module[1], reverse=True)[:limit]
+        packages = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'target': options['target'],
+                'wall_seconds': round(elapsed, 3),
+                'import_seconds': round(sum(module[1] for module in modules) / 1e6, 3),
+                'modules': len(modules),
+                'project_import_seconds': round(sum(module[1] for module in project) / 1e6, 3),
+                'slowest_modules': {name: self_us for name, self_us, _ in slowest},
+                'slowest_packages': dict(packages),
+            }, indent=2))
+            return
+
+        self.stdout.write(
+            f"{options['target']} startup: {elapsed:.2f}s, {len(modules)} modules imported in "
+            f"{sum(module[1] for module in modules) / 1e6:.2f}s")
+
+        # Self time of project modules is their own module-level work, such
+        # as clients built at import
+        self.stdout.write(self.style.MIGRATE_HEADING('\nProject modules by own import time'))
+        for name, self_us, cumulative_us in project_slowest:
+            self.stdout.write(f"{self_us / 1000:9.1f}ms {cumulative_us / 1000:9.1f}ms total  {name}")
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\nPackages by import time'))
+        for name, self_us in packages:
+            marker = '  (project)' if name in project_packages else ''
+            self.stdout.write(f"{self_us / 1000:9.1f}ms  {name}{marker}")
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\nSlowest modules'))
+        for name, self_us, cumulative_us in slowest:
+            self.stdout.write(f"{self_us / 1000:9.1f}ms {cumulative_us / 1000:9.1f}ms total  {name}")
@@ -0,0 +1,16 @@
+# Generated by Django 4.2 on 2026-10-17 06:43
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_teacher_avatar'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='OTP',
+        ),
+    ]
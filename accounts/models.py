@@ -3,6 +3,8 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager, PermissionsMixin
 from django.core.exceptions import ValidationError
 
+from .roles import ROLE_GROUPS, get_user_group_names
+
 
 class MyUserManager(BaseUserManager):
     def create_user(self, email=None, phone=None, username=None, password=None, **extra_fields):
@@ -67,17 +69,42 @@ class MyUser(AbstractUser, PermissionsMixin):
             raise ValidationError("باید یا ایمیل یا شماره تماس وارد شود.")
         return super().clean()
 
+    def get_group_names(self):
+        """
+        Names of the user's groups, loaded once per instance: from prefetched
+        groups when available, otherwise through the shared cache
+        """
+        if not hasattr(self, '_group_names'):
+            prefetched = getattr(self, '_prefetched_objects_cache', {}).get('groups')
+            if prefetched is not None:
+                self._group_names = frozenset(group.name for group in prefetched)
+            else:
+                self._group_names = get_user_group_names(
+                    self.pk, cached=not getattr(self, '_groups_changed', False))
+        return self._group_names
+
+    def clear_group_names(self):
+        # The cached names are only dropped once the change is committed
+        self.__dict__.pop('_group_names', None)
+        self._groups_changed = True
+
+    def get_session_auth_hash(self):
+        # Users loaded from a cached snapshot carry the hash instead of the password
+        if 'password' in self.get_deferred_fields() and hasattr(self, '_session_auth_hash'):
+            return self._session_auth_hash
+        return super().get_session_auth_hash()
+
     def is_teacher(self):
         """Check if user is a teacher"""
-        return self.groups.filter(name='Teachers').exists()
+        return ROLE_GROUPS['teacher'] in self.get_group_names()
 
     def is_organizer(self):
         """Check if user is an organizer"""
-        return self.groups.filter(name='Organizers').exists()
+        return ROLE_GROUPS['organizer'] in self.get_group_names()
 
     def is_author(self):
         """Check if user is an author"""
-        return self.groups.filter(name='Authors').exists()
+        return ROLE_GROUPS['author'] in self.get_group_names()
 
     def get_roles(self):
         """Get all user roles"""
@@ -95,27 +122,6 @@ class MyUser(AbstractUser, PermissionsMixin):
         return roles
 
 
-class OTP(models.Model):
-    email = models.EmailField(null=True, blank=True, verbose_name="ایمیل")
-    phone = models.CharField(
-        max_length=15,
-        null=True,
-        blank=True,
-        verbose_name="شماره تماس",
-        validators=[PHONE_VALIDATOR],
-        help_text="شماره تماس یا با فرمت: 09123456789, یا با فرمت: +989123456789 نوشته شود"
-    )
-    secret = models.CharField(max_length=32)
-    created_at = models.DateTimeField(auto_now_add=True, editable=False)
-
-    class Meta:
-        verbose_name = "رمز‌ یکبار مصرف"
-        verbose_name_plural = "رمز‌های یکبار مصرف"
-
-    def __str__(self):
-        return self.email or self.phone
-
-
 class Profile(models.Model):
     user = models.OneToOneField(
         MyUser, on_delete=models.CASCADE, related_name='profile')
@@ -164,6 +170,9 @@ class Teacher(models.Model):
         return f"{self.first_name} {self.last_name}"
 
     def number_of_courses(self):
+        # Course listings annotate the count to avoid one query per teacher
+        if hasattr(self, 'courses_total'):
+            return self.courses_total
         return self.teaching_courses.count()
 
     def __str__(self):
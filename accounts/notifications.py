@@ -0,0 +1,453 @@
+import json
+import logging
+import os
+import smtplib
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.utils.module_loading import import_string
+from redis.exceptions import RedisError
+
+from core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+SMS_ORIGINATOR = getattr(settings, 'SMS_ORIGINATOR', '+983000505')
+SMS_OTP_PATTERN = getattr(settings, 'SMS_OTP_PATTERN', '4v3jrycm29newaf')
+
+# Bulk messages queued within this many seconds are sent together, up to
+# NOTIFICATION_BATCH_SIZE per provider call or SMTP session
+NOTIFICATION_BATCH_WINDOW = getattr(settings, 'NOTIFICATION_BATCH_WINDOW', 2)
+NOTIFICATION_BATCH_SIZE = getattr(settings, 'NOTIFICATION_BATCH_SIZE', 100)
+# Sends in flight at the same time per provider, across all workers
+NOTIFICATION_PROVIDER_CONCURRENCY = getattr(settings, 'NOTIFICATION_PROVIDER_CONCURRENCY', {
+    'ippanel': 4, 'stub': 4, 'smtp': 2,
+})
+# Delay of every call to the stub providers, to measure the pipeline locally
+NOTIFICATION_STUB_LATENCY = getattr(settings, 'NOTIFICATION_STUB_LATENCY', 0.05)
+# The persistent SMTP connection is reopened after this many idle seconds,
+# before the server drops it
+SMTP_IDLE_TIMEOUT = getattr(settings, 'SMTP_IDLE_TIMEOUT', 60)
+
+MAX_SEND_ATTEMPTS = 3
+# A provider slot is freed after this many seconds if its worker died
+SLOT_LEASE_SECONDS = 60
+SLOT_WAIT_SECONDS = 2
+
+# Bulk channels, and OTP messages sent one by one on their own queue
+CHANNELS = ['email', 'sms', 'otp']
+
+# Prefix of the Redis keys (pending lists, slots, metrics). Benchmarks use
+# their own, so they never touch real messages or counters.
+NAMESPACE = 'notifications'
+
+
+class ProviderBusy(Exception):
+    """All the provider's concurrency slots are taken, the send should be retried"""
+
+
+class PartialDelivery(Exception):
+    """Sending stopped on error after the first `sent` messages were delivered"""
+
+    def __init__(self, sent, error):
+        super().__init__(f"{sent} message(s) sent before: {error}")
+        self.sent = sent
+        self.error = error
+
+
+# SMS providers
+
+class IPPanelSMSProvider:
+    name = 'ippanel'
+
+    def __init__(self):
+        from ippanel import Client
+        self.client = Client(settings.SMS_API_KEY)
+
+    def send(self, recipients, message):
+        return self.client.send(SMS_ORIGINATOR, list(recipients), message, '')
+
+    def send_pattern(self, recipient, pattern, values):
+        return self.client.send_pattern(pattern, SMS_ORIGINATOR, recipient, values)
+
+
+class StubSMSProvider:
+    """Sends nothing, each call takes NOTIFICATION_STUB_LATENCY seconds"""
+    name = 'stub'
+
+    def send(self, recipients, message):
+        time.sleep(NOTIFICATION_STUB_LATENCY)
+        logger.debug(f"Stub SMS to {len(recipients)} recipient(s): {message}")
+        return uuid.uuid4().hex
+
+    def send_pattern(self, recipient, pattern, values):
+        time.sleep(NOTIFICATION_STUB_LATENCY)
+        logger.debug(f"Stub SMS pattern {pattern} to {recipient}: {values}")
+        return uuid.uuid4().hex
+
+
+# Provider classes by name, imported when first used so processes that never
+# send SMS don't load a client or its HTTP stack
+SMS_PROVIDERS = getattr(settings, 'SMS_PROVIDERS', {
+    'ippanel': 'accounts.notifications.IPPanelSMSProvider',
+    'stub': 'accounts.notifications.StubSMSProvider',
+})
+
+_sms_providers = {}
+_sms_providers_pid = None
+_sms_providers_lock = threading.Lock()
+
+
+def get_sms_provider(name=None):
+    """
+    Return the SMS provider called name, SMS_PROVIDER by default. It is
+    created on first use and kept for the life of the process; a forked
+    worker creates its own.
+    """
+    global _sms_providers_pid
+    name = name or getattr(settings, 'SMS_PROVIDER', 'ippanel')
+    with _sms_providers_lock:
+        if _sms_providers_pid != os.getpid():
+            _sms_providers.clear()
+            _sms_providers_pid = os.getpid()
+        if name not in _sms_providers:
+            _sms_providers[name] = import_string(SMS_PROVIDERS[name])()
+        return _sms_providers[name]
+
+
+class StubEmailBackend(BaseEmailBackend):
+    """
+    Email backend sending nothing. Like the SMTP backend it connects for each
+    call unless opened beforehand, connecting takes NOTIFICATION_STUB_LATENCY
+    seconds and each message a tenth of it.
+    """
+    connection = None
+
+    def open(self):
+        if self.connection:
+            return False
+        time.sleep(NOTIFICATION_STUB_LATENCY)
+        self.connection = True
+        return True
+
+    def close(self):
+        self.connection = None
+
+    def send_messages(self, email_messages):
+        new_connection = self.open()
+        for _ in email_messages:
+            time.sleep(NOTIFICATION_STUB_LATENCY / 10)
+        if new_connection:
+            self.close()
+        return len(email_messages)
+
+
+# Provider concurrency limits
+
+# Frees expired leases, then takes a slot when one is free. Returns 1 if taken.
+ACQUIRE_SLOT_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call('ZADD', KEYS[1], ARGV[3], ARGV[4])
+    redis.call('EXPIRE', KEYS[1], ARGV[5])
+    return 1
+end
+return 0
+"""
+
+
+class provider_slot:
+    """
+    Hold one of the provider's NOTIFICATION_PROVIDER_CONCURRENCY slots while
+    sending, raising ProviderBusy if none frees up within SLOT_WAIT_SECONDS.
+    Without Redis the limit is not applied.
+    """
+
+    def __init__(self, provider, namespace=NAMESPACE):
+        self.key = f"{namespace}:slots:{provider}"
+        self.limit = NOTIFICATION_PROVIDER_CONCURRENCY.get(provider)
+        self.token = uuid.uuid4().hex
+        self.acquired = False
+
+    def __enter__(self):
+        if not self.limit:
+            return self
+        deadline = time.monotonic() + SLOT_WAIT_SECONDS
+        try:
+            acquire = get_redis().register_script(ACQUIRE_SLOT_SCRIPT)
+            while True:
+                now = time.time()
+                if acquire(keys=[self.key], args=[
+                        now - SLOT_LEASE_SECONDS, self.limit, now, self.token, SLOT_LEASE_SECONDS]):
+                    self.acquired = True
+                    return self
+                if time.monotonic() >= deadline:
+                    raise ProviderBusy(self.key)
+                time.sleep(0.05)
+        except RedisError as e:
+            logger.warning(f"Provider concurrency limit unavailable: {e}")
+            return self
+
+    def __exit__(self, *exc_info):
+        if self.acquired:
+            try:
+                get_redis().zrem(self.key, self.token)
+            except RedisError as e:
+                logger.warning(f"Could not free provider slot: {e}")
+
+
+# Metrics
+
+def _metrics_key(channel, namespace):
+    return f"{namespace}:metrics:{channel}"
+
+
+METRIC_NAMES = ['sent', 'failed', 'batches', 'latency_ms']
+
+
+def record_delivery(channel, sent=0, failed=0, latency_ms=0, batches=0, namespace=NAMESPACE):
+    try:
+        pipe = get_redis().pipeline()
+        for name, value in (('sent', sent), ('failed', failed),
+                            ('latency_ms', latency_ms), ('batches', batches)):
+            if value:
+                pipe.hincrby(_metrics_key(channel, namespace), name, int(value))
+        pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Could not record {channel} metrics: {e}")
+
+
+def get_notification_metrics(channel, namespace=NAMESPACE):
+    """Counters of a channel since the last reset, with the average delivery latency"""
+    values = get_redis().hmget(_metrics_key(channel, namespace), METRIC_NAMES)
+    metrics = {name: int(value or 0) for name, value in zip(METRIC_NAMES, values)}
+    metrics['average_latency_ms'] = metrics['latency_ms'] / metrics['sent'] if metrics['sent'] else 0
+    return metrics
+
+
+def reset_notification_metrics(*channels, namespace=NAMESPACE):
+    get_redis().delete(*[_metrics_key(channel, namespace) for channel in channels or CHANNELS])
+
+
+# Sending
+
+_email_connection = None
+_email_connection_used_at = 0
+_email_lock = threading.Lock()
+
+
+def _close_email_connection():
+    global _email_connection
+    if _email_connection is not None:
+        try:
+            _email_connection.close()
+        except Exception:
+            pass
+        _email_connection = None
+
+
+def _send_email_message(message):
+    global _email_connection, _email_connection_used_at
+    for attempt in range(2):
+        if _email_connection is None:
+            _email_connection = get_connection(fail_silently=False)
+            _email_connection.open()
+        try:
+            sent = _email_connection.send_messages([message])
+            _email_connection_used_at = time.monotonic()
+            return sent
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            _close_email_connection()
+            if attempt:
+                raise
+
+
+def send_email_messages(messages, namespace=NAMESPACE):
+    """
+    Send email messages one by one over this process' persistent SMTP
+    connection, reconnecting once if the server dropped it. Raises
+    PartialDelivery when a message fails after others were sent.
+    """
+    with _email_lock, provider_slot('smtp', namespace):
+        if time.monotonic() - _email_connection_used_at > SMTP_IDLE_TIMEOUT:
+            _close_email_connection()
+        sent = 0
+        for position, message in enumerate(messages):
+            try:
+                sent += _send_email_message(message)
+            except Exception as e:
+                if position:
+                    raise PartialDelivery(position, e) from e
+                raise
+        return sent
+
+
+def build_email(subject, message, recipient_list, html_message=None):
+    email = EmailMultiAlternatives(subject, message, settings.DEFAULT_FROM_EMAIL, recipient_list)
+    if html_message:
+        email.attach_alternative(html_message, 'text/html')
+    return email
+
+
+def send_sms(provider, recipients, message, namespace=NAMESPACE):
+    with provider_slot(provider.name, namespace):
+        return provider.send(recipients, message)
+
+
+def send_sms_pattern(provider, recipient, pattern, values):
+    with provider_slot(provider.name):
+        return provider.send_pattern(recipient, pattern, values)
+
+
+# Micro-batching
+
+def _pending_key(channel, namespace=NAMESPACE):
+    return f"{namespace}:pending:{channel}"
+
+
+def _scheduled_key(channel):
+    return f"{NAMESPACE}:flush-scheduled:{channel}"
+
+
+def schedule_flush(channel, redis=None):
+    """Queue the channel's flush task unless one is already pending"""
+    from . import tasks
+
+    redis = redis or get_redis()
+    if redis.set(_scheduled_key(channel), 1, nx=True, ex=int(NOTIFICATION_BATCH_WINDOW) + 5 * 60):
+        flush_task = tasks.flush_email_batch if channel == 'email' else tasks.flush_sms_batch
+        flush_task.apply_async(countdown=NOTIFICATION_BATCH_WINDOW)
+
+
+def push_notifications(channel, payloads, redis=None, namespace=NAMESPACE):
+    """Append messages to the channel's pending list without scheduling a flush"""
+    queued_at = time.time()
+    (redis or get_redis()).rpush(_pending_key(channel, namespace), *[
+        json.dumps({**payload, 'queued_at': queued_at, 'attempts': 0}) for payload in payloads
+    ])
+
+
+def queue_notification(channel, payload):
+    """
+    Queue a bulk message for the next batch of its channel. Returns False
+    when Redis is unavailable and the caller has to send it on its own.
+    """
+    try:
+        redis = get_redis()
+        push_notifications(channel, [payload], redis)
+        schedule_flush(channel, redis)
+    except RedisError as e:
+        logger.warning(f"Notification batching unavailable: {e}")
+        return False
+    return True
+
+
+def queue_email(subject, message, recipient_list, html_message=None):
+    """Send a bulk email with the next email batch"""
+    payload = {'subject': subject, 'message': message,
+               'recipient_list': recipient_list, 'html_message': html_message}
+    if not queue_notification('email', payload):
+        from .tasks import send_email_task
+        send_email_task.delay(subject, message, recipient_list, html_message)
+
+
+def queue_sms(phone_number, message):
+    """Send a bulk SMS with the next SMS batch, identical texts share one provider call"""
+    if not queue_notification('sms', {'phone': phone_number, 'message': message}):
+        from .tasks import send_sms_task
+        send_sms_task.delay(phone_number, message)
+
+
+# Batch senders return the payloads left unsent and the error that stopped them
+
+def _send_email_batch(payloads, provider, namespace):
+    try:
+        send_email_messages([
+            build_email(payload['subject'], payload['message'],
+                        payload['recipient_list'], payload['html_message'])
+            for payload in payloads
+        ], namespace)
+    except PartialDelivery as e:
+        return payloads[e.sent:], e.error
+    except Exception as e:
+        return payloads, e
+    return [], None
+
+
+def _send_sms_batch(payloads, provider, namespace):
+    payloads_by_message = defaultdict(list)
+    for payload in payloads:
+        payloads_by_message[payload['message']].append(payload)
+    unsent, error = [], None
+    for message, group in payloads_by_message.items():
+        if error is None:
+            try:
+                send_sms(provider, [payload['phone'] for payload in group], message, namespace)
+                continue
+            except Exception as e:
+                error = e
+        # Groups after a failure are kept for the next flush as well
+        unsent += group
+    return unsent, error
+
+
+BATCH_SENDERS = {
+    'email': _send_email_batch,
+    'sms': _send_sms_batch,
+}
+
+
+def flush_notifications(channel, provider=None, namespace=NAMESPACE):
+    """
+    Send the channel's queued messages in batches of NOTIFICATION_BATCH_SIZE.
+
+    Messages of a batch that were not sent are queued again and retried by
+    the next flush, up to MAX_SEND_ATTEMPTS times. Returns the number of
+    messages sent. Only the default namespace has a flush task scheduled.
+    """
+    redis = get_redis()
+    if namespace == NAMESPACE:
+        # Messages queued from now on schedule a new flush
+        redis.delete(_scheduled_key(channel))
+    sent = 0
+    while True:
+        items = redis.lpop(_pending_key(channel, namespace), NOTIFICATION_BATCH_SIZE)
+        if not items:
+            break
+        payloads = [json.loads(item) for item in items]
+        unsent, error = BATCH_SENDERS[channel](payloads, provider, namespace)
+
+        unsent_ids = {id(payload) for payload in unsent}
+        delivered = [payload for payload in payloads if id(payload) not in unsent_ids]
+        if delivered:
+            now = time.time()
+            record_delivery(channel, sent=len(delivered), batches=1,
+                            latency_ms=sum((now - payload['queued_at']) * 1000 for payload in delivered),
+                            namespace=namespace)
+            sent += len(delivered)
+
+        if error is not None:
+            busy = isinstance(error, ProviderBusy)
+            retried = [payload for payload in unsent
+                       if busy or payload['attempts'] + 1 < MAX_SEND_ATTEMPTS]
+            for payload in retried:
+                payload['attempts'] += 0 if busy else 1
+            if retried:
+                redis.lpush(_pending_key(channel, namespace),
+                            *[json.dumps(payload) for payload in reversed(retried)])
+                if namespace == NAMESPACE:
+                    schedule_flush(channel, redis)
+            record_delivery(channel, failed=len(unsent) - len(retried), namespace=namespace)
+            logger.error(
+                f"Failed to send {len(unsent)} of {len(payloads)} {channel} message(s), "
+                f"{len(retried)} queued again: {error}")
+            break
+
+        if len(items) < NOTIFICATION_BATCH_SIZE:
+            break
+    return sent
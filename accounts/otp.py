@@ -0,0 +1,163 @@
+import hashlib
+import hmac
+import secrets
+import time
+import uuid
+
+from django.conf import settings
+
+from core.redis_client import get_redis
+
+# Lifetime of a one-time password, as told in the OTP email
+OTP_TTL = getattr(settings, 'OTP_TTL', 10 * 60)
+OTP_DIGITS = 6
+# Wrong codes accepted before the OTP is discarded
+OTP_MAX_ATTEMPTS = getattr(settings, 'OTP_MAX_ATTEMPTS', 5)
+
+# {action: {scope: (requests, window in seconds)}}, sliding windows per
+# identifier (email or phone) and per client IP
+OTP_RATE_LIMITS = getattr(settings, 'OTP_RATE_LIMITS', {
+    'request': {'identifier': (5, 15 * 60), 'ip': (20, 60 * 60)},
+    'verify': {'identifier': (10, 15 * 60), 'ip': (60, 60 * 60)},
+})
+
+# Reverse proxies in front of the app, each appending to X-Forwarded-For.
+# 0 reads REMOTE_ADDR. None (not configured) turns the per-IP limits off:
+# behind a proxy REMOTE_ADDR is the proxy, and every client would share
+# its bucket.
+OTP_TRUSTED_PROXY_COUNT = getattr(settings, 'OTP_TRUSTED_PROXY_COUNT', None)
+
+VERIFIED = 'verified'
+INVALID = 'invalid'
+EXPIRED = 'expired'
+EXHAUSTED = 'exhausted'
+
+# Checks every window first, so a rejected request consumes none of them.
+# Returns 0 when allowed, else the milliseconds to wait.
+RATE_LIMIT_SCRIPT = """
+local now = tonumber(ARGV[1])
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local window = tonumber(ARGV[2 * i + 1])
+    local limit = tonumber(ARGV[2 * i + 2])
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    if redis.call('ZCARD', key) >= limit then
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        wait = math.max(wait, tonumber(oldest[2]) + window - now)
+    end
+end
+if wait > 0 then
+    return wait
+end
+for i, key in ipairs(KEYS) do
+    redis.call('ZADD', key, now, ARGV[2])
+    redis.call('PEXPIRE', key, ARGV[2 * i + 1])
+end
+return 0
+"""
+
+# Consumes the OTP when the digest matches, counts a failed attempt
+# otherwise. Returns 1 verified, 0 invalid, -1 missing, -2 attempts exhausted.
+VERIFY_SCRIPT = """
+local digest = redis.call('HGET', KEYS[1], 'digest')
+if not digest then
+    return -1
+end
+if digest == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return 1
+end
+if redis.call('HINCRBY', KEYS[1], 'attempts', 1) >= tonumber(ARGV[2]) then
+    redis.call('DEL', KEYS[1])
+    return -2
+end
+return 0
+"""
+
+VERIFY_RESULTS = {1: VERIFIED, 0: INVALID, -1: EXPIRED, -2: EXHAUSTED}
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Rate limited, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def _script(source):
+    # Scripts run with EVALSHA, loaded into Redis on first use
+    return get_redis().register_script(source)
+
+
+def _hash(value):
+    return hashlib.sha256(value.encode()).hexdigest()[:32]
+
+
+def _otp_key(identifier):
+    return f"otp:code:{_hash(identifier)}"
+
+
+def _code_digest(identifier, code):
+    return hmac.new(settings.SECRET_KEY.encode(), f"{identifier}:{code}".encode(),
+                    hashlib.sha256).hexdigest()
+
+
+def get_client_ip(request):
+    """
+    Address of the client as seen by the first trusted proxy, or None when
+    it cannot be told (the per-IP limits are then skipped)
+    """
+    if OTP_TRUSTED_PROXY_COUNT is None:
+        return None
+    if OTP_TRUSTED_PROXY_COUNT == 0:
+        return request.META.get('REMOTE_ADDR') or None
+    # Entries left of the ones added by our proxies are set by the client
+    forwarded = [address.strip() for address in
+                 request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if address.strip()]
+    if len(forwarded) < OTP_TRUSTED_PROXY_COUNT:
+        return None
+    return forwarded[-OTP_TRUSTED_PROXY_COUNT]
+
+
+def check_rate_limit(action, identifier, client_ip):
+    """Count an attempt against the action's sliding windows, raising RateLimited when one is full"""
+    keys, args = [], []
+    for scope, value in (('identifier', identifier), ('ip', client_ip)):
+        if scope in OTP_RATE_LIMITS[action] and value:
+            limit, window = OTP_RATE_LIMITS[action][scope]
+            keys.append(f"otp:rate:{action}:{scope}:{_hash(value)}")
+            args += [window * 1000, limit]
+    if not keys:
+        return
+    now = int(time.time() * 1000)
+    wait = _script(RATE_LIMIT_SCRIPT)(keys=keys, args=[now, f"{now}:{uuid.uuid4().hex}", *args])
+    if wait:
+        raise RateLimited(retry_after=max(1, -(-int(wait) // 1000)))
+
+
+def issue_otp(identifier, client_ip=None):
+    """
+    Create a new one-time password for the identifier, replacing any
+    previous one, and return it. Only a digest of it is stored.
+    """
+    check_rate_limit('request', identifier, client_ip)
+    code = f"{secrets.randbelow(10 ** OTP_DIGITS):0{OTP_DIGITS}d}"
+    key = _otp_key(identifier)
+    pipe = get_redis().pipeline()
+    pipe.delete(key)
+    pipe.hset(key, mapping={'digest': _code_digest(identifier, code), 'attempts': 0})
+    pipe.expire(key, OTP_TTL)
+    pipe.execute()
+    return code
+
+
+def verify_otp(identifier, code, client_ip=None):
+    """
+    Check and consume the identifier's one-time password in one atomic step.
+    Returns VERIFIED, INVALID, EXPIRED (none requested or too old) or
+    EXHAUSTED (too many wrong codes, a new one is needed).
+    """
+    check_rate_limit('verify', identifier, client_ip)
+    result = _script(VERIFY_SCRIPT)(
+        keys=[_otp_key(identifier)],
+        args=[_code_digest(identifier, str(code).strip()), OTP_MAX_ATTEMPTS])
+    return VERIFY_RESULTS[int(result)]
@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import transaction
+
+# Group names are read on every role check. Membership and group changes
+# invalidate them, see accounts.signals.
+USER_GROUPS_CACHE_TIMEOUT = getattr(settings, 'USER_GROUPS_CACHE_TIMEOUT', 5 * 60)
+
+# Group of each role checked by MyUser
+ROLE_GROUPS = {
+    'teacher': 'Teachers',
+    'organizer': 'Organizers',
+    'author': 'Authors',
+}
+
+
+def _group_names_key(user_id):
+    return f"accounts:group-names:{user_id}"
+
+
+def get_user_group_names(user_id, cached=True):
+    """
+    Names of the user's groups, from the shared cache or one query.
+
+    With cached=False the cache is skipped, e.g. for a user whose groups were
+    changed in a transaction that is not committed yet.
+    """
+    if user_id is None:
+        return frozenset()
+    if not cached:
+        return frozenset(Group.objects.filter(user=user_id).values_list('name', flat=True))
+    key = _group_names_key(user_id)
+    names = cache.get(key)
+    if names is None:
+        names = sorted(Group.objects.filter(user=user_id).values_list('name', flat=True))
+        cache.set(key, names, timeout=USER_GROUPS_CACHE_TIMEOUT)
+    return frozenset(names)
+
+
+def invalidate_user_group_names(*user_ids):
+    """Drop the cached group names of the users once the current transaction is committed"""
+    keys = [_group_names_key(user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
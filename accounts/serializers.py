@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import MyUser, OTP, Organizer, Author, Teacher, Profile
+from .models import MyUser, Organizer, Author, Teacher, Profile
 
 
 class MyUserSerializer(serializers.ModelSerializer):
@@ -19,12 +19,6 @@ class MyUserSerializer(serializers.ModelSerializer):
         return MyUser.objects.create_user(**validated_data)
 
 
-class OTPSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = OTP
-        fields = ['email', 'phone', 'otp']
-
-
 class OrganizerSerializer(serializers.ModelSerializer):
     organization_logo_url = serializers.SerializerMethodField()
 
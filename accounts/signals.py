@@ -1,7 +1,9 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
 from django.contrib.auth.models import Group
 from .models import MyUser, Profile, Teacher, Organizer, Author
+from .roles import invalidate_user_group_names
+from .user_cache import invalidate_user_snapshots
 
 @receiver(post_save, sender=MyUser)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -49,4 +51,43 @@ def remove_from_author_group(sender, instance, **kwargs):
     """Remove user from the Author group when an Author is deleted"""
     author_group = Group.objects.filter(name='Authors').first()
     if author_group:
-        instance.user.groups.remove(author_group)
\ No newline at end of file
+        instance.user.groups.remove(author_group)
+
+
+def invalidate_groups_of_users(*user_ids):
+    """Cached group names and user snapshots (with their roles) are outdated"""
+    invalidate_user_group_names(*user_ids)
+    invalidate_user_snapshots(*user_ids)
+
+@receiver(post_save, sender=MyUser)
+@receiver(post_delete, sender=MyUser)
+def invalidate_user_snapshot(sender, instance, **kwargs):
+    invalidate_user_snapshots(instance.pk)
+
+@receiver(m2m_changed, sender=MyUser.groups.through)
+def invalidate_group_names_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Role checks read the cached group names of the users"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            instance.clear_group_names()
+            invalidate_groups_of_users(instance.pk)
+        return
+
+    # Changed from the group side: the users are in pk_set, except for
+    # clear() where they have to be looked up beforehand
+    if action == 'pre_clear':
+        instance._cleared_user_ids = list(instance.user_set.values_list('id', flat=True))
+    elif action == 'post_clear':
+        invalidate_groups_of_users(*getattr(instance, '_cleared_user_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        invalidate_groups_of_users(*(pk_set or []))
+
+@receiver(post_save, sender=Group)
+def invalidate_group_names_on_rename(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_groups_of_users(*instance.user_set.values_list('id', flat=True))
+
+@receiver(pre_delete, sender=Group)
+def invalidate_group_names_on_group_delete(sender, instance, **kwargs):
+    """Deleting a group removes its members without m2m_changed"""
+    invalidate_groups_of_users(*instance.user_set.values_list('id', flat=True))
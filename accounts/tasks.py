@@ -1,17 +1,21 @@
 import logging
-import os
+import time
 from celery import shared_task
-from django.core.mail import send_mail
-from django.conf import settings
-from ippanel import Client as SMSClient
 
-from core.settings import SMS_API_KEY
+from .notifications import (
+    SMS_OTP_PATTERN, ProviderBusy, build_email, flush_notifications, get_sms_provider,
+    record_delivery, send_email_messages, send_sms, send_sms_pattern,
+)
 
 logger = logging.getLogger(__name__)
 
-sms_api_key = SMS_API_KEY
+# Seconds before an OTP waiting for a provider slot is retried
+OTP_RETRY_COUNTDOWN = 1
 
-sms = SMSClient(sms_api_key)
+
+def _record_otp(queued_at):
+    if queued_at:
+        record_delivery('otp', sent=1, latency_ms=(time.time() - queued_at) * 1000)
 
 
 @shared_task
@@ -20,14 +24,7 @@ def send_email_task(subject, message, recipient_list, html_message=None):
     Task to send email asynchronously
     """
     try:
-        result = send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=recipient_list,
-            html_message=html_message,
-            fail_silently=False
-        )
+        result = send_email_messages([build_email(subject, message, recipient_list, html_message)])
         logger.info(f"Email sent to {recipient_list}: {result}")
         return result
     except Exception as e:
@@ -42,7 +39,7 @@ def send_sms_task(phone_number, message):
     Uses your SMS provider's API
     """
     try:
-        message = sms.send("+983000505", phone_number, message)
+        message = send_sms(get_sms_provider(), [phone_number], message)
 
         logger.info(f"SMS sent to {phone_number}: {message}")
         return True
@@ -52,7 +49,23 @@ def send_sms_task(phone_number, message):
 
 
 @shared_task
-def send_otp_email(email, otp):
+def flush_email_batch():
+    """Send the bulk emails queued by notifications.queue_email"""
+    sent = flush_notifications('email')
+    logger.info(f"Sent {sent} batched emails")
+    return sent
+
+
+@shared_task
+def flush_sms_batch():
+    """Send the bulk SMS queued by notifications.queue_sms"""
+    sent = flush_notifications('sms', get_sms_provider())
+    logger.info(f"Sent {sent} batched SMS")
+    return sent
+
+
+@shared_task(bind=True, max_retries=30)
+def send_otp_email(self, email, otp, queued_at=None):
     """
     Task to send OTP via email
     """
@@ -71,20 +84,30 @@ def send_otp_email(email, otp):
         <p>پراگو | هر آنچه برای گذر نیاز دارید</p>
     </div>
     """
-    return send_email_task(subject, message, [email], html_message)
+    try:
+        result = send_email_messages([build_email(subject, message, [email], html_message)])
+    except ProviderBusy as e:
+        raise self.retry(exc=e, countdown=OTP_RETRY_COUNTDOWN)
+    except Exception as e:
+        logger.error(f"Failed to send OTP email to {email}: {str(e)}")
+        raise e
+    _record_otp(queued_at)
+    return result
 
 
-@shared_task
-def send_otp_sms(phone, otp):
+@shared_task(bind=True, max_retries=30)
+def send_otp_sms(self, phone, otp, queued_at=None):
     """
     Task to send OTP via SMS
     """
     try:
-        message = sms.send_pattern(
-            "4v3jrycm29newaf", "+983000505", phone, {"code": otp})
+        message = send_sms_pattern(get_sms_provider(), phone, SMS_OTP_PATTERN, {"code": otp})
 
         logger.info(f"SMS sent to {phone}: {message}")
-        return True
+    except ProviderBusy as e:
+        raise self.retry(exc=e, countdown=OTP_RETRY_COUNTDOWN)
     except Exception as e:
         logger.error(f"Failed to send SMS to {phone}: {str(e)}")
         raise e
+    _record_otp(queued_at)
+    return True
@@ -1,3 +1,352 @@
-from django.test import TestCase
+import json
+import smtplib
+import subprocess
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import fakeredis
+from django.contrib.auth.models import Group
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import notifications, tasks
+from .management.commands.profile_startup import parse_importtime
+from .models import MyUser
+from .otp import EXHAUSTED, EXPIRED, INVALID, VERIFIED, get_client_ip, issue_otp, verify_otp
+from .roles import ROLE_GROUPS
+from .user_cache import get_cached_user
+from .views import RequestResetPassword
+
+USER_URL = '/api/v1/auth/user/'
+REQUEST_OTP_URL = '/api/v1/auth/request-otp/'
+VERIFY_OTP_URL = '/api/v1/auth/verify-otp/'
+
+
+class CachedUserTests(TestCase):
+    """Requests authenticate from a cached user snapshot, changes to the user must replace it"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = MyUser.objects.create_user(
+            email='learner@example.com', username='learner', password='password')
+
+    def jwt_client(self, user=None):
+        token = RefreshToken.for_user(user or self.user).access_token
+        return self.client_class(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_repeated_requests_skip_the_user_query(self):
+        client = self.jwt_client()
+        self.assertEqual(client.get(USER_URL).status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get(USER_URL).json()['username'], 'learner')
+
+    def test_deactivated_user_is_rejected(self):
+        client = self.jwt_client()
+        self.assertEqual(client.get(USER_URL).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(client.get(USER_URL).status_code, 401)
+
+    def test_password_change_ends_sessions(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(USER_URL).status_code, 200)
+        # Only the session is read, the snapshot carries the session hash
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(USER_URL).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('changed')
+            self.user.save()
+        self.assertEqual(self.client.get(USER_URL).status_code, 401)
+
+    def test_group_changes_update_roles(self):
+        self.assertFalse(get_cached_user(self.user.pk).is_teacher())
+        teachers = Group.objects.create(name='Teachers')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.add(teachers)
+        self.assertTrue(get_cached_user(self.user.pk).is_teacher())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            teachers.user_set.remove(self.user)
+        self.assertFalse(get_cached_user(self.user.pk).is_teacher())
+
+    def test_revoke_token_check_uses_the_stock_lookup(self):
+        # simplejwt reads its settings object at import, it is patched in place
+        with mock.patch('accounts.authentication.api_settings.CHECK_REVOKE_TOKEN', True), \
+                mock.patch('accounts.authentication.get_cached_user') as cached:
+            client = self.jwt_client()
+            self.assertEqual(client.get(USER_URL).status_code, 200)
+            cached.assert_not_called()
+
+            self.user.set_password('changed')
+            self.user.save()
+            self.assertEqual(client.get(USER_URL).status_code, 401)
+
+
+class RoleTests(TestCase):
+    """Role checks read the user's group names once, changes to the groups replace them"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = MyUser.objects.create_user(
+            email='learner@example.com', username='learner', password='password')
+        self.teachers = Group.objects.create(name=ROLE_GROUPS['teacher'])
+        self.authors = Group.objects.create(name=ROLE_GROUPS['author'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.add(self.teachers)
+
+    def roles(self):
+        return MyUser.objects.get(pk=self.user.pk).get_roles()
+
+    def test_group_names_are_loaded_once(self):
+        user = MyUser.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.get_roles(), ['teacher'])
+            self.assertFalse(user.is_organizer())
+        # Other instances share the cached names
+        user = MyUser.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(user.is_teacher())
+
+        cache.clear()
+        user = MyUser.objects.prefetch_related('groups').get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(user.get_roles(), ['teacher'])
+
+    def test_membership_changes_update_roles(self):
+        self.assertEqual(self.roles(), ['teacher'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.add(self.authors)
+            # The changed instance sees its groups before the commit
+            self.assertTrue(self.user.is_author())
+        self.assertTrue(self.user.is_author())
+        self.assertEqual(self.roles(), ['teacher', 'author'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.authors.user_set.clear()
+        self.assertEqual(self.roles(), ['teacher'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.teachers.name = 'Former teachers'
+            self.teachers.save()
+        self.assertEqual(self.roles(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.authors.user_set.add(self.user)
+        self.assertEqual(self.roles(), ['author'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.authors.delete()
+        self.assertEqual(self.roles(), [])
+
+
+class OTPTests(TestCase):
+    """One-time passwords and their rate limits, on an in-memory Redis"""
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+        for patcher in (
+            mock.patch('accounts.otp.get_redis', return_value=self.redis),
+            mock.patch('accounts.views.send_otp_email.delay'),
+            mock.patch('accounts.views.send_otp_sms.delay'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_otp_is_single_use(self):
+        code = issue_otp('learner@example.com')
+        wrong = '000000' if code != '000000' else '111111'
+        self.assertEqual(verify_otp('learner@example.com', wrong), INVALID)
+        self.assertEqual(verify_otp('learner@example.com', code), VERIFIED)
+        self.assertEqual(verify_otp('learner@example.com', code), EXPIRED)
+
+    def test_attempt_limit(self):
+        code = issue_otp('learner@example.com')
+        # Only a digest of the code is stored
+        self.assertNotIn(code, str(self.redis.hgetall(self.redis.keys('otp:code:*')[0])))
+        results = [verify_otp('learner@example.com', 'wrong') for _ in range(5)]
+        self.assertEqual(results, [INVALID] * 4 + [EXHAUSTED])
+        self.assertEqual(verify_otp('learner@example.com', code), EXPIRED)
+
+    def test_request_view_keeps_the_code_secret(self):
+        with mock.patch('accounts.views.send_otp_sms.delay') as send:
+            response = self.client.post(REQUEST_OTP_URL, {'identifier': '+989121234567'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('otp', response.json())
+        phone, code = send.call_args.args
+        self.assertEqual(phone, '09121234567')
+
+        response = self.client.post(VERIFY_OTP_URL, {'identifier': phone, 'otp': code})
+        self.assertTrue(response.json()['needs_signup'])
+
+    def test_requests_are_rate_limited(self):
+        for _ in range(5):
+            self.assertEqual(
+                self.client.post(REQUEST_OTP_URL, {'identifier': 'learner@example.com'}).status_code, 200)
+        response = self.client.post(REQUEST_OTP_URL, {'identifier': 'learner@example.com'})
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        # Other identifiers are not affected
+        self.assertEqual(
+            self.client.post(REQUEST_OTP_URL, {'identifier': 'other@example.com'}).status_code, 200)
+
+    def test_verifications_are_rate_limited(self):
+        issue_otp('learner@example.com')
+        for _ in range(10):
+            response = self.client.post(
+                VERIFY_OTP_URL, {'identifier': 'learner@example.com', 'otp': 'wrong'})
+            self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            VERIFY_OTP_URL, {'identifier': 'learner@example.com', 'otp': 'wrong'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_per_ip_limit_uses_the_forwarded_address(self):
+        with mock.patch('accounts.otp.OTP_TRUSTED_PROXY_COUNT', 1):
+            statuses = [
+                self.client.post(REQUEST_OTP_URL, {'identifier': f"user{n}@example.com"},
+                                 HTTP_X_FORWARDED_FOR='10.0.0.1').status_code
+                for n in range(21)
+            ]
+            self.assertEqual(statuses, [200] * 20 + [429])
+            # Another client behind the same proxy has its own bucket
+            response = self.client.post(REQUEST_OTP_URL, {'identifier': 'next@example.com'},
+                                        HTTP_X_FORWARDED_FOR='10.0.0.2')
+            self.assertEqual(response.status_code, 200)
+
+
+class ClientIPTests(SimpleTestCase):
+
+    def client_ip(self, proxies, **meta):
+        request = RequestFactory().get('/', REMOTE_ADDR='172.18.0.5', **meta)
+        with mock.patch('accounts.otp.OTP_TRUSTED_PROXY_COUNT', proxies):
+            return get_client_ip(request)
+
+    def test_client_ip(self):
+        forwarded = {'HTTP_X_FORWARDED_FOR': '6.6.6.6, 5.5.5.5, 10.0.0.9'}
+        # Not configured: per-IP limits are off
+        self.assertIsNone(self.client_ip(None, **forwarded))
+        self.assertEqual(self.client_ip(0, **forwarded), '172.18.0.5')
+        # The client-supplied 6.6.6.6 is never trusted
+        self.assertEqual(self.client_ip(1, **forwarded), '10.0.0.9')
+        self.assertEqual(self.client_ip(2, **forwarded), '5.5.5.5')
+        self.assertIsNone(self.client_ip(2))
+
+
+class NotificationBatchTests(TestCase):
+    """Batched notifications are only queued again when they were not sent"""
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+        for patcher in (
+            mock.patch('accounts.notifications.get_redis', return_value=self.redis),
+            mock.patch('accounts.tasks.flush_sms_batch.apply_async'),
+            mock.patch('accounts.tasks.flush_email_batch.apply_async'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_password_reset_email_is_batched(self):
+        user = MyUser.objects.create_user(
+            email='learner@example.com', username='learner', password='password')
+        request = APIRequestFactory().post('/')
+        force_authenticate(request, user)
+        self.assertEqual(RequestResetPassword.as_view()(request).status_code, 200)
+
+        self.assertEqual([payload['recipient_list'] for payload in self.pending('email')],
+                         [['learner@example.com']])
+        tasks.flush_email_batch.apply_async.assert_called_once_with(
+            countdown=notifications.NOTIFICATION_BATCH_WINDOW)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(notifications.flush_notifications('email'), 1)
+        self.assertEqual(mail.outbox[0].to, ['learner@example.com'])
+
+    def pending(self, channel):
+        return [json.loads(item) for item in self.redis.lrange(f"notifications:pending:{channel}", 0, -1)]
+
+    def test_failed_sms_group_is_retried_alone(self):
+        notifications.push_notifications('sms', [
+            {'phone': '09120000001', 'message': 'first'},
+            {'phone': '09120000002', 'message': 'second'},
+            {'phone': '09120000003', 'message': 'first'},
+        ])
+        provider = mock.Mock(spec=notifications.StubSMSProvider)
+        provider.name = 'test'
+        provider.send.side_effect = ['sent', RuntimeError('provider down')]
+
+        self.assertEqual(notifications.flush_notifications('sms', provider), 2)
+        provider.send.assert_any_call(['09120000001', '09120000003'], 'first')
+        self.assertEqual(
+            [(payload['phone'], payload['attempts']) for payload in self.pending('sms')],
+            [('09120000002', 1)])
+
+    def test_failed_email_is_retried_without_the_sent_ones(self):
+        notifications.push_notifications('email', [
+            {'subject': 'News', 'message': 'News', 'recipient_list': [f"user{n}@example.com"],
+             'html_message': None} for n in range(3)
+        ])
+        with mock.patch('accounts.notifications._send_email_message',
+                        side_effect=[1, smtplib.SMTPDataError(451, 'try later')]):
+            self.assertEqual(notifications.flush_notifications('email'), 1)
+        self.assertEqual(
+            [payload['recipient_list'] for payload in self.pending('email')],
+            [['user1@example.com'], ['user2@example.com']])
+
+
+class SMSProviderTests(SimpleTestCase):
+    """SMS providers are created on first use, once per process"""
+
+    def setUp(self):
+        for patcher in (
+            mock.patch.dict(notifications._sms_providers, clear=True),
+            mock.patch.object(notifications, '_sms_providers_pid', None),
+            mock.patch.dict(notifications.SMS_PROVIDERS, {'test': 'unittest.mock.Mock'}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_provider_is_created_once_per_process(self):
+        provider = notifications.get_sms_provider('test')
+        self.assertIs(notifications.get_sms_provider('test'), provider)
+        self.assertIsInstance(notifications.get_sms_provider('stub'), notifications.StubSMSProvider)
+
+        # A forked worker does not reuse the client of its parent
+        with mock.patch('accounts.notifications.os.getpid', return_value=-1):
+            forked = notifications.get_sms_provider('test')
+            self.assertIsNot(forked, provider)
+            self.assertIs(notifications.get_sms_provider('test'), forked)
+
+
+class ProfileStartupTests(SimpleTestCase):
+    IMPORTTIME = (
+        'import time: self [us] | cumulative | imported package\n'
+        'import time:       120 |        120 |   courses.cache\n'
+        'import time:      4000 |       4500 | ippanel\n'
+        'import time:       300 |       5000 | accounts.notifications\n'
+        'Traceback (most recent call last):\n'
+    )
+
+    def test_parse_importtime(self):
+        self.assertEqual(parse_importtime(self.IMPORTTIME), [
+            ('courses.cache', 120, 120), ('ippanel', 4000, 4500), ('accounts.notifications', 300, 5000)])
+
+    def test_failed_startup(self):
+        result = subprocess.CompletedProcess([], 1, stdout='', stderr=self.IMPORTTIME)
+        with mock.patch('accounts.management.commands.profile_startup.subprocess.run',
+                        return_value=result), self.assertRaises(CommandError):
+            call_command('profile_startup', stdout=StringIO())
+
+    def test_web_startup_creates_no_provider_client(self):
+        out = StringIO()
+        call_command('profile_startup', '--json', '--limit', '100000', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertIn('accounts.notifications', report['slowest_modules'])
+        # The SMS client library is only imported by the first send
+        self.assertNotIn('ippanel', report['slowest_modules'])
+        self.assertIn('accounts', report['slowest_packages'])
@@ -0,0 +1,75 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+
+from .models import MyUser
+
+# Lifetime of a cached user snapshot. Saving the user or changing their
+# groups replaces it, see accounts.signals.
+USER_SNAPSHOT_TIMEOUT = getattr(settings, 'USER_SNAPSHOT_TIMEOUT', 5 * 60)
+
+# Fields kept in a snapshot, the others (password, dates) are loaded on access
+SNAPSHOT_FIELDS = [
+    'id', 'username', 'email', 'phone', 'first_name', 'last_name',
+    'is_active', 'is_staff', 'is_superuser',
+]
+
+
+def _version_key(user_id):
+    return f"accounts:user-version:{user_id}"
+
+
+def get_user_version(user_id):
+    """Current snapshot version of a user, random like the outline versions"""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_user_snapshots(*user_ids):
+    """Replace the cached snapshots of the users once the current transaction is committed"""
+    keys = [_version_key(user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def build_user_snapshot(user):
+    snapshot = {field: getattr(user, field) for field in SNAPSHOT_FIELDS}
+    snapshot['group_names'] = sorted(user.get_group_names())
+    # Lets session authentication check the user without the password
+    snapshot['session_auth_hash'] = user.get_session_auth_hash()
+    return snapshot
+
+
+def user_from_snapshot(snapshot):
+    """A MyUser instance with the snapshot's fields loaded and the others deferred"""
+    field_names = [field.attname for field in MyUser._meta.concrete_fields
+                   if field.attname in SNAPSHOT_FIELDS]
+    user = MyUser.from_db(router.db_for_read(MyUser), field_names,
+                          [snapshot[field] for field in field_names])
+    user._group_names = frozenset(snapshot['group_names'])
+    user._session_auth_hash = snapshot['session_auth_hash']
+    return user
+
+
+def get_cached_user(user_id):
+    """
+    Return the user from its cached snapshot, loading and caching it when
+    missing. Returns None if there is no such user.
+    """
+    key = f"accounts:user:{user_id}:{get_user_version(user_id)}"
+    snapshot = cache.get(key)
+    if snapshot is not None:
+        return user_from_snapshot(snapshot)
+
+    try:
+        user = MyUser.objects.get(pk=user_id)
+    except (MyUser.DoesNotExist, ValueError):
+        return None
+    cache.set(key, build_user_snapshot(user), timeout=USER_SNAPSHOT_TIMEOUT)
+    return user
@@ -1,5 +1,6 @@
 from .models import MyUser  # Make sure MyUser is imported
 import pyotp
+import time
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 # Recommended way to get the User model
 from django.contrib.auth import authenticate, login, logout, get_user_model
@@ -11,8 +12,11 @@ from rest_framework.exceptions import ValidationError
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.utils import timezone
 from datetime import timedelta
+from redis.exceptions import RedisError
 
-from .models import OTP, MyUser, Profile
+from .models import MyUser, Profile
+from .notifications import queue_email
+from .otp import EXHAUSTED, EXPIRED, VERIFIED, RateLimited, get_client_ip, issue_otp, verify_otp
 # Add UserProfileSerializer
 from .serializers import MyUserSerializer, UserProfileSerializer
 from .tasks import send_otp_email, send_otp_sms
@@ -57,30 +61,29 @@ class RequestOTPView(APIView):
         if not email and not phone:
             return Response({"error": "Email or phone number is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Generate or retrieve the secret
-        otp_record, created = OTP.objects.get_or_create(
-            email=email,
-            phone=phone,
-            defaults={"secret": pyotp.random_base32()}
-        )
-
-        totp = pyotp.TOTP(otp_record.secret)
-        otp = totp.now()  # Generate a time-based OTP
+        try:
+            otp = issue_otp(email or phone, get_client_ip(request))
+        except RateLimited as e:
+            return Response({"error": "Too many OTP requests. Please try again later."},
+                            status=status.HTTP_429_TOO_MANY_REQUESTS,
+                            headers={"Retry-After": str(e.retry_after)})
+        except RedisError:
+            return Response({"error": "OTP service is unavailable. Please try again later."},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
         # Send OTP asynchronously using Celery
         if email:
             try:
-                send_otp_email.delay(email, otp)
+                send_otp_email.delay(email, otp, queued_at=time.time())
             except Exception as e:
                 print(f"Email send error: {str(e)}")
         elif phone:
             try:
-                send_otp_sms.delay(phone, otp)
+                send_otp_sms.delay(phone, otp, queued_at=time.time())
             except Exception as e:
                 print(f"SMS send error: {str(e)}")
-        print(f"otp for {identifier} is {otp}")
 
-        return Response({"message": "OTP sent successfully", "otp": otp}, status=status.HTTP_200_OK)
+        return Response({"message": "OTP sent successfully"}, status=status.HTTP_200_OK)
 
 
 class VerifyOTPView(APIView):
@@ -119,13 +122,10 @@ class VerifyOTPView(APIView):
             return Response({"error": "Identifier could not be processed."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            otp_record = OTP.objects.get(
-                email=email_for_lookup, phone=phone_for_lookup)
-
-            totp = pyotp.TOTP(otp_record.secret)
-            is_verified = totp.verify(otp_from_request, valid_window=1)
+            result = verify_otp(email_for_lookup or phone_for_lookup,
+                                otp_from_request, get_client_ip(request))
 
-            if is_verified:
+            if result == VERIFIED:
                 user_exists_check = MyUser.objects.filter(email=email_for_lookup).exists(
                 ) if email_for_lookup else MyUser.objects.filter(phone=phone_for_lookup).exists()
 
@@ -154,10 +154,19 @@ class VerifyOTPView(APIView):
                         "identifier": normalized_identifier_for_lookup,
                         "temp_token": str(pyotp.random_base32())
                     }, status=status.HTTP_200_OK)
+            elif result == EXPIRED:
+                return Response({"error": "OTP record not found. Please request a new OTP."}, status=status.HTTP_400_BAD_REQUEST)
+            elif result == EXHAUSTED:
+                return Response({"error": "Too many invalid attempts. Please request a new OTP."}, status=status.HTTP_400_BAD_REQUEST)
             else:
                 return Response({"error": "Invalid OTP."}, status=status.HTTP_400_BAD_REQUEST)
-        except OTP.DoesNotExist:
-            return Response({"error": "OTP record not found. Please request a new OTP."}, status=status.HTTP_400_BAD_REQUEST)
+        except RateLimited as e:
+            return Response({"error": "Too many verification attempts. Please try again later."},
+                            status=status.HTTP_429_TOO_MANY_REQUESTS,
+                            headers={"Retry-After": str(e.retry_after)})
+        except RedisError:
+            return Response({"error": "OTP service is unavailable. Please try again later."},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
         except Exception as e:
             # Consider logging this error to a file or monitoring service in production
             # For now, just returning a generic error
@@ -275,7 +284,7 @@ class RequestResetPassword(APIView):
             user = request.user
             token = PasswordResetTokenGenerator().make_token(user)
 
-            # Send token asynchronously via Celery
+            # Sent with the next email batch
             subject = "Password Reset Request"
             message = f"Use this token to reset your password: {token}"
             html_message = f"""
@@ -289,8 +298,7 @@ class RequestResetPassword(APIView):
                 <p>پراگو | هر آنچه برای گذر نیاز دارید</p>
             </div>
             """
-            from .tasks import send_email_task
-            send_email_task.delay(subject, message, [user.email], html_message)
+            queue_email(subject, message, [user.email], html_message)
 
             return Response({"message": "Password reset token sent."}, status=status.HTTP_200_OK)
         except MyUser.DoesNotExist:
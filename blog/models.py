@@ -74,6 +74,12 @@ class Post(models.Model):
         verbose_name_plural = 'نوشته‌ها'
         # Pinned posts first, then by date
         ordering = ['-is_pinned', '-published_at']
+        indexes = [
+            models.Index(fields=['status', 'published_at'],
+                         name='post_status_published_idx'),
+            models.Index(fields=['is_pinned', 'status', 'published_at'],
+                         name='post_pinned_published_idx'),
+        ]
 
     def __str__(self):
         return self.title
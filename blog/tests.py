@@ -1,3 +1,47 @@
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from core.testing import CatalogDataMixin, QueryPlanTestMixin
+from search.index import rebuild_index
+from taxonomy.models import Category
+
+
+class PublicPostQueryTests(QueryPlanTestMixin, CatalogDataMixin, TestCase):
+    """Query counts and plans of the public blog endpoints"""
+
+    def grow_posts(self):
+        for _ in range(5):
+            self.create_post()
+
+    def test_post_list(self):
+        for url in ['/api/v1/blog/', '/api/v1/blog/?category=programming',
+                    '/api/v1/blog/?ordering=-views_count']:
+            with self.subTest(url=url):
+                queries = self.assertConstantQueries(url, self.grow_posts)
+                self.assertNoFullScans(queries)
+
+    def test_post_detail(self):
+        url = f"/api/v1/blog/{self.posts[0].slug}/"
+        queries = self.assertConstantQueries(url, self.grow_posts)
+        self.assertNoFullScans(queries)
+
+    def test_search_lists_best_matches_first(self):
+        in_title, in_content, _ = self.posts
+        in_title.title = 'Django deployment'
+        in_title.save()
+        in_content.content = 'Notes on django and other frameworks'
+        in_content.save()
+        news = Category.objects.create(name='News', latin_name='news', slug='news')
+        in_content.categories.add(news)
+        rebuild_index(['post'])
+
+        def search(query):
+            return [post['id'] for post in self.client.get(f"/api/v1/blog/?{query}").json()['posts']]
+
+        self.assertEqual(search('search=django'), [in_title.id, in_content.id])
+        self.assertEqual(search('search=djan'), [in_title.id, in_content.id])
+        with mock.patch('blog.views.SEARCH_MAX_RESULTS', 1):
+            self.assertEqual(search('search=django'), [in_title.id])
+            # The category filter runs before the results are truncated
+            self.assertEqual(search('search=django&category=news'), [in_content.id])
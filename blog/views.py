@@ -1,16 +1,21 @@
 from django.shortcuts import render
 from django.utils import timezone
-from django.db.models import F, Q, Count
+from django.conf import settings
+from django.db.models import Case, F, Q, Count, When
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics
 from rest_framework.permissions import AllowAny
 
+from search.index import search_ids
 from .models import Post, Category, Tag, Author
 from .serializers import PostListSerializer, PostDetailSerializer
 from taxonomy.serializers import CategorySerializer, TagSerializer  # For metadata
 # from accounts.serializers import AuthorLiteSerializer
 
+# Search results listed at most, best matches first
+SEARCH_MAX_RESULTS = getattr(settings, 'BLOG_SEARCH_MAX_RESULTS', 100)
+
 
 class PostListView(APIView):
     permission_classes = [AllowAny]
@@ -40,6 +45,7 @@ class PostListView(APIView):
         category_slug = request.query_params.get('category')
         tag_slug = request.query_params.get('tag')
         author_id = request.query_params.get('author')
+        search_query = request.query_params.get('search', '').strip()
 
         if category_slug:
             queryset = queryset.filter(categories__slug=category_slug)
@@ -48,11 +54,26 @@ class PostListView(APIView):
         if author_id:
             queryset = queryset.filter(author__id=author_id)
 
+        matched_ids = None
+        if search_query:
+            # The filters above run first, then the best matches are kept
+            matched_ids = search_ids(search_query, 'post')
+            visible_ids = set(queryset.filter(
+                id__in=matched_ids).values_list('id', flat=True))
+            matched_ids = [post_id for post_id in matched_ids
+                           if post_id in visible_ids][:SEARCH_MAX_RESULTS]
+            queryset = queryset.filter(id__in=matched_ids)
+
         # Sorting (applies to the non-pinned posts)
         ordering = request.query_params.get('ordering', '-published_at')
         valid_ordering_fields = ['published_at',
                                  '-published_at', 'views_count', '-views_count']
-        if ordering in valid_ordering_fields:
+        if matched_ids is not None and 'ordering' not in request.query_params:
+            # Search results are listed by relevance unless asked otherwise
+            relevance = Case(*[When(id=post_id, then=rank)
+                               for rank, post_id in enumerate(matched_ids)])
+            queryset = queryset.order_by(relevance)
+        elif ordering in valid_ordering_fields:
             queryset = queryset.order_by(ordering)
         else:
             queryset = queryset.order_by('-published_at')
@@ -127,7 +148,7 @@ class PostDetailView(APIView):
             ).exclude(id=post.id).distinct()
 
             related_posts_queryset = (shared_tags_posts | shared_categories_posts).distinct(
-            ).order_by('-published_at')[:3]
+            ).select_related('author__user').prefetch_related('categories', 'tags').order_by('-published_at')[:3]
             related_posts_serializer = PostListSerializer(
                 related_posts_queryset, many=True, context={'request': request})
             related_posts = related_posts_serializer.data
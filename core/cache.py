@@ -0,0 +1,75 @@
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+TAG_VERSION_PREFIX = 'cache-tag:'
+# Counts invalidations, so a build that overlapped one is not stored
+INVALIDATION_EPOCH_KEY = 'cache-tag-epoch'
+
+
+def _tag_key(tag):
+    return f"{TAG_VERSION_PREFIX}{tag}"
+
+
+def get_tag_versions(tags):
+    """
+    Return the current version of each tag, creating versions for new tags.
+
+    Versions are random, so a tag whose version was evicted can never match
+    an entry stored under its old version again.
+    """
+    keys = {_tag_key(tag): tag for tag in tags}
+    versions = {keys[key]: version for key,
+                version in cache.get_many(list(keys)).items()}
+    missing = [tag for tag in tags if tag not in versions]
+    for tag in missing:
+        cache.add(_tag_key(tag), uuid.uuid4().hex, timeout=None)
+    if missing:
+        versions.update({keys[key]: version for key, version in cache.get_many(
+            [_tag_key(tag) for tag in missing]).items()})
+    return versions
+
+
+def invalidate_tags(*tags):
+    """Invalidate every cached entry tagged with any of the given tags"""
+    if tags:
+        # The epoch moves first: a build that reads the new tag versions
+        # also sees the new epoch
+        try:
+            cache.incr(INVALIDATION_EPOCH_KEY)
+        except ValueError:
+            cache.set(INVALIDATION_EPOCH_KEY, 1, timeout=None)
+        cache.delete_many([_tag_key(tag) for tag in tags])
+        logger.debug(f"Invalidated cache tags: {', '.join(tags)}")
+
+
+def get_or_build(key, builder, timeout=None):
+    """
+    Return the cached value for key, building and caching it when missing.
+
+    builder() returns a (value, tags) tuple. The entry stays valid until it
+    times out or any of its tags is invalidated. A value built while tags
+    were invalidated may come from the old data, it is returned but not
+    stored.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        tags = entry['tags']
+        if get_tag_versions(list(tags)) == tags:
+            return entry['value']
+
+    epoch = cache.get(INVALIDATION_EPOCH_KEY)
+    value, tags = builder()
+    versions = get_tag_versions(sorted(set(tags)))
+    if cache.get(INVALIDATION_EPOCH_KEY) != epoch:
+        logger.debug(f"Not caching {key}, tags were invalidated while it was built")
+        return value
+    cache.set(key, {
+        'tags': versions,
+        'value': value,
+    }, timeout=timeout or settings.RESPONSE_CACHE_TIMEOUT)
+    return value
@@ -0,0 +1,62 @@
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class LocalIndex:
+    """
+    An in-memory index built by each process and shared by its threads.
+
+    The index is rebuilt when invalidate() bumps its version in the shared
+    cache (from any process), after ttl seconds, or when the index itself
+    reports is_expired(). Only one thread of a process rebuilds it at a time.
+    """
+
+    def __init__(self, version_key, build, ttl):
+        self.version_key = version_key
+        self.build = build
+        self.ttl = ttl
+        # (index, version, built_at), replaced as a whole
+        self._state = None
+        self._lock = threading.Lock()
+
+    def _is_stale(self, state, version):
+        if state is None:
+            return True
+        index, built_version, built_at = state
+        return (
+            version != built_version or
+            time.monotonic() - built_at > self.ttl or
+            (hasattr(index, 'is_expired') and index.is_expired())
+        )
+
+    def get(self):
+        """Return this process' index, rebuilding it if it is outdated"""
+        version = cache.get(self.version_key, 0)
+        state = self._state
+        if not self._is_stale(state, version):
+            return state[0]
+
+        with self._lock:
+            state = self._state
+            if self._is_stale(state, version):
+                state = (self.build(), version, time.monotonic())
+                self._state = state
+                logger.debug(f"Rebuilt {self.version_key} at version {version}")
+        return state[0]
+
+    def invalidate(self):
+        """
+        Mark the index as outdated in every process sharing the cache. Call
+        it once the change is committed (transaction.on_commit), otherwise
+        a process may rebuild the new version from the old data.
+        """
+        self._state = None
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            cache.set(self.version_key, 1, timeout=None)
@@ -0,0 +1,22 @@
+import redis
+from django.conf import settings
+
+_connection = None
+
+
+def get_redis():
+    """
+    Return the process-wide Redis client for application data.
+
+    The connection pool is created on first use, so importing this module
+    does not open any connection.
+    """
+    global _connection
+    if _connection is None:
+        _connection = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            decode_responses=True,
+        )
+    return _connection
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
 from datetime import timedelta
 import time
@@ -70,6 +71,7 @@ INSTALLED_APPS = [
     'enrollments',
     'support',
     'billing',
+    'search',
 ]
 
 MIDDLEWARE = [
@@ -144,6 +146,33 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get(
+            'CACHE_URL', f"redis://{os.environ.get('REDIS_HOST', '127.0.0.1')}:{os.environ.get('REDIS_PORT', '6379')}/2"),
+        'KEY_PREFIX': 'prago',
+    }
+}
+
+# Tests (and setups without Redis) use a per-process in-memory cache
+if os.environ.get('CACHE_BACKEND') == 'locmem' or 'test' in sys.argv[1:2]:
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+
+# Lifetime of cached public API responses, entries are also invalidated by tag
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 600))
+
+# Full-text search index of courses, roadmaps and blog posts. The database
+# backend is shared by every process, search.backends.memory.MemoryBackend
+# keeps a per-process index for development
+SEARCH_BACKEND = os.environ.get(
+    'SEARCH_BACKEND', 'search.backends.database.DatabaseBackend')
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -200,7 +229,8 @@ AUTHENTICATION_BACKENDS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication reading the user from a short lived cache
+        'accounts.authentication.CachedJWTAuthentication',
         # Often kept for browsable API & admin
         'rest_framework.authentication.SessionAuthentication',
     ),
@@ -236,8 +266,47 @@ CELERY_TASK_TRACK_STARTED = True
 CELERYD_TIME_LIMIT = 30 * 60
 CELERY_TASK_MAX_RETRIES = 3
 
+# Tests run queued tasks inline, without a broker
+if 'test' in sys.argv[1:2]:
+    CELERY_TASK_ALWAYS_EAGER = True
+
+# Redis database for application data (buffers, counters), kept apart from
+# the Celery broker and result backend
+REDIS_URL = os.environ.get(
+    'REDIS_URL', f'redis://{REDIS_HOST}:{REDIS_PORT}/1')
+REDIS_SOCKET_TIMEOUT = float(os.environ.get('REDIS_SOCKET_TIMEOUT', 0.5))
+
+# Video progress heartbeats are buffered in Redis and flushed in bulk
+PROGRESS_FLUSH_INTERVAL = int(os.environ.get('PROGRESS_FLUSH_INTERVAL', 30))
+PROGRESS_FLUSH_BATCH_SIZE = int(
+    os.environ.get('PROGRESS_FLUSH_BATCH_SIZE', 500))
+
+CELERY_BEAT_SCHEDULE = {
+    'flush-progress-heartbeats': {
+        'task': 'enrollments.tasks.flush_progress_heartbeats',
+        'schedule': PROGRESS_FLUSH_INTERVAL,
+    },
+}
+# One-off tasks such as scheduled course publishing are stored in the
+# database, so beat runs with the django-celery-beat scheduler
+CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+
+# Notifications get their own queues so bulk email and SMS never delay OTPs.
+# Workers must consume them, e.g. `celery -A core worker -Q otp` next to
+# `celery -A core worker -Q celery,email,sms`, before this is enabled.
+if os.environ.get('CELERY_NOTIFICATION_QUEUES', 'False') == 'True':
+    CELERY_TASK_ROUTES = {
+        'accounts.tasks.send_otp_email': {'queue': 'otp'},
+        'accounts.tasks.send_otp_sms': {'queue': 'otp'},
+        'accounts.tasks.send_email_task': {'queue': 'email'},
+        'accounts.tasks.flush_email_batch': {'queue': 'email'},
+        'accounts.tasks.send_sms_task': {'queue': 'sms'},
+        'accounts.tasks.flush_sms_batch': {'queue': 'sms'},
+    }
+
 # Email Configuration
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = os.environ.get(
+    'EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
 EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 587))
 EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'True') == 'True'
@@ -247,6 +316,18 @@ DEFAULT_FROM_EMAIL = os.environ.get(
     'DEFAULT_FROM_EMAIL', 'Your App <your-email@example.com>')
 
 SMS_API_KEY = os.environ.get("SMS_API_KEY", "")
+# 'ippanel', or 'stub' to send nothing (see accounts.notifications)
+SMS_PROVIDER = os.environ.get("SMS_PROVIDER", "ippanel")
+
+# Bulk notifications are batched for this many seconds, see accounts.notifications
+NOTIFICATION_BATCH_WINDOW = float(
+    os.environ.get('NOTIFICATION_BATCH_WINDOW', 2))
+NOTIFICATION_BATCH_SIZE = int(os.environ.get('NOTIFICATION_BATCH_SIZE', 100))
+
+# Reverse proxies in front of the app, e.g. 1 for nginx. See accounts.otp.
+OTP_TRUSTED_PROXY_COUNT = (
+    int(os.environ['OTP_TRUSTED_PROXY_COUNT'])
+    if os.environ.get('OTP_TRUSTED_PROXY_COUNT') else None)
 
 # Add this to your settings.py file
 LOGGING = {
@@ -0,0 +1,223 @@
+"""Test helpers shared by the apps' test suites"""
+import re
+from datetime import timedelta
+from itertools import count
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import MyUser, Organizer, Teacher
+from blog.models import Post
+from courses.catalog import invalidate_catalog_index
+from courses.models import Chapter, Course, Episode, RoadMap
+from enrollments.models import Enrollment, UserProgress
+from subscriptions.models import SubscriptionPlan, UserSubscription
+from taxonomy.models import Category, Tag
+
+# Tables behind the published listings, these must never be read in full
+HOT_TABLES = {
+    model._meta.db_table for model in (
+        Course, RoadMap, Episode, Post, Enrollment, UserSubscription, UserProgress)
+}
+
+# "table" alias pairs of Django's generated SQL, e.g. "courses_course" U0
+TABLE_ALIAS_RE = re.compile(r'["`](\w+)["`]\s+(?:AS\s+)?["`]?([A-Z]\d+)\b')
+
+
+class QueryPlanTestMixin:
+    """
+    Assertions on the queries a request runs.
+
+    assertNoFullScans() runs EXPLAIN on every SELECT and fails when one of
+    the HOT_TABLES is read without an index. assertConstantQueries() fails
+    when the number of queries grows with the amount of data (N+1 queries).
+    """
+
+    def setUp(self):
+        super().setUp()
+        # Public responses are cached, every request has to hit the database
+        cache.clear()
+
+    def capture(self, url, client=None):
+        # Every captured request builds the catalog index (and caches) from scratch
+        cache.clear()
+        invalidate_catalog_index()
+        with CaptureQueriesContext(connection) as context:
+            response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return response, context.captured_queries
+
+    def full_scans(self, sql):
+        """Return the hot tables the query reads in full"""
+        aliases = {alias: table for table, alias in TABLE_ALIAS_RE.findall(sql)}
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                # e.g. "SCAN courses_course" (a full scan) as opposed to
+                # "SEARCH ..." or "SCAN ... USING INDEX ..."
+                scanned = [
+                    match.group(1) for match in (
+                        re.fullmatch(r'SCAN (\w+)(?: AS (\w+))?', row[-1])
+                        for row in cursor.fetchall()) if match
+                ]
+            else:
+                cursor.execute(f"EXPLAIN {sql}")
+                columns = [column[0].lower() for column in cursor.description]
+                scanned = [
+                    row['table'] for row in (
+                        dict(zip(columns, values)) for values in cursor.fetchall())
+                    if row['type'] == 'ALL' and row['table']
+                ]
+        tables = {aliases.get(table, table) for table in scanned}
+        return tables & HOT_TABLES
+
+    def assertNoFullScans(self, queries):
+        for query in queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            tables = self.full_scans(sql)
+            self.assertFalse(
+                tables, f"Full scan of {', '.join(sorted(tables))} in: {sql}")
+
+    def assertConstantQueries(self, url, grow, client=None):
+        """Request url before and after grow() adds data, the query count must not change"""
+        _, before = self.capture(url, client)
+        grow()
+        _, after = self.capture(url, client)
+        self.assertEqual(
+            len(before), len(after),
+            f"{url} ran {len(before)} queries, then {len(after)} with more data:\n" +
+            '\n'.join(query['sql'] for query in after))
+        return after
+
+
+class CatalogDataMixin:
+    """Seeds published courses with chapters, episodes, enrollments and a roadmap"""
+
+    sequence = count()
+
+    @classmethod
+    def create_course(cls, chapters=2, episodes=3, users=(), **kwargs):
+        n = next(cls.sequence)
+        course = Course.objects.create(
+            cover_image='cover_image/course.png',
+            title=f"Course {n}",
+            latin_title=f"course-{n}",
+            slug=f"course-{n}",
+            description='Python course',
+            price=100,
+            status='published',
+            published_at=timezone.now() - timedelta(days=n + 1),
+            intro_video_link='https://example.com/intro',
+            total_hours=n % 6,
+            **kwargs
+        )
+        course.categories.set([cls.category])
+        course.tags.set([cls.tag])
+        course.organizers.set([cls.organizer])
+        course.teachers.set([cls.teacher])
+        for number in range(1, chapters + 1):
+            chapter = Chapter.objects.create(
+                course=course, number=number, title=f"Chapter {number}")
+            for order in range(episodes):
+                Episode.objects.create(
+                    course=course,
+                    chapter=chapter,
+                    title=f"Episode {number}.{order}",
+                    content_url='https://example.com/video.m3u8',
+                    status='published',
+                    order=number * 100 + order,
+                    duration=timedelta(minutes=10),
+                )
+        for user in users:
+            Enrollment.objects.create(user=user, course=course)
+        return course
+
+    @classmethod
+    def create_post(cls):
+        n = next(cls.sequence)
+        post = Post.objects.create(
+            title=f"Post {n}",
+            slug=f"post-{n}",
+            content='Content',
+            featured_image='blog/images/post.png',
+            status='published',
+            published_at=timezone.now() - timedelta(days=n + 1),
+        )
+        post.categories.set([cls.category])
+        post.tags.set([cls.tag])
+        return post
+
+    @classmethod
+    def setUpClass(cls):
+        # Video metadata and course hours are computed by Celery workers. The
+        # patches cover setUpTestData and the tests of this class only.
+        for patcher in (
+            mock.patch('courses.tasks.process_video_metadata.delay'),
+            mock.patch('courses.tasks.update_course_total_hours.delay'),
+        ):
+            patcher.start()
+            cls.addClassCleanup(patcher.stop)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(
+            name='Programming', latin_name='programming', slug='programming')
+        cls.tag = Tag.objects.create(
+            name='Python', latin_name='python', slug='python')
+        cls.organizer = Organizer.objects.create(
+            organization_name='Organizer', organization_slug='organizer')
+        cls.teacher = Teacher.objects.create(
+            first_name='Teacher', last_name='One', slug='teacher-one')
+        cls.user = MyUser.objects.create_user(
+            email='learner@example.com', username='learner', password='password')
+
+        cls.courses = [cls.create_course(users=[cls.user]) for _ in range(3)]
+        cls.roadmap = RoadMap.objects.create(
+            name='Roadmap', slug='roadmap', description='Roadmap',
+            cover_image='roadmap_cover_image/roadmap.png', status='published',
+            published_at=timezone.now() - timedelta(hours=1))
+        cls.roadmap.courses.set(cls.courses)
+        plan = SubscriptionPlan.objects.create(
+            name='Plan', slug='plan', price=100, duration_days=30)
+        plan.included_courses.set(cls.courses[:2])
+        UserSubscription.objects.create(
+            user=cls.user, subscription_plan=plan,
+            end_date=timezone.now() + timedelta(days=10))
+        cls.posts = [cls.create_post() for _ in range(3)]
+
+    def authenticated_client(self):
+        token = RefreshToken.for_user(self.user).access_token
+        return self.client_class(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def grow_catalog(self):
+        """Add more of everything the public views list or nest"""
+        courses = [self.create_course(chapters=3, episodes=4, users=[self.user])
+                   for _ in range(3)]
+        self.roadmap.courses.add(*courses)
+        n = next(self.sequence)
+        RoadMap.objects.create(
+            name=f"Roadmap {n}", slug=f"roadmap-{n}", description='Roadmap',
+            cover_image='roadmap_cover_image/roadmap.png', status='published',
+            published_at=timezone.now() - timedelta(hours=2)
+        ).courses.set(courses)
+        for _ in range(3):
+            self.create_post()
+
+    def grow_course(self, course):
+        """Add chapters and episodes to an existing course"""
+        for number in range(10, 13):
+            chapter = Chapter.objects.create(
+                course=course, number=number, title=f"Chapter {number}")
+            for order in range(4):
+                Episode.objects.create(
+                    course=course, chapter=chapter, title=f"Episode {order}",
+                    content_url='https://example.com/video.m3u8',
+                    status='published', order=number * 100 + order,
+                    duration=timedelta(minutes=10))
@@ -30,6 +30,7 @@ urlpatterns = [
          'subscriptions'), namespace='subscriptions')),
 
     path('api/v1/billing/', include(('billing.urls', 'billing'), namespace='billing')),
+    path('api/v1/search/', include(('search.urls', 'search'), namespace='search')),
 ]
 
 # Add static file serving for development
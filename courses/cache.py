@@ -0,0 +1,58 @@
+from django.db import transaction
+
+from core.cache import get_or_build, invalidate_tags
+
+# Tags of the home page lists, invalidated by any course or roadmap change
+COURSE_LIST_TAG = 'courses'
+ROADMAP_LIST_TAG = 'roadmaps'
+
+# Taxonomy items embedded in serialized courses: (tag kind, course field)
+COURSE_RELATIONS = (
+    ('teacher', 'teachers'),
+    ('organizer', 'organizers'),
+    ('category', 'categories'),
+    ('tag', 'tags'),
+    ('attribute', 'attributes'),
+)
+
+
+def course_tag(course_id):
+    return f"course:{course_id}"
+
+
+def roadmap_tag(roadmap_id):
+    return f"roadmap:{roadmap_id}"
+
+
+def taxonomy_tag(kind, obj_id):
+    return f"{kind}:{obj_id}"
+
+
+def course_data_tags(courses_data):
+    """Tags of serialized courses: the courses and every taxonomy item they embed"""
+    tags = set()
+    for course in courses_data:
+        tags.add(course_tag(course['id']))
+        for kind, field in COURSE_RELATIONS:
+            tags.update(taxonomy_tag(kind, item['id'])
+                        for item in course.get(field, []))
+    return tags
+
+
+def roadmap_data_tags(roadmaps_data):
+    """Tags of serialized roadmaps, including the courses they embed"""
+    tags = set()
+    for roadmap in roadmaps_data:
+        tags.add(roadmap_tag(roadmap['id']))
+        tags |= course_data_tags(roadmap['courses'])
+    return tags
+
+
+def cached_response(key, builder, timeout=None):
+    """Shared-cache wrapper for public course endpoints, see core.cache.get_or_build"""
+    return get_or_build(f"courses:response:{key}", builder, timeout=timeout)
+
+
+def invalidate_after_commit(*tags):
+    """Invalidate the tags once the current transaction is committed"""
+    transaction.on_commit(lambda: invalidate_tags(*tags))
@@ -0,0 +1,230 @@
+import logging
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.local_index import LocalIndex
+from .models import Course, RoadMap
+from taxonomy.serializers import CategorySerializer
+from accounts.serializers import OrganizerSerializer
+from search.index import search as search_index
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_KEY = 'courses:catalog-index:version'
+
+# Rebuild at least this often even without a change signal, so that data the
+# signals do not cover (e.g. enrollment counts) does not drift for long.
+CATALOG_INDEX_TTL = getattr(settings, 'CATALOG_INDEX_TTL', 300)
+
+DURATION_BUCKETS = {
+    'upto30min': lambda hours: hours <= 0.5,
+    '30min2hours': lambda hours: 0.5 < hours <= 2,
+    '2to5hours': lambda hours: 2 < hours <= 5,
+    'morethan5hours': lambda hours: hours > 5,
+}
+
+SORT_OPTIONS = ('default', 'newest', 'popular')
+
+
+class CatalogEntry:
+    """Precomputed, filter-relevant view of one course or roadmap"""
+
+    __slots__ = ('key', 'content_type', 'id', 'published_at', 'popularity')
+
+    def __init__(self, content_type, obj_id, published_at, popularity):
+        self.key = (content_type, obj_id)
+        self.content_type = content_type
+        self.id = obj_id
+        self.published_at = published_at
+        self.popularity = popularity
+
+
+class CatalogIndex:
+    """
+    In-memory index of the published catalog (courses and roadmaps).
+
+    Every filter of the course list page is answered from posting lists
+    (sets of entry keys) and every sort option from a presorted key list,
+    so a request never has to load or serialize the whole catalog.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.by_type = {'course': set(), 'roadmap': set()}
+        self.by_category = {}
+        self.by_organizer = {}
+        self.by_duration = {bucket: set() for bucket in DURATION_BUCKETS}
+        self.orderings = {}
+        # Facets shown on the list page: {slug: (serialized data, {course keys})}
+        self.category_facets = {}
+        self.organizer_facets = {}
+
+    @classmethod
+    def build(cls):
+        index = cls()
+        index._index_courses()
+        index._index_roadmaps()
+        index._build_orderings()
+        logger.info(
+            f"Built catalog index with {len(index.entries)} entries")
+        return index
+
+    def _add(self, postings, value, key):
+        postings.setdefault(value, set()).add(key)
+
+    def _index_courses(self):
+        courses = Course.objects.filter(
+            status='published',
+            published_at__isnull=False
+        ).prefetch_related('categories', 'organizers')
+
+        for course in courses:
+            entry = CatalogEntry(
+                'course', course.id, course.published_at, course.enrollment_count)
+            self.entries[entry.key] = entry
+            self.by_type['course'].add(entry.key)
+
+            for category in course.categories.all():
+                self._add(self.by_category, category.slug, entry.key)
+                facet = self.category_facets.setdefault(
+                    category.slug, (CategorySerializer(category).data, set()))
+                facet[1].add(entry.key)
+
+            for organizer in course.organizers.all():
+                self._add(self.by_organizer,
+                          organizer.organization_slug, entry.key)
+                facet = self.organizer_facets.setdefault(
+                    organizer.organization_slug, (OrganizerSerializer(organizer).data, set()))
+                facet[1].add(entry.key)
+
+            hours = float(course.total_hours or 0)
+            for bucket, matches in DURATION_BUCKETS.items():
+                if matches(hours):
+                    self.by_duration[bucket].add(entry.key)
+
+    def _index_roadmaps(self):
+        # Roadmap filters look at every course in the roadmap, published or not
+        roadmaps = RoadMap.objects.filter(
+            status='published',
+            published_at__isnull=False
+        ).prefetch_related('courses__categories', 'courses__organizers')
+
+        for roadmap in roadmaps:
+            entry = CatalogEntry(
+                'roadmap', roadmap.id, roadmap.published_at, roadmap.enrollment_count)
+            self.entries[entry.key] = entry
+            self.by_type['roadmap'].add(entry.key)
+
+            for course in roadmap.courses.all():
+                for category in course.categories.all():
+                    self._add(self.by_category, category.slug, entry.key)
+                for organizer in course.organizers.all():
+                    self._add(self.by_organizer,
+                              organizer.organization_slug, entry.key)
+                hours = float(course.total_hours or 0)
+                for bucket, matches in DURATION_BUCKETS.items():
+                    if matches(hours):
+                        self.by_duration[bucket].add(entry.key)
+
+    def _build_orderings(self):
+        def type_rank(entry):
+            # Courses are listed before roadmaps when the sort key ties
+            return 0 if entry.content_type == 'course' else 1
+
+        entries = list(self.entries.values())
+        self.orderings['default'] = [
+            entry.key for entry in sorted(entries, key=lambda e: (e.id, type_rank(e)))]
+        self.orderings['newest'] = [
+            entry.key for entry in sorted(
+                entries, key=lambda e: (-e.published_at.timestamp(), type_rank(e), -e.id))]
+        self.orderings['popular'] = [
+            entry.key for entry in sorted(
+                entries, key=lambda e: (-e.popularity, type_rank(e), e.id))]
+
+    def _union(self, postings, values):
+        keys = set()
+        for value in values:
+            keys |= postings.get(value, set())
+        return keys
+
+    def search(self, search_query='', types=None, categories=None, organizers=None,
+               durations=None, sort='default', now=None):
+        """
+        Return the ordered list of entry keys matching the given filters.
+
+        A search query is answered by the full-text search index, the default
+        sort then orders the matches by relevance.
+        """
+        now = now or timezone.now()
+
+        candidates = None
+        filters = []
+        if types:
+            filters.append(self._union(self.by_type, types))
+        if categories:
+            filters.append(self._union(self.by_category, categories))
+        if organizers:
+            filters.append(self._union(self.by_organizer, organizers))
+        if durations:
+            valid_durations = [d for d in durations if d in DURATION_BUCKETS]
+            # Unknown duration values are ignored, like the previous queryset filter
+            if valid_durations:
+                filters.append(self._union(self.by_duration, valid_durations))
+
+        # Intersect the smallest posting lists first
+        for keys in sorted(filters, key=len):
+            candidates = keys if candidates is None else candidates & keys
+            if not candidates:
+                return []
+
+        ordering = self.orderings.get(sort, self.orderings['default'])
+        if search_query:
+            matches = [key for key in search_index(search_query, ['course', 'roadmap'], now)
+                       if key in self.entries]
+            if sort in self.orderings and sort != 'default':
+                matched = set(matches)
+                ordering = [key for key in ordering if key in matched]
+            else:
+                ordering = matches
+
+        result = []
+        for key in ordering:
+            if candidates is not None and key not in candidates:
+                continue
+            entry = self.entries[key]
+            # Scheduled items are indexed ahead of time and appear once due
+            if entry.published_at > now:
+                continue
+            result.append(key)
+        return result
+
+    def facets(self, now=None):
+        """Categories and organizers of the currently published courses"""
+        now = now or timezone.now()
+        visible = {
+            key for key in self.by_type['course']
+            if self.entries[key].published_at <= now
+        }
+
+        def collect(facets):
+            data = [item for item, keys in facets.values() if keys & visible]
+            return sorted(data, key=lambda item: item['id'])
+
+        return {
+            'categories': collect(self.category_facets),
+            'organizers': collect(self.organizer_facets),
+        }
+
+
+_catalog_index = LocalIndex(CATALOG_VERSION_KEY, CatalogIndex.build, CATALOG_INDEX_TTL)
+
+
+def get_catalog_index():
+    """Return this process' catalog index, rebuilding it if it is outdated"""
+    return _catalog_index.get()
+
+
+def invalidate_catalog_index():
+    """Mark the catalog index as outdated in every process sharing the cache"""
+    _catalog_index.invalidate()
@@ -0,0 +1,155 @@
+import logging
+import uuid
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+from .models import Chapter, Course, Episode
+
+logger = logging.getLogger(__name__)
+
+COURSE_FIELDS_TO_COPY = [
+    'description', 'excerpt', 'intro_video_link',
+    'price', 'special_offer_price', 'special_offer_start_date', 'special_offer_end_date',
+    'cover_image'
+]
+
+# The duration is copied too, a copy points to the same content as the original
+EPISODE_FIELDS_TO_COPY = [
+    'title', 'type', 'content_url', 'description',
+    'thumbnail', 'file_size', 'word_count', 'order', 'duration'
+]
+
+COURSE_RELATIONS_TO_COPY = ['organizers', 'teachers', 'attributes', 'tags', 'categories']
+
+
+def _copy_latin_title(course):
+    latin_title = f"{course.latin_title}-copy" if course.latin_title else f"{slugify(course.title, allow_unicode=False)}-copy"
+    if not latin_title:
+        latin_title = f"course-{uuid.uuid4().hex[:6]}"
+    return latin_title
+
+
+def _unique_slugs(base_slugs):
+    """One free slug per base slug, adding -1, -2, ... like the admin did"""
+    taken = set(Course.objects.filter(
+        reduce(or_, [Q(slug__startswith=base) for base in set(base_slugs)])
+    ).values_list('slug', flat=True)) if base_slugs else set()
+
+    slugs = []
+    for base in base_slugs:
+        slug = base
+        counter = 1
+        while slug in taken:
+            slug = f"{base}-{counter}"
+            counter += 1
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def _bulk_create(model, objects, created_rows):
+    """
+    bulk_create() the objects and make sure they have primary keys.
+
+    Backends that cannot return the keys of inserted rows (MySQL) get them
+    from created_rows, a queryset of exactly the new rows: the rows of one
+    multi-row INSERT receive ascending auto-increment ids in insertion order.
+    """
+    model.objects.bulk_create(objects, batch_size=500)
+    if objects and objects[0].pk is None:
+        pks = list(created_rows.order_by('pk').values_list('pk', flat=True))
+        if len(pks) != len(objects):
+            raise RuntimeError(
+                f"Expected {len(objects)} new {model._meta.verbose_name} rows, found {len(pks)}")
+        for obj, pk in zip(objects, pks):
+            obj.pk = pk
+    return objects
+
+
+def clone_courses(courses):
+    """
+    Duplicate courses with their relations, chapters and episodes as drafts.
+
+    Everything is copied with a few bulk queries, whatever the size of the
+    courses, so no per-row save signals run. The video metadata and total
+    hours of the copies are completed afterwards by one finish_course_clones
+    task. Returns the new courses, in the order of the given ones.
+    """
+    originals = list({course.id: course for course in courses}.values())
+    if not originals:
+        return []
+    original_ids = [course.id for course in originals]
+
+    copies = []
+    for original in originals:
+        copy = Course(
+            title=f"{original.title} (Copy)",
+            latin_title=_copy_latin_title(original),
+            status='draft',
+            published_at=None,
+            **{field: getattr(original, field) for field in COURSE_FIELDS_TO_COPY}
+        )
+        copies.append(copy)
+    base_slugs = [
+        slugify(copy.latin_title or copy.title, allow_unicode=False) or f"course-copy-{uuid.uuid4().hex[:4]}"
+        for copy in copies
+    ]
+    for copy, slug in zip(copies, _unique_slugs(base_slugs)):
+        copy.slug = slug
+
+    chapters = list(Chapter.objects.filter(
+        course_id__in=original_ids).order_by('course_id', 'number', 'id'))
+    episodes = list(Episode.objects.filter(
+        chapter__course_id__in=original_ids).order_by('chapter_id', 'order', 'id'))
+
+    with transaction.atomic():
+        _bulk_create(Course, copies, Course.objects.filter(
+            slug__in=[copy.slug for copy in copies]))
+        copy_ids = {original.id: copy.id for original, copy in zip(originals, copies)}
+
+        for field_name in COURSE_RELATIONS_TO_COPY:
+            field = Course._meta.get_field(field_name)
+            through = field.remote_field.through
+            source, target = f"{field.m2m_field_name()}_id", f"{field.m2m_reverse_field_name()}_id"
+            through.objects.bulk_create([
+                through(**{source: copy_ids[course_id], target: item_id})
+                for course_id, item_id in through.objects.filter(
+                    **{f"{source}__in": original_ids}).values_list(source, target)
+            ], batch_size=500)
+
+        chapter_copies = [
+            Chapter(
+                course_id=copy_ids[chapter.course_id],
+                number=chapter.number,
+                title=chapter.title,
+                description=chapter.description,
+            ) for chapter in chapters
+        ]
+        _bulk_create(Chapter, chapter_copies, Chapter.objects.filter(
+            course_id__in=copy_ids.values()))
+        chapter_copies_by_id = {chapter.id: copy for chapter, copy in zip(chapters, chapter_copies)}
+
+        # bulk_create() skips Episode.save() and its post_save handlers,
+        # which would queue two Celery tasks per episode
+        episode_copies = [
+            Episode(
+                course_id=chapter_copies_by_id[episode.chapter_id].course_id,
+                chapter_id=chapter_copies_by_id[episode.chapter_id].id,
+                status='draft',
+                published_at=None,
+                **{field: getattr(episode, field) for field in EPISODE_FIELDS_TO_COPY}
+            ) for episode in episodes
+        ]
+        Episode.objects.bulk_create(episode_copies, batch_size=500)
+
+        from .tasks import finish_course_clones
+        new_ids = list(copy_ids.values())
+        transaction.on_commit(lambda: finish_course_clones.delay(new_ids))
+
+    logger.info(
+        f"Cloned {len(copies)} course(s) with {len(chapter_copies)} chapters and {len(episode_copies)} episodes")
+    return copies
@@ -0,0 +1,143 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Episode
+from enrollments.models import Enrollment
+from subscriptions.models import SubscriptionPlan, UserSubscription
+
+# Number of published videos per course that anyone can watch
+FREE_PREVIEW_EPISODES = 2
+
+# Lifetime of a user's cached entitlements. Payments, subscription and
+# enrollment changes invalidate them, expired subscriptions are skipped when
+# the entitlements are read.
+ENTITLEMENTS_CACHE_TIMEOUT = getattr(settings, 'ENTITLEMENTS_CACHE_TIMEOUT', 60)
+
+
+def _entitlements_key(user_id):
+    return f"courses:entitlements:{user_id}"
+
+
+def load_user_entitlements(user_id):
+    """
+    Load what a user has access to: their active subscriptions with the
+    courses each one includes, and the courses they are enrolled in.
+    """
+    subscriptions = list(UserSubscription.objects.filter(
+        user_id=user_id,
+        is_active=True,
+        end_date__gt=timezone.now()
+    ).select_related('subscription_plan'))
+
+    included_course_ids = {}
+    for plan_id, course_id in SubscriptionPlan.included_courses.through.objects.filter(
+            subscriptionplan_id__in={subscription.subscription_plan_id for subscription in subscriptions}
+    ).values_list('subscriptionplan_id', 'course_id'):
+        included_course_ids.setdefault(plan_id, set()).add(course_id)
+
+    return {
+        'subscriptions': [{
+            'id': subscription.id,
+            'end_date': subscription.end_date,
+            'plan_name': subscription.subscription_plan.name,
+            'plan_slug': subscription.subscription_plan.slug,
+            'course_ids': included_course_ids.get(subscription.subscription_plan_id, set()),
+        } for subscription in subscriptions],
+        'enrolled_course_ids': set(Enrollment.objects.filter(
+            user_id=user_id, is_active=True).values_list('course_id', flat=True)),
+    }
+
+
+def get_user_entitlements(user_id):
+    """Return the user's entitlements from the shared cache, loading them when missing"""
+    key = _entitlements_key(user_id)
+    entitlements = cache.get(key)
+    if entitlements is None:
+        entitlements = load_user_entitlements(user_id)
+        cache.set(key, entitlements, timeout=ENTITLEMENTS_CACHE_TIMEOUT)
+    return entitlements
+
+
+def invalidate_user_entitlements(*user_ids):
+    """Drop the cached entitlements of the users once the current transaction is committed"""
+    keys = [_entitlements_key(user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class EntitlementContext:
+    """
+    Per-request entitlement resolver.
+
+    Everything that decides what a user may access (subscriptions, the
+    courses they include, enrollments and free previews) is loaded once per
+    request, with the user's part shared between requests through a short
+    lived cache.
+    """
+
+    def __init__(self, user=None):
+        self.user = user if user is not None and user.is_authenticated else None
+        self._free_preview_ids = {}
+        self._entitlements = None
+
+    @classmethod
+    def for_request(cls, request):
+        """Return the context shared by everything serialized for this request"""
+        if request is None:
+            return cls()
+        entitlements = getattr(request, '_entitlements', None)
+        if entitlements is None:
+            entitlements = cls(getattr(request, 'user', None))
+            request._entitlements = entitlements
+        return entitlements
+
+    def free_preview_episode_ids(self, course_id):
+        if course_id not in self._free_preview_ids:
+            self._free_preview_ids[course_id] = set(Episode.objects.filter(
+                course_id=course_id,
+                status='published',
+                type='video',
+            ).order_by('chapter__number', 'order').values_list('id', flat=True)[:FREE_PREVIEW_EPISODES])
+        return self._free_preview_ids[course_id]
+
+    def is_free_preview(self, episode):
+        return episode.id in self.free_preview_episode_ids(episode.course_id)
+
+    def get_entitlements(self):
+        if self._entitlements is None:
+            if self.user is None:
+                self._entitlements = {'subscriptions': [], 'enrolled_course_ids': set()}
+            else:
+                self._entitlements = get_user_entitlements(self.user.pk)
+        return self._entitlements
+
+    def active_subscriptions(self):
+        """The user's subscriptions that have not ended yet"""
+        now = timezone.now()
+        return [subscription for subscription in self.get_entitlements()['subscriptions']
+                if subscription['end_date'] > now]
+
+    def subscribed_course_ids(self):
+        """IDs of the courses included in the user's active subscriptions"""
+        course_ids = set()
+        for subscription in self.active_subscriptions():
+            course_ids |= subscription['course_ids']
+        return course_ids
+
+    def has_subscription_access(self, course_id):
+        return any(course_id in subscription['course_ids']
+                   for subscription in self.active_subscriptions())
+
+    def granting_subscription(self, course_id):
+        """The active subscription including the course that ends last, if any"""
+        granting = [subscription for subscription in self.active_subscriptions()
+                    if course_id in subscription['course_ids']]
+        return max(granting, key=lambda subscription: subscription['end_date'], default=None)
+
+    def is_enrolled(self, course_id):
+        return course_id in self.get_entitlements()['enrolled_course_ids']
+
+    def can_view_content(self, episode):
+        return self.is_free_preview(episode) or self.has_subscription_access(episode.course_id)
@@ -0,0 +1,130 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from courses.models import Episode
+from courses.outline import bump_outline_version
+from courses.tasks import update_course_total_hours
+from courses.video_metadata import get_file_sizes, get_video_durations
+
+# Last processed episode and the courses to finish, kept in the shared
+# cache so an interrupted run resumes where it stopped
+CHECKPOINT_KEY = 'courses:backfill-episode-metadata:checkpoint'
+
+# Episodes missing each field
+MISSING_FIELDS = {
+    'duration': Q(type='video', duration__isnull=True) & ~Q(content_url=''),
+    'file_size': Q(type='file', file_size__isnull=True) & ~Q(content_url=''),
+    'word_count': Q(type='text', word_count__isnull=True),
+}
+
+
+class Command(BaseCommand):
+    help = 'Fill in the missing duration, file size and word count of episodes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--field', dest='fields', action='append', choices=list(MISSING_FIELDS),
+                            help='Only fill in this field (can be repeated), all fields by default.')
+        parser.add_argument('--chunk-size', type=int, default=200,
+                            help='Number of episodes loaded, probed and written at a time.')
+        parser.add_argument('--concurrency', type=int, default=None,
+                            help='Number of probes running at the same time.')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore the checkpoint of an interrupted run and start over.')
+
+    def handle(self, *args, **options):
+        fields = options['fields'] or list(MISSING_FIELDS)
+        missing = Q()
+        for field in fields:
+            missing |= MISSING_FIELDS[field]
+
+        checkpoint = None if options['restart'] else cache.get(CHECKPOINT_KEY)
+        if checkpoint and checkpoint['fields'] != fields:
+            self.stdout.write(f"Ignoring the checkpoint of a run for {', '.join(checkpoint['fields'])}")
+            checkpoint = None
+        checkpoint = checkpoint or {'last_pk': 0, 'course_ids': [], 'timed_course_ids': []}
+        last_pk = checkpoint['last_pk']
+        # Courses with new metadata, and those of them with new durations
+        course_ids = set(checkpoint['course_ids'])
+        timed_course_ids = set(checkpoint['timed_course_ids'])
+        if last_pk:
+            self.stdout.write(f"Resuming after episode {last_pk}")
+
+        started = time.monotonic()
+        processed = 0
+        filled = dict.fromkeys(fields, 0)
+        failed = dict.fromkeys(fields, 0)
+
+        while True:
+            episodes = list(Episode.objects.filter(missing, pk__gt=last_pk).order_by('pk').only(
+                'id', 'course_id', 'type', 'content_url', 'description', *fields)[:options['chunk_size']])
+            if not episodes:
+                break
+
+            needs = {field: [episode for episode in episodes if self._is_missing(episode, field)]
+                     for field in fields}
+            results = {}
+            if needs.get('duration'):
+                results['duration'] = get_video_durations(
+                    [episode.content_url for episode in needs['duration']], options['concurrency'])
+            if needs.get('file_size'):
+                results['file_size'] = get_file_sizes(
+                    [episode.content_url for episode in needs['file_size']], options['concurrency'])
+
+            changed = {}
+            for field, field_episodes in needs.items():
+                for episode in field_episodes:
+                    if field == 'word_count':
+                        value = len(episode.description.split())
+                    else:
+                        value = results[field].get(episode.content_url)
+                    if value is None:
+                        failed[field] += 1
+                        if options['verbosity'] > 1:
+                            self.stderr.write(f"Could not get the {field} of episode {episode.pk}")
+                        continue
+                    setattr(episode, field, value)
+                    changed.setdefault(episode.pk, episode)
+                    filled[field] += 1
+                    course_ids.add(episode.course_id)
+                    if field == 'duration':
+                        timed_course_ids.add(episode.course_id)
+
+            # bulk_update() skips Episode.save() and the tasks its signals queue
+            Episode.objects.bulk_update(list(changed.values()), fields)
+
+            processed += len(episodes)
+            last_pk = episodes[-1].pk
+            cache.set(CHECKPOINT_KEY, {
+                'fields': fields,
+                'last_pk': last_pk,
+                'course_ids': sorted(course_ids),
+                'timed_course_ids': sorted(timed_course_ids),
+            }, timeout=None)
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"{processed} episode(s) processed up to {last_pk}, "
+                f"{processed / elapsed if elapsed else 0:.1f}/s")
+
+        # Once per course, after all its episodes are written
+        for course_id in sorted(timed_course_ids):
+            update_course_total_hours(course_id)
+        # Outlines show the metadata
+        bump_outline_version(*course_ids)
+        cache.delete(CHECKPOINT_KEY)
+
+        elapsed = time.monotonic() - started
+        for field in fields:
+            self.stdout.write(f"{field}: {filled[field]} filled in, {failed[field]} failed")
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {processed} episode(s) of {len(course_ids)} course(s) in {elapsed:.1f}s"))
+
+    @staticmethod
+    def _is_missing(episode, field):
+        if field == 'duration':
+            return episode.type == 'video' and episode.duration is None and episode.content_url
+        if field == 'file_size':
+            return episode.type == 'file' and episode.file_size is None and episode.content_url
+        return episode.type == 'text' and episode.word_count is None
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from courses.cloning import clone_courses
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Duplicate courses with their chapters and episodes as drafts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('slugs', nargs='*', help='Slugs of the courses to duplicate')
+        parser.add_argument('--id', dest='course_ids', type=int, action='append', default=[],
+                            help='ID of a course to duplicate (can be repeated).')
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help='Number of courses cloned per transaction.')
+
+    def handle(self, *args, **options):
+        courses = list(Course.objects.filter(
+            Q(slug__in=options['slugs']) | Q(id__in=options['course_ids'])).order_by('id'))
+        if not courses:
+            raise CommandError('No matching courses found')
+
+        batch_size = options['batch_size']
+        for start in range(0, len(courses), batch_size):
+            for copy in clone_courses(courses[start:start + batch_size]):
+                self.stdout.write(f"Created {copy.slug} ({copy.id})")
+        self.stdout.write(self.style.SUCCESS(
+            f"Duplicated {len(courses)} course(s) as drafts"))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from courses.models import Course
+from courses.publishing import publish_courses, schedule_course_publishing
+
+
+class Command(BaseCommand):
+    help = 'Publish courses and their episodes, now or at a given time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('slugs', nargs='*', help='Slugs of the courses to publish')
+        parser.add_argument('--id', dest='course_ids', type=int, action='append', default=[],
+                            help='ID of a course to publish (can be repeated).')
+        parser.add_argument('--at', dest='publish_at',
+                            help='Publish at this ISO 8601 date and time instead of now, via celery beat.')
+
+    def handle(self, *args, **options):
+        course_ids = list(Course.objects.filter(
+            Q(slug__in=options['slugs']) | Q(id__in=options['course_ids'])
+        ).order_by('id').values_list('id', flat=True))
+        if not course_ids:
+            raise CommandError('No matching courses found')
+
+        if options['publish_at']:
+            publish_at = parse_datetime(options['publish_at'])
+            if publish_at is None:
+                raise CommandError(f"Invalid date and time: {options['publish_at']}")
+            if timezone.is_naive(publish_at):
+                publish_at = timezone.make_aware(publish_at)
+            task = schedule_course_publishing(course_ids, publish_at)
+            self.stdout.write(self.style.SUCCESS(
+                f"Scheduled {len(course_ids)} course(s) for {publish_at.isoformat()} ({task.name})"))
+            return
+
+        published_count, updated_count = publish_courses(course_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f"Published {published_count} course(s), {updated_count} were already published"))
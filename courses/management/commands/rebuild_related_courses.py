@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from courses.related import refresh_related_courses
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed related courses shown on course detail pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course',
+            dest='course_ids',
+            type=int,
+            action='append',
+            default=None,
+            help='Only rebuild the rows this course ID can affect (can be repeated).',
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = refresh_related_courses(options['course_ids'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt related courses of {rebuilt} course(s)"))
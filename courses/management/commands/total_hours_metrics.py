@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from courses.total_hours import get_total_hours_metrics, reset_total_hours_metrics
+
+
+class Command(BaseCommand):
+    help = 'Show how many course total hours recomputations were debounced'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='Reset the counters after showing them.')
+
+    def handle(self, *args, **options):
+        metrics = get_total_hours_metrics()
+        for name, value in metrics.items():
+            self.stdout.write(f"{name}: {value}")
+        if metrics['requested']:
+            self.stdout.write(
+                f"{metrics['coalesced'] / metrics['requested']:.0%} of the requests were coalesced")
+        if options['reset']:
+            reset_total_hours_metrics()
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
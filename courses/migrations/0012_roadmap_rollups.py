@@ -0,0 +1,48 @@
+# Generated by Django 4.2 on 2026-10-17 06:06
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_roadmap_rollups(apps, schema_editor):
+    RoadMap = apps.get_model('courses', 'RoadMap')
+    Episode = apps.get_model('courses', 'Episode')
+
+    for roadmap in RoadMap.objects.all():
+        published_courses = roadmap.courses.filter(status='published')
+        totals = published_courses.aggregate(
+            courses_count=Count('id'), hours=Sum('total_hours'))
+        RoadMap.objects.filter(pk=roadmap.pk).update(
+            published_courses_count=totals['courses_count'],
+            total_hours=round(totals['hours'] or 0, 1),
+            total_videos=Episode.objects.filter(
+                course__in=published_courses, status='published').count()
+        )
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0011_course_excerpt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roadmap',
+            name='published_courses_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد دوره\u200cهای منتشر شده'),
+        ),
+        migrations.AddField(
+            model_name='roadmap',
+            name='total_hours',
+            field=models.DecimalField(decimal_places=1, default=0, max_digits=7, verbose_name='مجموع ساعات'),
+        ),
+        migrations.AddField(
+            model_name='roadmap',
+            name='total_videos',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد اپیزودهای منتشر شده'),
+        ),
+        migrations.RunPython(populate_roadmap_rollups,
+                             migrations.RunPython.noop),
+    ]
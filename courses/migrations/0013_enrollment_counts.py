@@ -0,0 +1,45 @@
+# Generated by Django 4.2 on 2026-10-17 06:11
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_enrollment_counts(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    RoadMap = apps.get_model('courses', 'RoadMap')
+    Enrollment = apps.get_model('enrollments', 'Enrollment')
+
+    counts = Enrollment.objects.order_by().values(
+        'course_id').annotate(total=Count('id'))
+    for row in counts:
+        Course.objects.filter(pk=row['course_id']).update(
+            enrollment_count=row['total'])
+
+    for roadmap in RoadMap.objects.all():
+        RoadMap.objects.filter(pk=roadmap.pk).update(
+            enrollment_count=roadmap.courses.aggregate(
+                total=Sum('enrollment_count'))['total'] or 0)
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0012_roadmap_rollups'),
+        ('enrollments', '0002_enrollment_completion_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='enrollment_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, verbose_name='تعداد ثبت نام\u200cها'),
+        ),
+        migrations.AddField(
+            model_name='roadmap',
+            name='enrollment_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, verbose_name='تعداد ثبت نام\u200cها'),
+        ),
+        migrations.RunPython(populate_enrollment_counts,
+                             migrations.RunPython.noop),
+    ]
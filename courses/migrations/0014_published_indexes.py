@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-17 06:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0013_enrollment_counts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['status', 'published_at'], name='course_status_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['status', 'enrollment_count'], name='course_status_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='episode',
+            index=models.Index(fields=['course', 'status', 'type'], name='episode_course_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='roadmap',
+            index=models.Index(fields=['status', 'published_at'], name='roadmap_status_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='roadmap',
+            index=models.Index(fields=['status', 'enrollment_count'], name='roadmap_status_popular_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2 on 2026-10-17 06:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_related_courses(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    RelatedCourse = apps.get_model('courses', 'RelatedCourse')
+
+    published_at = dict(Course.objects.filter(
+        status='published').values_list('id', 'published_at'))
+    scores = {}
+    for relation, weight in (('categories', 3), ('teachers', 2), ('tags', 1)):
+        field = Course._meta.get_field(relation)
+        item_courses = {}
+        for course_id, item_id in field.remote_field.through.objects.filter(
+                course_id__in=published_at).values_list('course_id', f"{field.m2m_reverse_field_name()}_id"):
+            item_courses.setdefault(item_id, set()).add(course_id)
+        for course_ids in item_courses.values():
+            for course_id in course_ids:
+                course_scores = scores.setdefault(course_id, {})
+                for other_id in course_ids:
+                    if other_id != course_id and course_scores.get(other_id, 0) < weight:
+                        course_scores[other_id] = weight
+
+    rows = []
+    for course_id, course_scores in scores.items():
+        ranked = sorted(course_scores.items(), key=lambda pair: (
+            -pair[1], -published_at[pair[0]].timestamp() if published_at[pair[0]] else 0, pair[0]))
+        rows.extend(RelatedCourse(course_id=course_id, related_course_id=related_id, score=score)
+                    for related_id, score in ranked[:10])
+    RelatedCourse.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0014_published_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedCourse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveSmallIntegerField(verbose_name='امتیاز ارتباط')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='courses.course', verbose_name='دوره')),
+                ('related_course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_to_entries', to='courses.course', verbose_name='دوره مرتبط')),
+            ],
+            options={
+                'verbose_name': 'دوره مرتبط',
+                'verbose_name_plural': 'دوره\u200cهای مرتبط',
+                'unique_together': {('course', 'related_course')},
+            },
+        ),
+        migrations.RunPython(populate_related_courses,
+                             migrations.RunPython.noop),
+    ]
@@ -1,14 +1,30 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
 
-from subscriptions.models import UserSubscription
 from taxonomy.models import Category, Tag
 from accounts.models import Organizer, Teacher
 
 
+class TracksLoadedStatus:
+    """
+    Model mixin keeping the stored status in _loaded_status, so signal
+    handlers can detect publish/unpublish transitions
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_status = self.status
+
+
 class Attribute(models.Model):
     # Define icon choices based on available icons in the frontend
     ICON_CHOICES = (
@@ -46,7 +62,7 @@ class Attribute(models.Model):
         verbose_name_plural = 'ویژگی‌ها'
 
 
-class Course(models.Model):
+class Course(TracksLoadedStatus, models.Model):
     PUBLISHED_STATUS = (
         ('draft', 'پیش‌نویس'),
         ('published', 'منتشر شده'),
@@ -82,6 +98,9 @@ class Course(models.Model):
     intro_video_link = models.URLField(verbose_name='لینک ویدیو معرفی')
     total_hours = models.DecimalField(
         max_digits=5, decimal_places=1, default=0, verbose_name='مجموع ساعات')
+    # Maintained by the enrollment signals, used to rank popular courses
+    enrollment_count = models.PositiveIntegerField(
+        default=0, db_index=True, verbose_name='تعداد ثبت نام‌ها')
 
     # Relationships
     organizers = models.ManyToManyField(
@@ -106,6 +125,13 @@ class Course(models.Model):
     class Meta:
         verbose_name = 'دوره'
         verbose_name_plural = 'دوره‌ها'
+        indexes = [
+            # Published listings: status='published', published_at__lte=now
+            models.Index(fields=['status', 'published_at'],
+                         name='course_status_published_idx'),
+            models.Index(fields=['status', 'enrollment_count'],
+                         name='course_status_popular_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         # Set published_at when status changes to published
@@ -115,13 +141,8 @@ class Course(models.Model):
 
     def is_free_for_user(self, user):
         """Check if the course is free for a specific user via their subscriptions"""
-        from django.utils import timezone
-        return UserSubscription.objects.filter(
-            user=user,
-            is_active=True,
-            end_date__gt=timezone.now(),
-            subscription_plan__included_courses=self
-        ).exists()
+        from .entitlements import EntitlementContext
+        return EntitlementContext(user).has_subscription_access(self.id)
 
     def has_active_special_offer(self):
         """Check if the course currently has an active special offer"""
@@ -155,7 +176,7 @@ class Chapter(models.Model):
         verbose_name_plural = 'فصل‌ها'
 
 
-class Episode(models.Model):
+class Episode(TracksLoadedStatus, models.Model):
     EPISODE_TYPES = (
         ('video', 'ویدیو'),
         ('file', 'فایل'),
@@ -213,6 +234,11 @@ class Episode(models.Model):
         verbose_name = 'اپیزود'
         verbose_name_plural = 'اپیزودها'
         ordering = ['order']
+        indexes = [
+            # Published episodes of a course (outlines, free previews, totals)
+            models.Index(fields=['course', 'status', 'type'],
+                         name='episode_course_status_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         # Set published_at when status changes to published
@@ -266,6 +292,17 @@ class RoadMap(models.Model):
     published_at = models.DateTimeField(
         null=True, blank=True, verbose_name='تاریخ انتشار')
 
+    # Rollups of the published courses, maintained by refresh_rollups()
+    published_courses_count = models.PositiveIntegerField(
+        default=0, verbose_name='تعداد دوره‌های منتشر شده')
+    total_hours = models.DecimalField(
+        max_digits=7, decimal_places=1, default=0, verbose_name='مجموع ساعات')
+    total_videos = models.PositiveIntegerField(
+        default=0, verbose_name='تعداد اپیزودهای منتشر شده')
+    # Enrollments of all the roadmap's courses, used to rank popular roadmaps
+    enrollment_count = models.PositiveIntegerField(
+        default=0, db_index=True, verbose_name='تعداد ثبت نام‌ها')
+
     def __str__(self):
         return self.name
 
@@ -277,6 +314,28 @@ class RoadMap(models.Model):
         """Return the published courses associated with this roadmap."""
         return self.courses.filter(status='published')
 
+    def refresh_rollups(self):
+        """Recalculate the stored totals of the roadmap's published courses and its enrollment count"""
+        published_courses = self.get_courses()
+        totals = published_courses.aggregate(
+            courses_count=models.Count('id'),
+            hours=models.Sum('total_hours')
+        )
+        self.published_courses_count = totals['courses_count']
+        self.total_hours = round(totals['hours'] or 0, 1)
+        self.total_videos = Episode.objects.filter(
+            course__in=published_courses,
+            status='published'
+        ).count()
+        self.enrollment_count = self.courses.aggregate(
+            total=models.Sum('enrollment_count'))['total'] or 0
+        RoadMap.objects.filter(pk=self.pk).update(
+            published_courses_count=self.published_courses_count,
+            total_hours=self.total_hours,
+            total_videos=self.total_videos,
+            enrollment_count=self.enrollment_count
+        )
+
     def save(self, *args, **kwargs):
         # Set published_at when status changes to published
         if self.status == 'published' and not self.published_at:
@@ -286,6 +345,29 @@ class RoadMap(models.Model):
     class Meta:
         verbose_name = 'نقشه راه'
         verbose_name_plural = 'نقشه‌های راه'
+        indexes = [
+            models.Index(fields=['status', 'published_at'],
+                         name='roadmap_status_published_idx'),
+            models.Index(fields=['status', 'enrollment_count'],
+                         name='roadmap_status_popular_idx'),
+        ]
+
+
+class RelatedCourse(models.Model):
+    """Precomputed related course of a course, maintained by courses.related"""
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name='related_entries', verbose_name='دوره')
+    related_course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name='related_to_entries', verbose_name='دوره مرتبط')
+    score = models.PositiveSmallIntegerField(verbose_name='امتیاز ارتباط')
+
+    class Meta:
+        verbose_name = 'دوره مرتبط'
+        verbose_name_plural = 'دوره‌های مرتبط'
+        unique_together = ['course', 'related_course']
+
+    def __str__(self):
+        return f"{self.course_id} -> {self.related_course_id} ({self.score})"
 
 
 @receiver(post_save, sender=Episode)
@@ -304,6 +386,7 @@ def update_course_hours_after_episode_change(sender, instance, **kwargs):
     """
     # Only process for video episodes with duration
     if instance.type == 'video':
-        from .tasks import update_course_total_hours
-        # Schedule the task to update course hours
-        update_course_total_hours.delay(instance.course.id)
+        from .total_hours import schedule_course_total_hours
+        # Changes within the debounce window share one recomputation
+        course_id = instance.course_id
+        transaction.on_commit(lambda: schedule_course_total_hours(course_id))
@@ -0,0 +1,111 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from enrollments.models import UserProgress
+from .cache import course_tag, invalidate_after_commit
+from .entitlements import EntitlementContext
+from .models import Episode
+from .serializers import EpisodeSerializer
+
+# Outlines only change with their content, a version bump replaces them
+COURSE_OUTLINE_TIMEOUT = getattr(settings, 'COURSE_OUTLINE_TIMEOUT', 24 * 60 * 60)
+
+
+def _version_key(course_id):
+    return f"courses:outline-version:{course_id}"
+
+
+def get_outline_version(course_id):
+    """
+    Current outline version of a course.
+
+    Versions are random like the cache tag versions, so an evicted version
+    can never match an outline cached under the old one.
+    """
+    key = _version_key(course_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_outline_version(*course_ids):
+    """Replace the cached outlines of the given courses"""
+    cache.delete_many([_version_key(course_id) for course_id in course_ids])
+
+
+def invalidate_outlines_after_commit(*course_ids):
+    """Replace the outlines and the cached responses embedding them once committed"""
+    transaction.on_commit(lambda: bump_outline_version(*course_ids))
+    invalidate_after_commit(*[course_tag(course_id) for course_id in course_ids])
+
+
+def build_course_outline(course_id):
+    """
+    Serialize the chapter/episode tree of a course as an anonymous user sees it.
+
+    Chapters without published episodes are left out. The content URLs of
+    the episodes that are not free previews are kept aside in content_urls,
+    so they can be shown to users with access.
+    """
+    episodes = Episode.objects.filter(
+        course_id=course_id, status='published'
+    ).select_related('chapter').order_by('chapter__number', 'order')
+
+    # Free previews are resolved once, without any user specific access
+    entitlements = EntitlementContext()
+
+    chapters = {}
+    content_urls = {}
+    for episode in episodes:
+        chapter = chapters.get(episode.chapter_id)
+        if chapter is None:
+            chapter = chapters[episode.chapter_id] = {
+                'id': episode.chapter.id,
+                'title': episode.chapter.title,
+                'number': episode.chapter.number,
+                'episodes': []
+            }
+        chapter['episodes'].append(EpisodeSerializer(
+            episode, context={'entitlements': entitlements}).data)
+        content_urls[episode.id] = episode.content_url
+
+    return {
+        'chapters': sorted(chapters.values(), key=lambda chapter: chapter['number']),
+        'content_urls': content_urls,
+    }
+
+
+def get_course_outline(course_id):
+    """Return the course outline, cached per course and outline version"""
+    key = f"courses:outline:{course_id}:{get_outline_version(course_id)}"
+    outline = cache.get(key)
+    if outline is None:
+        outline = build_course_outline(course_id)
+        cache.set(key, outline, timeout=COURSE_OUTLINE_TIMEOUT)
+    return outline
+
+
+def show_content_urls(chapters, content_urls):
+    """Reveal the content URL of every episode, for users with access to the course"""
+    for chapter in chapters:
+        for episode in chapter['episodes']:
+            episode['content_url'] = content_urls.get(episode['id'], episode['content_url'])
+
+
+def add_progress(chapters, progress_by_episode):
+    """Add the user's progress to every episode"""
+    for chapter in chapters:
+        for episode in chapter['episodes']:
+            # Episodes not started yet show the defaults of a new progress row
+            progress = progress_by_episode.get(episode['id']) or UserProgress()
+            episode['progress'] = {
+                'percentage': progress.progress_percentage,
+                'last_position': progress.last_position,
+                'completed': progress.completed,
+                'completed_at': progress.completed_at
+            }
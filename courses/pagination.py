@@ -0,0 +1,221 @@
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import F, IntegerField, Q, Value
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from search.index import search_ids
+from .models import Course, RoadMap
+
+# Rank used to order courses before roadmaps when the sort key ties
+CONTENT_RANKS = {'course': 0, 'roadmap': 1}
+
+# Keyset orderings of the combined stream: (column, descending)
+CURSOR_ORDERINGS = {
+    'newest': [('published_at', True), ('content_rank', False), ('id', True)],
+    'popular': [('popularity', True), ('content_rank', False), ('id', False)],
+    'default': [('id', False), ('content_rank', False)],
+}
+
+DURATION_RANGES = {
+    'upto30min': {'lte': 0.5},
+    '30min2hours': {'gt': 0.5, 'lte': 2},
+    '2to5hours': {'gt': 2, 'lte': 5},
+    'morethan5hours': {'gt': 5},
+}
+
+
+def _duration_q(prefix, durations):
+    duration_q = Q()
+    for duration in durations:
+        bounds = DURATION_RANGES.get(duration)
+        if bounds:
+            duration_q |= Q(**{f"{prefix}total_hours__{lookup}": value
+                               for lookup, value in bounds.items()})
+    return duration_q
+
+
+def published_courses(search_query='', categories=None, organizers=None, durations=None):
+    """Published courses matching the course list filters, without joins in the outer query"""
+    queryset = Course.objects.filter(
+        status='published',
+        published_at__lte=timezone.now()
+    )
+    if search_query:
+        queryset = queryset.filter(id__in=search_ids(search_query, 'course'))
+    if categories:
+        queryset = queryset.filter(id__in=Course.objects.filter(
+            categories__slug__in=categories).values('id'))
+    if organizers:
+        queryset = queryset.filter(id__in=Course.objects.filter(
+            organizers__organization_slug__in=organizers).values('id'))
+    if durations:
+        duration_q = _duration_q('', durations)
+        if duration_q:
+            queryset = queryset.filter(duration_q)
+    return queryset
+
+
+def published_roadmaps(search_query='', categories=None, organizers=None, durations=None):
+    """Published roadmaps matching the course list filters, without joins in the outer query"""
+    queryset = RoadMap.objects.filter(
+        status='published',
+        published_at__lte=timezone.now()
+    )
+    if search_query:
+        queryset = queryset.filter(id__in=search_ids(search_query, 'roadmap'))
+    if categories:
+        queryset = queryset.filter(id__in=RoadMap.objects.filter(
+            courses__categories__slug__in=categories).values('id'))
+    if organizers:
+        queryset = queryset.filter(id__in=RoadMap.objects.filter(
+            courses__organizers__organization_slug__in=organizers).values('id'))
+    if durations:
+        duration_q = _duration_q('courses__', durations)
+        if duration_q:
+            queryset = queryset.filter(
+                id__in=RoadMap.objects.filter(duration_q).values('id'))
+    return queryset
+
+
+class ContentCursorPagination:
+    """
+    Keyset pagination of the combined course/roadmap stream.
+
+    Both content types are projected onto the same columns and merged with
+    a UNION ALL inside the database. The cursor stores the sort key of the
+    last row of the page, so every page is a bounded index range scan
+    instead of an OFFSET over the whole catalog.
+    """
+    page_size = 8
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    cursor_query_param = 'cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(
+                self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def encode_cursor(self, sort, row):
+        position = []
+        for column, _ in CURSOR_ORDERINGS[sort]:
+            value = row[column]
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            position.append(value)
+        payload = json.dumps({'sort': sort, 'position': position})
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, sort, encoded):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            position = payload['position']
+            if payload['sort'] != sort or len(position) != len(CURSOR_ORDERINGS[sort]):
+                raise ValueError
+        except (TypeError, ValueError, KeyError, json.JSONDecodeError):
+            raise NotFound('Invalid cursor')
+
+        position = dict(zip([column for column, _ in CURSOR_ORDERINGS[sort]], position))
+        if 'published_at' in position:
+            try:
+                position['published_at'] = datetime.fromisoformat(
+                    position['published_at'])
+            except (TypeError, ValueError):
+                raise NotFound('Invalid cursor')
+        return position
+
+    def _after_cursor_q(self, sort, position, content_rank):
+        """
+        Rows of one branch that sort strictly after the cursor position.
+
+        The content rank is constant within a branch, so its comparisons are
+        resolved here instead of in SQL.
+        """
+        condition = Q(pk__in=[])
+        equal_prefix = Q()
+        for column, descending in CURSOR_ORDERINGS[sort]:
+            value = position[column]
+            if column == 'content_rank':
+                if content_rank > value:
+                    condition |= equal_prefix
+                if content_rank != value:
+                    return condition
+                continue
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal_prefix & Q(**{f"{column}__{lookup}": value})
+            equal_prefix &= Q(**{column: value})
+        return condition
+
+    def _project(self, queryset, content_type, sort, position):
+        content_rank = CONTENT_RANKS[content_type]
+        queryset = queryset.order_by().annotate(
+            content_rank=Value(content_rank, output_field=IntegerField()),
+            popularity=F('enrollment_count'),
+        )
+        if position is not None:
+            queryset = queryset.filter(
+                self._after_cursor_q(sort, position, content_rank))
+        return queryset.values('id', 'published_at', 'content_rank', 'popularity')
+
+    def paginate(self, request, courses_queryset, roadmaps_queryset, sort):
+        """
+        Return the (content_type, id) keys of the requested page.
+
+        Either queryset may be None to leave that content type out.
+        """
+        if sort not in CURSOR_ORDERINGS:
+            sort = 'default'
+        self.request = request
+        self.sort = sort
+        self.page_size_value = self.get_page_size(request)
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        position = self.decode_cursor(sort, encoded) if encoded else None
+
+        branches = []
+        if courses_queryset is not None:
+            branches.append(self._project(
+                courses_queryset, 'course', sort, position))
+        if roadmaps_queryset is not None:
+            branches.append(self._project(
+                roadmaps_queryset, 'roadmap', sort, position))
+        if not branches:
+            self.next_cursor = None
+            return []
+
+        stream = branches[0]
+        if len(branches) > 1:
+            stream = stream.union(*branches[1:], all=True)
+        ordering = [f"-{column}" if descending else column
+                    for column, descending in CURSOR_ORDERINGS[sort]]
+        rows = list(stream.order_by(*ordering)[:self.page_size_value + 1])
+
+        has_next = len(rows) > self.page_size_value
+        rows = rows[:self.page_size_value]
+        self.next_cursor = self.encode_cursor(sort, rows[-1]) if has_next else None
+
+        content_types = {rank: content_type for content_type,
+                         rank in CONTENT_RANKS.items()}
+        return [(content_types[row['content_rank']], row['id']) for row in rows]
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
@@ -0,0 +1,96 @@
+import json
+import logging
+import uuid
+
+from django.db import transaction
+from django.utils import timezone
+from django_celery_beat.models import ClockedSchedule, PeriodicTask
+
+from core.cache import invalidate_tags
+from .cache import COURSE_LIST_TAG, course_tag
+from .catalog import invalidate_catalog_index
+from .models import Course, Episode, RoadMap
+from .outline import bump_outline_version
+from .total_hours import schedule_course_total_hours
+
+logger = logging.getLogger(__name__)
+
+
+def publish_courses(course_ids, now=None):
+    """
+    Publish courses and all of their episodes.
+
+    Everything is written with a few UPDATE queries in one transaction, so
+    no save signal runs per course or episode. What those signals would have
+    done is done once per course after commit, see after_courses_published.
+    Returns the number of newly published courses and of courses that were
+    published already.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        statuses = dict(Course.objects.select_for_update().filter(
+            id__in=course_ids).values_list('id', 'status'))
+        course_ids = list(statuses)
+        newly_published = [course_id for course_id, status in statuses.items()
+                           if status != 'published']
+
+        Course.objects.filter(id__in=newly_published).update(
+            status='published', updated_at=now)
+        # published_at is kept when already set, e.g. for scheduled courses
+        Course.objects.filter(id__in=course_ids, published_at__isnull=True).update(
+            published_at=now, updated_at=now)
+
+        episodes = Episode.objects.filter(course_id__in=course_ids)
+        changed_course_ids = list(set(episodes.exclude(status='published').values_list(
+            'course_id', flat=True)))
+        episodes.exclude(status='published').update(status='published', updated_at=now)
+        episodes.filter(published_at__isnull=True).update(published_at=now, updated_at=now)
+
+        transaction.on_commit(lambda: after_courses_published(
+            course_ids, newly_published, changed_course_ids))
+
+    logger.info(
+        f"Published {len(newly_published)} course(s), {len(course_ids) - len(newly_published)} already published")
+    return len(newly_published), len(course_ids) - len(newly_published)
+
+
+def after_courses_published(course_ids, newly_published_ids, episode_course_ids):
+    """
+    Refresh everything derived from the published courses once per course:
+    what Course and Episode save signals do row by row
+    """
+    from enrollments.tasks import refresh_course_enrollment_counters
+    from search.autocomplete import invalidate_autocomplete_index
+    from search.index import update_objects
+    from .tasks import rebuild_related_courses, refresh_roadmap_rollups
+
+    for course_id in episode_course_ids:
+        schedule_course_total_hours(course_id)
+        refresh_course_enrollment_counters.delay(course_id)
+    roadmap_ids = list(set(RoadMap.objects.filter(
+        courses__in=course_ids).values_list('id', flat=True)))
+    if roadmap_ids:
+        refresh_roadmap_rollups.delay(roadmap_ids)
+    if newly_published_ids:
+        rebuild_related_courses.delay(newly_published_ids)
+
+    bump_outline_version(*episode_course_ids)
+    invalidate_tags(COURSE_LIST_TAG, *[course_tag(course_id) for course_id in course_ids])
+    invalidate_catalog_index()
+    update_objects('course', course_ids)
+    invalidate_autocomplete_index()
+
+
+def schedule_course_publishing(course_ids, publish_at):
+    """
+    Publish the courses at publish_at with a one-off django-celery-beat task.
+    Returns the PeriodicTask, which can be deleted to cancel the publishing.
+    """
+    clocked, _ = ClockedSchedule.objects.get_or_create(clocked_time=publish_at)
+    return PeriodicTask.objects.create(
+        name=f"Publish course(s) {', '.join(map(str, course_ids))} at {publish_at.isoformat()} ({uuid.uuid4().hex[:8]})"[:200],
+        task='courses.tasks.publish_scheduled_courses',
+        clocked=clocked,
+        one_off=True,
+        args=json.dumps([list(course_ids)]),
+    )
@@ -0,0 +1,111 @@
+import logging
+
+from django.db import transaction
+
+from .cache import course_tag, invalidate_after_commit
+from .models import Course, RelatedCourse
+
+logger = logging.getLogger(__name__)
+
+# Related courses stored per course. The detail page shows fewer, the rest
+# stand in for related courses that are not visible yet (scheduled).
+RELATED_COURSES_LIMIT = 10
+
+# Score of sharing an item of each relation, the strongest shared relation
+# wins (same category, then same teacher, then similar tags)
+RELATION_WEIGHTS = (
+    ('categories', 3),
+    ('teachers', 2),
+    ('tags', 1),
+)
+
+
+class CourseGraph:
+    """Taxonomy of the published courses, loaded with one query per relation"""
+
+    def __init__(self):
+        self.published_at = dict(Course.objects.filter(
+            status='published').values_list('id', 'published_at'))
+        # {relation: {course_id: {item ids}}} and {relation: {item_id: {course ids}}}
+        self.items = {}
+        self.courses = {}
+        for relation, _ in RELATION_WEIGHTS:
+            field = Course._meta.get_field(relation)
+            course_items = self.items[relation] = {}
+            item_courses = self.courses[relation] = {}
+            rows = field.remote_field.through.objects.filter(**{
+                f"{field.m2m_field_name()}_id__in": self.published_at
+            }).values_list(f"{field.m2m_field_name()}_id", f"{field.m2m_reverse_field_name()}_id")
+            for course_id, item_id in rows:
+                course_items.setdefault(course_id, set()).add(item_id)
+                item_courses.setdefault(item_id, set()).add(course_id)
+
+    def neighbours(self, course_id):
+        """Published courses sharing at least one taxonomy item with the course"""
+        neighbours = set()
+        for relation, _ in RELATION_WEIGHTS:
+            for item_id in self.items[relation].get(course_id, ()):
+                neighbours |= self.courses[relation][item_id]
+        neighbours.discard(course_id)
+        return neighbours
+
+    def rank(self, course_id, limit=RELATED_COURSES_LIMIT):
+        """Return the top (related course id, score) pairs of a published course"""
+        scores = {}
+        for relation, weight in RELATION_WEIGHTS:
+            for item_id in self.items[relation].get(course_id, ()):
+                for other_id in self.courses[relation][item_id]:
+                    if other_id != course_id and scores.get(other_id, 0) < weight:
+                        scores[other_id] = weight
+
+        def sort_key(pair):
+            # Same order as the detail page: score, then the newest first
+            published_at = self.published_at[pair[0]]
+            return (-pair[1], -published_at.timestamp() if published_at else 0, pair[0])
+
+        return sorted(scores.items(), key=sort_key)[:limit]
+
+
+def refresh_related_courses(course_ids=None):
+    """
+    Recompute the stored related courses.
+
+    With course_ids, only the rows that can change are rebuilt: those of the
+    given courses, of the courses sharing taxonomy with them and of the
+    courses currently listing them. Returns the number of courses rebuilt.
+    """
+    graph = CourseGraph()
+    if course_ids is None:
+        affected = set(graph.published_at) | set(
+            RelatedCourse.objects.values_list('course_id', flat=True).distinct())
+    else:
+        affected = set(course_ids)
+        for course_id in course_ids:
+            affected |= graph.neighbours(course_id)
+        affected |= set(RelatedCourse.objects.filter(
+            related_course_id__in=course_ids).values_list('course_id', flat=True))
+
+    current = {}
+    for course_id, related_id, score in RelatedCourse.objects.filter(
+            course_id__in=affected).values_list('course_id', 'related_course_id', 'score'):
+        current.setdefault(course_id, set()).add((related_id, score))
+
+    rows = []
+    changed = []
+    for course_id in affected:
+        ranked = graph.rank(course_id) if course_id in graph.published_at else []
+        if set(ranked) != current.get(course_id, set()):
+            changed.append(course_id)
+            rows.extend(RelatedCourse(course_id=course_id, related_course_id=related_id, score=score)
+                        for related_id, score in ranked)
+
+    if changed:
+        with transaction.atomic():
+            RelatedCourse.objects.filter(course_id__in=changed).delete()
+            RelatedCourse.objects.bulk_create(rows)
+            # Cached detail pages embed the related courses
+            invalidate_after_commit(*[course_tag(course_id) for course_id in changed])
+
+    logger.info(
+        f"Rebuilt related courses of {len(changed)} of {len(affected)} affected course(s)")
+    return len(changed)
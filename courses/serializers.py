@@ -1,10 +1,11 @@
+from django.db.models import Count, Prefetch
 from rest_framework import serializers
+from accounts.models import Teacher
 from accounts.serializers import OrganizerSerializer, TeacherSerializer
 from taxonomy.serializers import CategorySerializer, TagSerializer
 from .models import Course, Episode, Chapter, Attribute, RoadMap
+from .entitlements import EntitlementContext
 from enrollments.models import Enrollment
-from subscriptions.models import UserSubscription  # Add this import
-from django.utils import timezone  # Add this import
 
 
 class AttributeSerializer(serializers.ModelSerializer):
@@ -26,41 +27,24 @@ class EpisodeSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['order', 'is_free']
 
+    def get_entitlements(self):
+        """Entitlement data shared by every episode serialized in this request"""
+        entitlements = self.context.get('entitlements')
+        if entitlements is None:
+            entitlements = EntitlementContext.for_request(
+                self.context.get('request'))
+            self.context['entitlements'] = entitlements
+        return entitlements
+
     def get_is_free(self, obj):
         # Determine if the episode is one of the first two free ones
-        first_two_episodes = Episode.objects.filter(
-            course=obj.course,
-            status='published',
-            # Consider if 'type' filter is needed here, e.g., only 'video'
-            type='video',
-            # Order by chapter then episode order
-        ).order_by('chapter__number', 'order')[:2]
-
-        # Create a list of IDs for efficient checking
-        first_two_episode_ids = [ep.id for ep in first_two_episodes]
-        return obj.id in first_two_episode_ids
+        return self.get_entitlements().is_free_preview(obj)
 
     def get_content_url(self, obj):
-        request = self.context.get('request')
-        user = request.user if request and hasattr(request, 'user') else None
-
-        # Use the is_free logic from get_is_free
-        if self.get_is_free(obj):
+        # Free previews are public, other episodes need subscription access
+        if self.get_entitlements().can_view_content(obj):
             return obj.content_url
 
-        # If user is authenticated, check for subscription access
-        if user and user.is_authenticated:
-            # Check if user has an active subscription that includes this course
-            has_subscription_access = UserSubscription.objects.filter(
-                user=user,
-                is_active=True,
-                end_date__gt=timezone.now(),
-                subscription_plan__included_courses=obj.course  # obj is an Episode instance
-            ).exists()
-
-            if has_subscription_access:
-                return obj.content_url
-
         # Otherwise, (not free, not authenticated, or no subscription access)
         # don't provide the content URL
         return None
@@ -86,6 +70,15 @@ class CourseSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'latin_title', 'slug', 'cover_image_url', 'description', 'excerpt',
                   'total_hours', 'published_at', 'teachers', 'organizers', 'categories', 'attributes', 'status']
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Prefetch everything the serializer reads, so a list costs a fixed number of queries"""
+        return queryset.prefetch_related(
+            Prefetch('teachers', queryset=Teacher.objects.annotate(
+                courses_total=Count('teaching_courses'))),
+            'organizers', 'categories', 'attributes'
+        )
+
     def get_cover_image_url(self, obj):
         if obj.cover_image:
             return obj.cover_image.url
@@ -98,7 +91,6 @@ class CourseDetailSerializer(serializers.ModelSerializer):
     categories = CategorySerializer(many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     attributes = AttributeSerializer(many=True, read_only=True)
-    chapters = ChapterSerializer(many=True, read_only=True)
     cover_image_url = serializers.SerializerMethodField()
     is_enrolled = serializers.SerializerMethodField()
     is_accessible_via_subscription = serializers.SerializerMethodField()  # New field
@@ -107,7 +99,8 @@ class CourseDetailSerializer(serializers.ModelSerializer):
         model = Course
         fields = ['id', 'title', 'latin_title', 'slug', 'cover_image_url', 'description', 'excerpt', 'intro_video_link',
                   'total_hours', 'published_at', 'teachers', 'organizers',
-                  'categories', 'tags', 'attributes', 'chapters', 'status',
+                  # 'chapters' are built by the views from published episodes only
+                  'categories', 'tags', 'attributes', 'status',
                   'is_enrolled', 'is_accessible_via_subscription']  # Added new field
 
     def get_cover_image_url(self, obj):
@@ -120,11 +113,11 @@ class CourseDetailSerializer(serializers.ModelSerializer):
         return self.context.get('is_enrolled', False)
 
     def get_is_accessible_via_subscription(self, obj):
-        request = self.context.get('request')
-        user = request.user if request and hasattr(request, 'user') else None
-        if user and user.is_authenticated:
-            return obj.is_free_for_user(user)  # Uses the existing model method
-        return False
+        entitlements = self.context.get('entitlements')
+        if entitlements is None:
+            entitlements = EntitlementContext.for_request(
+                self.context.get('request'))
+        return entitlements.has_subscription_access(obj.id)
 
 
 class RoadMapSerializer(serializers.ModelSerializer):
@@ -142,6 +135,18 @@ class RoadMapSerializer(serializers.ModelSerializer):
             'courses_count'  # Added new field
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Prefetch the published courses and count all courses of each roadmap up front"""
+        published_courses = CourseSerializer.setup_eager_loading(
+            Course.objects.filter(status='published'))
+        return queryset.annotate(
+            courses_total=Count('courses', distinct=True)
+        ).prefetch_related(
+            Prefetch('courses', queryset=published_courses,
+                     to_attr='published_courses')
+        )
+
     def get_cover_image_url(self, obj):
         if obj.cover_image:
             return obj.cover_image.url
@@ -149,28 +154,23 @@ class RoadMapSerializer(serializers.ModelSerializer):
 
     def get_courses(self, obj):
         # Only return published courses in the roadmap
-        published_courses = obj.get_courses()
+        published_courses = getattr(obj, 'published_courses', None)
+        if published_courses is None:
+            published_courses = CourseSerializer.setup_eager_loading(
+                obj.get_courses())
         return CourseSerializer(published_courses, many=True).data
 
     def get_total_hours(self, obj):
-        # Calculate total hours from all courses in the roadmap
-        published_courses = obj.get_courses()
-        total = sum(course.total_hours or 0 for course in published_courses)
-        return round(total, 1)  # Round to one decimal place
+        # Total hours of the published courses, maintained by refresh_rollups()
+        return obj.total_hours
 
     def get_total_videos(self, obj):
-        # Count all episodes from courses in this roadmap
-        published_courses = obj.get_courses()
-        count = 0
-        for course in published_courses:
-            # Count published episodes in each course
-            count += Episode.objects.filter(
-                course=course,
-                status='published'
-            ).count()
-        return count
+        # Published episodes of the published courses, maintained by refresh_rollups()
+        return obj.total_videos
 
     def get_courses_count(self, obj):  # New method
+        if hasattr(obj, 'courses_total'):
+            return obj.courses_total
         return obj.courses_count()
 
 
@@ -0,0 +1,275 @@
+from django.db import transaction
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Attribute, Chapter, Course, Episode, RelatedCourse, RoadMap
+from .cache import (COURSE_LIST_TAG, ROADMAP_LIST_TAG, course_tag, invalidate_after_commit,
+                    roadmap_tag, taxonomy_tag)
+from .catalog import invalidate_catalog_index
+from .entitlements import invalidate_user_entitlements
+from .outline import invalidate_outlines_after_commit
+from taxonomy.models import Category, Tag
+from accounts.models import Organizer, Teacher
+from billing.models import Order
+from enrollments.models import Enrollment
+from subscriptions.models import SubscriptionPlan, UserSubscription
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=RoadMap)
+@receiver(post_delete, sender=RoadMap)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Organizer)
+@receiver(post_delete, sender=Organizer)
+@receiver(post_save, sender=Teacher)
+@receiver(post_delete, sender=Teacher)
+def invalidate_catalog_on_change(sender, **kwargs):
+    """Rebuild the catalog index after any change to listed content or facets"""
+    # After commit, so no process rebuilds the new version from uncommitted data
+    transaction.on_commit(invalidate_catalog_index)
+
+
+@receiver(m2m_changed, sender=Course.categories.through)
+@receiver(m2m_changed, sender=Course.organizers.through)
+@receiver(m2m_changed, sender=Course.teachers.through)
+@receiver(m2m_changed, sender=RoadMap.courses.through)
+def invalidate_catalog_on_relation_change(sender, action, **kwargs):
+    """Rebuild the catalog index when course or roadmap relations change"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(invalidate_catalog_index)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_course_responses(sender, instance, **kwargs):
+    invalidate_after_commit(course_tag(instance.id), COURSE_LIST_TAG)
+
+
+@receiver(post_save, sender=Chapter)
+@receiver(post_delete, sender=Chapter)
+@receiver(post_save, sender=Episode)
+@receiver(post_delete, sender=Episode)
+def invalidate_course_outline(sender, instance, **kwargs):
+    invalidate_outlines_after_commit(instance.course_id)
+
+
+@receiver(post_save, sender=RoadMap)
+@receiver(post_delete, sender=RoadMap)
+def invalidate_roadmap_responses(sender, instance, **kwargs):
+    invalidate_after_commit(roadmap_tag(instance.id), ROADMAP_LIST_TAG)
+
+
+TAXONOMY_TAG_KINDS = {
+    Teacher: 'teacher',
+    Organizer: 'organizer',
+    Category: 'category',
+    Tag: 'tag',
+    Attribute: 'attribute',
+}
+
+
+@receiver(post_save, sender=Teacher)
+@receiver(post_delete, sender=Teacher)
+@receiver(post_save, sender=Organizer)
+@receiver(post_delete, sender=Organizer)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Attribute)
+@receiver(post_delete, sender=Attribute)
+def invalidate_responses_on_taxonomy_change(sender, instance, **kwargs):
+    invalidate_after_commit(taxonomy_tag(TAXONOMY_TAG_KINDS[sender], instance.id))
+
+
+COURSE_RELATION_TAG_KINDS = {
+    Course.teachers.through: 'teacher',
+    Course.organizers.through: 'organizer',
+    Course.categories.through: 'category',
+    Course.tags.through: 'tag',
+    Course.attributes.through: 'attribute',
+}
+
+
+@receiver(m2m_changed, sender=Course.teachers.through)
+@receiver(m2m_changed, sender=Course.organizers.through)
+@receiver(m2m_changed, sender=Course.categories.through)
+@receiver(m2m_changed, sender=Course.tags.through)
+@receiver(m2m_changed, sender=Course.attributes.through)
+def invalidate_responses_on_course_relation_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Both sides of the relation are embedded in cached responses (e.g. teacher course counts)"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    kind = COURSE_RELATION_TAG_KINDS[sender]
+    if reverse:
+        tags = [taxonomy_tag(kind, instance.id), COURSE_LIST_TAG]
+        tags += [course_tag(course_id) for course_id in pk_set or []]
+    else:
+        tags = [course_tag(instance.id), COURSE_LIST_TAG]
+        tags += [taxonomy_tag(kind, obj_id) for obj_id in pk_set or []]
+    invalidate_after_commit(*tags)
+
+
+@receiver(m2m_changed, sender=RoadMap.courses.through)
+def invalidate_responses_on_roadmap_courses_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # Cached roadmaps are tagged with their courses, which covers clear()
+        tags = [course_tag(instance.id), ROADMAP_LIST_TAG]
+        tags += [roadmap_tag(roadmap_id) for roadmap_id in pk_set or []]
+    else:
+        tags = [roadmap_tag(instance.id), ROADMAP_LIST_TAG]
+    invalidate_after_commit(*tags)
+
+
+def schedule_roadmap_rollups(roadmap_ids):
+    """Refresh the stored totals of the given roadmaps after the transaction commits"""
+    roadmap_ids = list(roadmap_ids)
+    if roadmap_ids:
+        from .tasks import refresh_roadmap_rollups
+        transaction.on_commit(
+            lambda: refresh_roadmap_rollups.delay(roadmap_ids))
+
+
+@receiver(post_save, sender=Course)
+def refresh_roadmaps_on_course_change(sender, instance, **kwargs):
+    """A course's status or total hours feed the rollups of its roadmaps"""
+    schedule_roadmap_rollups(
+        instance.roadmaps.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Course)
+def remember_course_roadmaps(sender, instance, **kwargs):
+    instance._roadmap_ids = list(
+        instance.roadmaps.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Course)
+def refresh_roadmaps_on_course_delete(sender, instance, **kwargs):
+    schedule_roadmap_rollups(getattr(instance, '_roadmap_ids', []))
+
+
+@receiver(post_save, sender=Episode)
+def refresh_roadmaps_on_episode_status_change(sender, instance, **kwargs):
+    """Publishing or unpublishing an episode changes the roadmaps' video totals"""
+    was_published = getattr(instance, '_loaded_status', None) == 'published'
+    if was_published != (instance.status == 'published'):
+        schedule_roadmap_rollups(RoadMap.objects.filter(
+            courses=instance.course_id).values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Episode)
+def refresh_roadmaps_on_episode_delete(sender, instance, **kwargs):
+    if instance.status == 'published':
+        schedule_roadmap_rollups(RoadMap.objects.filter(
+            courses=instance.course_id).values_list('id', flat=True))
+
+
+@receiver(m2m_changed, sender=RoadMap.courses.through)
+def refresh_rollups_on_roadmap_courses_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Refresh the rollups when courses are added to or removed from a roadmap"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            schedule_roadmap_rollups([instance.id])
+        return
+
+    # Changed from the course side: the affected roadmaps are in pk_set,
+    # except for clear() where they have to be looked up beforehand
+    if action == 'pre_clear':
+        instance._cleared_roadmap_ids = list(
+            instance.roadmaps.values_list('id', flat=True))
+    elif action == 'post_clear':
+        schedule_roadmap_rollups(getattr(instance, '_cleared_roadmap_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        schedule_roadmap_rollups(pk_set or [])
+
+
+def schedule_related_courses_rebuild(course_ids):
+    """Rebuild the related courses around the given courses after the transaction commits"""
+    course_ids = list(course_ids)
+    if course_ids:
+        from .tasks import rebuild_related_courses
+        transaction.on_commit(
+            lambda: rebuild_related_courses.delay(course_ids))
+
+
+@receiver(post_save, sender=Course)
+def rebuild_related_on_status_change(sender, instance, **kwargs):
+    """Only published courses are related to each other"""
+    was_published = getattr(instance, '_loaded_status', None) == 'published'
+    if was_published != (instance.status == 'published'):
+        schedule_related_courses_rebuild([instance.id])
+
+
+@receiver(pre_delete, sender=Course)
+def remember_courses_listing_course(sender, instance, **kwargs):
+    instance._listed_by_ids = list(RelatedCourse.objects.filter(
+        related_course=instance).values_list('course_id', flat=True))
+
+
+@receiver(post_delete, sender=Course)
+def rebuild_related_on_course_delete(sender, instance, **kwargs):
+    schedule_related_courses_rebuild(getattr(instance, '_listed_by_ids', []))
+
+
+@receiver(m2m_changed, sender=Course.categories.through)
+@receiver(m2m_changed, sender=Course.teachers.through)
+@receiver(m2m_changed, sender=Course.tags.through)
+def rebuild_related_on_taxonomy_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Rebuild the related courses when a course's categories, teachers or tags change"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            schedule_related_courses_rebuild([instance.id])
+        return
+
+    # Changed from the taxonomy side: the affected courses are in pk_set,
+    # except for clear() where they have to be looked up beforehand
+    if action == 'pre_clear':
+        # Auto-created through models name their foreign keys after the models
+        instance._cleared_course_ids = list(sender.objects.filter(
+            **{instance._meta.model_name: instance}).values_list('course_id', flat=True))
+    elif action == 'post_clear':
+        schedule_related_courses_rebuild(
+            getattr(instance, '_cleared_course_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        schedule_related_courses_rebuild(pk_set or [])
+
+
+@receiver(post_save, sender=UserSubscription)
+@receiver(post_delete, sender=UserSubscription)
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def invalidate_entitlements(sender, instance, **kwargs):
+    invalidate_user_entitlements(instance.user_id)
+
+
+@receiver(post_save, sender=Order)
+def invalidate_entitlements_on_payment(sender, instance, **kwargs):
+    """A paid order grants enrollments or subscriptions"""
+    if instance.status == 'paid':
+        invalidate_user_entitlements(instance.user_id)
+
+
+@receiver(m2m_changed, sender=SubscriptionPlan.included_courses.through)
+def invalidate_entitlements_on_plan_courses_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Subscribers of a plan gain or lose its courses"""
+    if reverse and action == 'pre_clear':
+        instance._cleared_plan_ids = list(sender.objects.filter(
+            course=instance).values_list('subscriptionplan_id', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        plan_ids = [instance.id]
+    elif action == 'post_clear':
+        plan_ids = getattr(instance, '_cleared_plan_ids', [])
+    else:
+        plan_ids = pk_set or []
+    invalidate_user_entitlements(*set(UserSubscription.objects.filter(
+        subscription_plan_id__in=plan_ids,
+        is_active=True,
+        end_date__gt=timezone.now()
+    ).values_list('user_id', flat=True)))
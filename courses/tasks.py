@@ -1,8 +1,12 @@
 import logging
 from celery import shared_task
 from django.db.models import Sum
-from .models import Episode, Course
-from .utils import get_hls_duration
+from core.cache import invalidate_tags
+from .models import Episode, Course, RoadMap
+from .cache import ROADMAP_LIST_TAG, roadmap_tag
+from .related import refresh_related_courses
+from .total_hours import clear_pending_total_hours, schedule_course_total_hours
+from .video_metadata import get_video_duration, get_video_durations
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +25,7 @@ def process_video_metadata(episode_id):
         if episode.type == 'video' and episode.content_url and not episode.duration:
             logger.info(f"Processing video metadata for episode {episode_id}")
             
-            duration = get_hls_duration(episode.content_url)
+            duration = get_video_duration(episode.content_url)
             
             if duration:
                 episode.duration = duration
@@ -42,7 +46,10 @@ def update_course_total_hours(course_id):
     """
     Calculate the total duration of all published video episodes in a course
     and update the course's total_hours field.
+    Queued through courses.total_hours.schedule_course_total_hours.
     """
+    # Changes made from now on are not counted yet, they queue a new run
+    clear_pending_total_hours(course_id)
     try:
         course = Course.objects.get(id=course_id)
         
@@ -80,4 +87,65 @@ def update_course_total_hours(course_id):
         return f"Error: Course with ID {course_id} not found"
     except Exception as e:
         logger.error(f"Error updating total hours for course {course_id}: {str(e)}")
-        return f"Error: {str(e)}"
\ No newline at end of file
+        return f"Error: {str(e)}"
+
+@shared_task
+def refresh_roadmap_rollups(roadmap_ids):
+    """
+    Recalculate the stored course count, total hours, total videos and
+    enrollment count of the given roadmaps
+    """
+    refreshed = 0
+    for roadmap in RoadMap.objects.filter(id__in=roadmap_ids):
+        roadmap.refresh_rollups()
+        refreshed += 1
+    # The totals are written with update(), so no save signal invalidates them
+    invalidate_tags(ROADMAP_LIST_TAG, *[roadmap_tag(roadmap_id)
+                    for roadmap_id in roadmap_ids])
+    logger.info(f"Refreshed rollups of {refreshed} roadmap(s)")
+    return refreshed
+
+
+@shared_task
+def rebuild_related_courses(course_ids=None):
+    """
+    Recompute the precomputed related courses of the given courses and of
+    the courses whose related courses they can change
+    """
+    return refresh_related_courses(course_ids)
+
+
+@shared_task
+def finish_course_clones(course_ids):
+    """
+    Complete courses created by courses.cloning in one pass: probe the
+    videos that have no duration yet, then schedule each course's total hours
+    """
+    episodes = list(Episode.objects.filter(
+        course_id__in=course_ids, type='video', duration__isnull=True
+    ).exclude(content_url=''))
+    durations = get_video_durations(episode.content_url for episode in episodes)
+    for episode in episodes:
+        duration = durations.get(episode.content_url)
+        if duration:
+            episode.duration = duration
+        else:
+            logger.warning(f"Could not determine duration for episode {episode.id}")
+    # Saved in bulk, per-episode saves would queue their own metadata tasks
+    Episode.objects.bulk_update(
+        [episode for episode in episodes if episode.duration], ['duration'])
+
+    # Debounced like any other change, so the recomputations are counted too
+    for course_id in course_ids:
+        schedule_course_total_hours(course_id)
+    logger.info(
+        f"Finished {len(course_ids)} cloned course(s), probed {len(episodes)} video(s)")
+    return len(course_ids)
+
+
+@shared_task
+def publish_scheduled_courses(course_ids):
+    """Publish courses scheduled with courses.publishing.schedule_course_publishing"""
+    from .publishing import publish_courses
+    published_count, _ = publish_courses(course_ids)
+    return published_count
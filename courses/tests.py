@@ -1,3 +1,826 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import fakeredis
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.utils import timezone
+from django_celery_beat.models import PeriodicTask
+from redis.exceptions import RedisError
+
+from accounts.models import MyUser, Organizer, Teacher
+from core.cache import get_or_build, invalidate_tags
+from core.testing import CatalogDataMixin, QueryPlanTestMixin
+from taxonomy.models import Category, Tag
+from enrollments.models import Enrollment, UserProgress
+from subscriptions.models import SubscriptionPlan, UserSubscription
+from .catalog import CATALOG_VERSION_KEY, get_catalog_index
+from .cloning import clone_courses
+from .entitlements import EntitlementContext
+from .management.commands.backfill_episode_metadata import CHECKPOINT_KEY
+from .models import Chapter, Course, Episode, RelatedCourse, RoadMap
+from .outline import get_course_outline, get_outline_version
+from .publishing import publish_courses
+from .related import CourseGraph, refresh_related_courses
+from .serializers import EpisodeSerializer
+from .tasks import publish_scheduled_courses, update_course_total_hours
+from .total_hours import (
+    TOTAL_HOURS_DEBOUNCE_SECONDS, get_total_hours_metrics, schedule_course_total_hours,
+)
+from .utils import get_hls_playlist_duration
+
+
+class PublicViewQueryTests(QueryPlanTestMixin, CatalogDataMixin, TestCase):
+    """Query counts and plans of the public course and roadmap endpoints"""
+
+    list_urls = [
+        '/api/v1/courses/',
+        '/api/v1/courses/?sort=newest',
+        '/api/v1/courses/?sort=popular&category=programming',
+        '/api/v1/courses/?paging=cursor&sort=newest',
+        '/api/v1/courses/?paging=cursor&sort=popular',
+        '/api/v1/courses/etc/latest-courses/',
+        '/api/v1/courses/etc/popular-courses/',
+        '/api/v1/courses/etc/latest-roadmaps/',
+    ]
+
+    def test_listings_use_indexes(self):
+        for url in self.list_urls + ['/api/v1/courses/roadmaps/roadmap/']:
+            with self.subTest(url=url):
+                _, queries = self.capture(url)
+                self.assertNoFullScans(queries)
+
+    def test_listings_have_constant_query_counts(self):
+        for url in self.list_urls:
+            with self.subTest(url=url):
+                self.assertConstantQueries(url, self.grow_catalog)
+
+    def test_roadmap_detail_has_constant_query_count(self):
+        self.assertConstantQueries(
+            '/api/v1/courses/roadmaps/roadmap/', self.grow_catalog)
+
+    def test_course_detail(self):
+        course = self.courses[0]
+        url = f"/api/v1/courses/{course.slug}/"
+        for client in (self.client, self.authenticated_client()):
+            with self.subTest(authenticated=client is not self.client):
+                queries = self.assertConstantQueries(
+                    url, lambda: self.grow_course(course), client)
+                self.assertNoFullScans(queries)
+
+    def test_dashboard_course_detail(self):
+        course = self.courses[0]
+        client = self.authenticated_client()
+        url = f"/api/v1/courses/dashboard/courses/{course.slug}/"
+        queries = self.assertConstantQueries(
+            url, lambda: self.grow_course(course), client)
+        self.assertNoFullScans(queries)
+
+    def test_cached_responses_skip_the_database(self):
+        for url in ['/api/v1/courses/etc/latest-courses/',
+                    f"/api/v1/courses/{self.courses[0].slug}/"]:
+            with self.subTest(url=url):
+                self.client.get(url)
+                with self.assertNumQueries(0):
+                    self.client.get(url)
+
+
+class CatalogIndexTests(CatalogDataMixin, TestCase):
+    """The in-memory catalog answers the course list like the database does"""
+
+    list_queries = [
+        '',
+        'sort=newest',
+        'sort=popular',
+        'category=design',
+        'category=programming&types=course',
+        'organizer=studio&sort=newest',
+        'duration=upto30min&duration=2to5hours',
+        'types=roadmap&sort=popular',
+    ]
+
+    def setUp(self):
+        cache.clear()
+
+    def content_keys(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        data = response.json()
+        content = data['results']['content'] if 'results' in data else data['content']
+        return [(item['content_type'], item['id']) for item in content]
+
+    def test_index_is_invalidated_after_commit(self):
+        get_catalog_index()
+        version = cache.get(CATALOG_VERSION_KEY, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_course()
+            # Other processes must not rebuild from the uncommitted course
+            self.assertEqual(cache.get(CATALOG_VERSION_KEY, 0), version)
+        self.assertNotEqual(cache.get(CATALOG_VERSION_KEY, 0), version)
+
+    def test_committed_changes_match_the_database(self):
+        get_catalog_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            design = Category.objects.create(name='Design', latin_name='design', slug='design')
+            studio = Organizer.objects.create(organization_name='Studio', organization_slug='studio')
+            course = self.create_course()
+            course.categories.add(design)
+            course.organizers.add(studio)
+            self.roadmap.courses.add(course)
+            unpublished = self.courses[1]
+            unpublished.status = 'draft'
+            unpublished.save()
+
+        for query in self.list_queries:
+            with self.subTest(query=query):
+                # The cursor pages are filtered and sorted by the database
+                self.assertEqual(
+                    self.content_keys(f"/api/v1/courses/?page_size=50&{query}"),
+                    self.content_keys(f"/api/v1/courses/?paging=cursor&page_size=50&{query}"))
+        self.assertEqual(set(self.content_keys('/api/v1/courses/?category=design')),
+                         {('course', course.id), ('roadmap', self.roadmap.id)})
+        self.assertNotIn(('course', unpublished.id), self.content_keys('/api/v1/courses/?page_size=50'))
+
+        published = dict(status='published', published_at__lte=timezone.now())
+        facets = get_catalog_index().facets()
+        self.assertEqual(
+            [item['id'] for item in facets['categories']],
+            list(Category.objects.filter(**{f"courses__{field}": value for field, value in published.items()})
+                 .distinct().order_by('id').values_list('id', flat=True)))
+        self.assertEqual(
+            [item['id'] for item in facets['organizers']],
+            list(Organizer.objects.filter(**{f"organized_courses__{field}": value for field, value in published.items()})
+                 .distinct().order_by('id').values_list('id', flat=True)))
+        self.assertIn(design.id, [item['id'] for item in facets['categories']])
+
+
+class ResponseCacheTests(CatalogDataMixin, TestCase):
+    """Shared response cache entries and their tag invalidation"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_invalidated_tags_evict_entries(self):
+        builder = mock.Mock(side_effect=[('first', ['a', 'b']), ('second', ['a', 'b'])])
+        self.assertEqual(get_or_build('key', builder), 'first')
+        invalidate_tags('c')
+        self.assertEqual(get_or_build('key', builder), 'first')
+        invalidate_tags('b')
+        self.assertEqual(get_or_build('key', builder), 'second')
+        self.assertEqual(builder.call_count, 2)
+
+    def test_value_built_during_an_invalidation_is_not_stored(self):
+        def build():
+            # Another process commits a change while the value is built
+            invalidate_tags('a')
+            return 'stale', ['a']
+        self.assertEqual(get_or_build('key', build), 'stale')
+        self.assertEqual(get_or_build('key', lambda: ('fresh', ['a'])), 'fresh')
+        self.assertEqual(get_or_build('key', lambda: ('rebuilt', ['a'])), 'fresh')
+
+    def test_course_change_replaces_the_cached_detail(self):
+        course = self.courses[0]
+        url = f"/api/v1/courses/{course.slug}/"
+        self.assertEqual(self.client.get(url).json()['course']['title'], course.title)
+        with self.captureOnCommitCallbacks(execute=True):
+            course.title = 'Renamed'
+            course.save()
+        self.assertEqual(self.client.get(url).json()['course']['title'], 'Renamed')
+
+    def test_user_overlay_is_not_shared(self):
+        def visible_urls(response):
+            return [episode['content_url'] for chapter in response.json()['course']['chapters']
+                    for episode in chapter['episodes'] if episode['content_url']]
+
+        url = f"/api/v1/courses/{self.courses[0].slug}/"
+        subscriber = self.client_class()
+        subscriber.force_login(self.user)
+        response = subscriber.get(url)
+        self.assertTrue(response.json()['course']['is_enrolled'])
+        self.assertIn('active_granting_subscription', response.json())
+        self.assertEqual(len(visible_urls(response)), 6)
+
+        other = self.client_class()
+        other.force_login(MyUser.objects.create_user(
+            email='other@example.com', username='other', password='password'))
+        for client in (other, self.client):
+            response = client.get(url)
+            self.assertFalse(response.json()['course'].get('is_enrolled', False))
+            self.assertNotIn('active_granting_subscription', response.json())
+            # Only the free previews
+            self.assertEqual(len(visible_urls(response)), 2)
+
+
+class CursorPaginationTests(CatalogDataMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.courses += [cls.create_course() for _ in range(3)]
+        RoadMap.objects.create(
+            name='Second roadmap', slug='second-roadmap', description='Roadmap',
+            cover_image='roadmap_cover_image/roadmap.png', status='published',
+            published_at=timezone.now() - timedelta(hours=2)
+        ).courses.set(cls.courses[3:])
+        # Ties on every sort key, across both content types
+        tied_at = timezone.now() - timedelta(days=30)
+        Course.objects.filter(pk__in=[course.pk for course in cls.courses[:2]]).update(
+            published_at=tied_at, enrollment_count=7)
+        RoadMap.objects.filter(pk=cls.roadmap.pk).update(published_at=tied_at, enrollment_count=7)
+
+    def setUp(self):
+        cache.clear()
+
+    def keys(self, content):
+        return [(item['content_type'], item['id']) for item in content]
+
+    def walk(self, url):
+        keys = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            keys += self.keys(response.json()['results']['content'])
+            url = response.json()['next']
+        return keys
+
+    def test_pages_cover_the_listing_once(self):
+        for query in ['', 'sort=newest', 'sort=popular', 'types=course&sort=newest',
+                      'category=programming&sort=popular']:
+            with self.subTest(query=query):
+                listing = self.keys(self.client.get(
+                    f"/api/v1/courses/?page_size=50&{query}").json()['results']['content'])
+                self.assertGreater(len(listing), 4)
+                self.assertEqual(
+                    self.walk(f"/api/v1/courses/?paging=cursor&page_size=2&{query}"), listing)
+
+    def test_invalid_cursors_are_rejected(self):
+        response = self.client.get('/api/v1/courses/?paging=cursor&page_size=2&sort=newest')
+        cursor = response.json()['next'].split('cursor=')[1]
+        for url in [f"/api/v1/courses/?cursor={cursor}&sort=popular",
+                    '/api/v1/courses/?cursor=not-a-cursor']:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class EpisodeAccessTests(CatalogDataMixin, TestCase):
+    """Free previews and subscription access of serialized episodes"""
+
+    def setUp(self):
+        cache.clear()
+        self.course = self.courses[0]
+        # The chapter created last is listed first, its first video is a draft
+        first, second = self.course.chapters.order_by('number')
+        Chapter.objects.filter(pk=first.pk).update(number=2)
+        Chapter.objects.filter(pk=second.pk).update(number=1)
+        self.draft, *self.previews = second.episodes.order_by('order')[:3]
+        Episode.objects.filter(pk=self.draft.pk).update(status='draft')
+
+    def serialize(self, user=None):
+        request = RequestFactory().get('/')
+        request.user = user or AnonymousUser()
+        episodes = Episode.objects.filter(course=self.course, status='published').order_by('id')
+        return {episode['id']: episode for episode in EpisodeSerializer(
+            episodes, many=True, context={'request': request}).data}
+
+    def test_free_previews_are_the_first_published_videos(self):
+        # The episodes and the course's free previews, whatever their number
+        with self.assertNumQueries(2):
+            episodes = self.serialize()
+        free = {episode_id for episode_id, episode in episodes.items() if episode['is_free']}
+        self.assertEqual(free, {episode.id for episode in self.previews})
+        self.assertEqual(
+            {episode_id for episode_id, episode in episodes.items() if episode['content_url']}, free)
+
+    def test_subscribers_see_every_content_url(self):
+        self.assertTrue(all(episode['content_url'] for episode in self.serialize(self.user).values()))
+        # The user's entitlements are cached between requests
+        with self.assertNumQueries(2):
+            self.serialize(self.user)
+
+        other = MyUser.objects.create_user(
+            email='other@example.com', username='other', password='password')
+        self.assertEqual(
+            len([episode for episode in self.serialize(other).values() if episode['content_url']]), 2)
+
+
+class EntitlementTests(CatalogDataMixin, TestCase):
+    """Cached user entitlements follow committed subscription and enrollment changes"""
+
+    def setUp(self):
+        cache.clear()
+        self.plan = SubscriptionPlan.objects.get(slug='plan')
+
+    def course_access(self):
+        entitlements = EntitlementContext(self.user)
+        return ({course.id for course in self.courses if entitlements.has_subscription_access(course.id)},
+                {course.id for course in self.courses if entitlements.is_enrolled(course.id)})
+
+    def ids(self, *courses):
+        return {course.id for course in courses}
+
+    def test_entitlements_are_loaded_once(self):
+        first, second, third = self.courses
+        self.assertEqual(self.course_access(), (self.ids(first, second), self.ids(first, second, third)))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.course_access()[0], self.ids(first, second))
+
+    def test_committed_changes_invalidate_the_entitlements(self):
+        first, second, third = self.courses
+        self.course_access()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plan.included_courses.add(third)
+        self.assertEqual(self.course_access()[0], self.ids(first, second, third))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.subscription_plans.clear()
+        self.assertEqual(self.course_access()[0], self.ids(second, third))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.get(user=self.user, course=second).delete()
+        self.assertEqual(self.course_access()[1], self.ids(first, third))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UserSubscription.objects.filter(user=self.user).get().delete()
+        self.assertEqual(self.course_access()[0], set())
+
+    def test_expired_subscriptions_are_skipped(self):
+        subscription = UserSubscription.objects.get(user=self.user)
+        self.course_access()
+        # Still cached when the subscription ends, without any change to invalidate it
+        with mock.patch('courses.entitlements.timezone.now',
+                        return_value=subscription.end_date + timedelta(seconds=1)), \
+                self.assertNumQueries(0):
+            entitlements = EntitlementContext(self.user)
+            self.assertFalse(entitlements.has_subscription_access(self.courses[0].id))
+            self.assertIsNone(entitlements.granting_subscription(self.courses[0].id))
+
+
+class DashboardProgressTests(CatalogDataMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.course = self.courses[0]
+        self.url = f"/api/v1/courses/dashboard/courses/{self.course.slug}/"
+        self.client.force_login(self.user)
+
+    def progress(self, response):
+        return {episode['id']: episode['progress'] for chapter in response.json()['chapters']
+                for episode in chapter['episodes']}
+
+    def test_progress_is_read_without_creating_rows(self):
+        watched = self.course.episodes.order_by('id').first()
+        UserProgress.objects.create(
+            user=self.user, episode=watched, last_position=120, progress_percentage=20)
+
+        progress = self.progress(self.client.get(self.url))
+        self.assertEqual(len(progress), 6)
+        self.assertEqual((progress[watched.id]['percentage'], progress[watched.id]['last_position']),
+                         (20, 120))
+        self.assertTrue(all(item == {'percentage': 0, 'last_position': 0, 'completed': False,
+                                     'completed_at': None}
+                            for episode_id, item in progress.items() if episode_id != watched.id))
+        self.assertEqual(UserProgress.objects.filter(user=self.user).count(), 1)
+
+    def test_progress_is_not_shared_through_the_outline_cache(self):
+        watched = self.course.episodes.order_by('id').first()
+        UserProgress.objects.create(user=self.user, episode=watched, progress_percentage=20)
+        self.client.get(self.url)
+
+        other = MyUser.objects.create_user(
+            email='other@example.com', username='other', password='password')
+        Enrollment.objects.create(user=other, course=self.course)
+        self.client.force_login(other)
+        self.assertEqual(self.progress(self.client.get(self.url))[watched.id]['percentage'], 0)
+
+    def test_requires_an_enrollment(self):
+        self.assertEqual(self.client.get(
+            f"/api/v1/courses/dashboard/courses/{self.create_course().slug}/").status_code, 404)
+
+
+class RoadmapRollupTests(CatalogDataMixin, TestCase):
+    """Stored roadmap totals follow committed course and episode changes"""
+
+    def setUp(self):
+        cache.clear()
+        self.roadmap.refresh_rollups()
+
+    def assertRollupsMatch(self):
+        roadmap = RoadMap.objects.get(pk=self.roadmap.pk)
+        published = roadmap.courses.filter(status='published')
+        self.assertEqual(
+            (roadmap.published_courses_count, roadmap.total_hours, roadmap.total_videos,
+             roadmap.enrollment_count),
+            (published.count(), sum(course.total_hours for course in published),
+             Episode.objects.filter(course__in=published, status='published').count(),
+             sum(course.enrollment_count for course in roadmap.courses.all())))
+        data = self.client.get(f"/api/v1/courses/roadmaps/{roadmap.slug}/").json()
+        self.assertEqual((data['total_videos'], data['courses_count']),
+                         (roadmap.total_videos, roadmap.courses.count()))
+
+    def test_rollups_follow_committed_changes(self):
+        self.assertRollupsMatch()
+        changes = [
+            lambda: self.roadmap.courses.add(self.create_course(users=[self.user])),
+            lambda: Course.objects.get(pk=self.courses[0].pk).episodes.first().delete(),
+            lambda: self.courses[1].roadmaps.clear(),
+            lambda: self.roadmap.courses.add(self.courses[1]),
+            lambda: Course.objects.get(pk=self.courses[2].pk).delete(),
+        ]
+        for change in changes:
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            self.assertRollupsMatch()
+
+    def test_status_changes_update_rollups(self):
+        course = self.courses[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            course.status = 'draft'
+            course.save()
+        self.assertRollupsMatch()
+        episode = self.courses[1].episodes.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            episode.status = 'draft'
+            episode.save()
+        self.assertRollupsMatch()
+        self.assertEqual(RoadMap.objects.get(pk=self.roadmap.pk).total_videos, 11)
+
+
+class RelatedCourseTests(CatalogDataMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        other_category = Category.objects.create(name='Design', latin_name='design', slug='design')
+        other_teacher = Teacher.objects.create(first_name='Other', last_name='Teacher', slug='other')
+        other_tag = Tag.objects.create(name='Figma', latin_name='figma', slug='figma')
+        # Sharing only the teacher, then only the tag, with the first courses
+        cls.same_teacher = cls.create_course()
+        cls.same_teacher.categories.set([other_category])
+        cls.same_teacher.tags.set([other_tag])
+        cls.same_tag = cls.create_course()
+        cls.same_tag.categories.set([other_category])
+        cls.same_tag.teachers.set([other_teacher])
+        cls.unrelated = cls.create_course()
+        cls.unrelated.categories.set([other_category])
+        cls.unrelated.teachers.set([other_teacher])
+        cls.unrelated.tags.set([other_tag])
+        refresh_related_courses()
+
+    def setUp(self):
+        cache.clear()
+
+    def related_ids(self, course):
+        return [item['id'] for item in self.client.get(
+            f"/api/v1/courses/{course.slug}/").json()['related_courses']]
+
+    def test_strongest_shared_relation_ranks_first(self):
+        first, second, third = self.courses
+        self.assertEqual(CourseGraph().rank(first.id), [
+            (second.id, 3), (third.id, 3), (self.same_teacher.id, 2), (self.same_tag.id, 1)])
+        self.assertEqual(self.related_ids(first), [second.id, third.id, self.same_teacher.id])
+        self.assertNotIn(first.id, [row.related_course_id for row in RelatedCourse.objects.filter(
+            course=self.unrelated)])
+
+    def test_committed_changes_update_the_related_courses(self):
+        first, second, third = self.courses
+        with self.captureOnCommitCallbacks(execute=True):
+            second.status = 'draft'
+            second.save()
+        self.assertEqual(self.related_ids(first), [third.id, self.same_teacher.id, self.same_tag.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            third.categories.clear()
+        self.assertEqual(self.related_ids(first), [third.id, self.same_teacher.id, self.same_tag.id])
+        self.assertEqual(RelatedCourse.objects.get(course=first, related_course=third).score, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.courses.add(third)
+            self.same_teacher.delete()
+        self.assertEqual(self.related_ids(first), [third.id, self.same_tag.id])
+        # The incremental rebuilds left nothing for a full rebuild to change
+        self.assertEqual(refresh_related_courses(), 0)
+
+
+class OutlineCacheTests(CatalogDataMixin, TestCase):
+    """Course outlines are cached per version, content and order changes replace them"""
+
+    def setUp(self):
+        cache.clear()
+        self.course = self.courses[0]
+        self.url = f"/api/v1/courses/{self.course.slug}/"
+        self.admin = MyUser.objects.create_superuser(
+            username='admin', password='password', email='admin@example.com')
+
+    def outline(self):
+        return [(chapter['title'], [episode['title'] for episode in chapter['episodes']])
+                for chapter in self.client.get(self.url).json()['course']['chapters']]
+
+    def reorder(self, model, updated_items):
+        self.client.force_login(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f"/prag/courses/{model._meta.model_name}/adminsortable2_update/",
+                {'updatedItems': updated_items}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.client.logout()
+
+    def test_outline_is_built_once_per_version(self):
+        version = get_outline_version(self.course.id)
+        get_course_outline(self.course.id)
+        with self.assertNumQueries(0):
+            get_course_outline(self.course.id)
+        self.assertEqual(get_outline_version(self.course.id), version)
+
+    def test_committed_changes_replace_the_outline(self):
+        self.outline()
+        version = get_outline_version(self.course.id)
+        episode = self.course.episodes.order_by('id').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            episode.title = 'Renamed episode'
+            episode.save()
+        self.assertNotEqual(get_outline_version(self.course.id), version)
+        self.assertIn('Renamed episode', self.outline()[0][1])
+
+        chapter = episode.chapter
+        with self.captureOnCommitCallbacks(execute=True):
+            chapter.delete()
+        self.assertNotIn(chapter.title, [title for title, _ in self.outline()])
+
+    def test_admin_episode_reorder_replaces_the_outline(self):
+        first, second, third = self.course.chapters.order_by('number').first().episodes.order_by('order')
+        before = self.outline()[0][1]
+        self.assertEqual(before, [first.title, second.title, third.title])
+
+        self.reorder(Episode, [[first.pk, third.order], [third.pk, first.order]])
+        self.assertEqual(self.outline()[0][1], [third.title, second.title, first.title])
+
+    def test_admin_chapter_reorder_replaces_the_outline(self):
+        first, second = self.course.chapters.order_by('number')
+        self.assertEqual([title for title, _ in self.outline()], [first.title, second.title])
+
+        self.reorder(Chapter, [[first.pk, second.number], [second.pk, first.number]])
+        self.assertEqual([title for title, _ in self.outline()], [second.title, first.title])
+
+
+class CourseCloneTests(CatalogDataMixin, TestCase):
+
+    def clone(self, *courses):
+        with mock.patch('courses.tasks.schedule_course_total_hours') as schedule, \
+                self.captureOnCommitCallbacks(execute=True):
+            copies = clone_courses(courses)
+        self.assertEqual(schedule.call_args_list, [mock.call(copy.id) for copy in copies])
+        return copies
+
+    def test_copies_relations_chapters_and_episodes(self):
+        original = self.courses[0]
+        copy, = self.clone(original)
+        copy = Course.objects.get(pk=copy.pk)
+        self.assertEqual((copy.title, copy.status, copy.published_at),
+                         (f"{original.title} (Copy)", 'draft', None))
+        for relation in ('categories', 'tags', 'organizers', 'teachers', 'attributes'):
+            self.assertEqual(set(getattr(copy, relation).all()), set(getattr(original, relation).all()))
+
+        def outline(course):
+            return [(episode.chapter.number, episode.title, episode.order, episode.duration)
+                    for episode in course.episodes.select_related('chapter').order_by('chapter__number', 'order')]
+        self.assertEqual(outline(copy), outline(original))
+        self.assertEqual(set(copy.episodes.values_list('status', flat=True)), {'draft'})
+        self.assertFalse(copy.episodes.exclude(chapter__course=copy).exists())
+
+    def test_slugs_do_not_collide(self):
+        original = self.courses[0]
+        twin = self.create_course()
+        twin.latin_title = original.latin_title
+        twin.save()
+        first, = self.clone(original)
+        copies = self.clone(original, twin)
+        self.assertEqual(
+            [first.slug] + [copy.slug for copy in copies],
+            [f"{original.latin_title}-copy", f"{original.latin_title}-copy-1", f"{original.latin_title}-copy-2"])
+
+
+class CoursePublishingTests(CatalogDataMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.course = self.create_course(users=[self.user])
+        self.roadmap.courses.add(self.course)
+        Course.objects.filter(pk=self.course.pk).update(status='draft', published_at=None)
+        Episode.objects.filter(course=self.course).update(status='draft', published_at=None)
+        Enrollment.refresh_course_counters(self.course.id)
+        self.roadmap.refresh_rollups()
+
+    def test_derived_data_is_refreshed_after_commit(self):
+        key = ('course', self.course.id)
+        self.assertNotIn(key, get_catalog_index().search())
+        self.client.get('/api/v1/courses/etc/latest-courses/')
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(publish_courses([self.course.id, self.courses[0].id]), (1, 1))
+        self.assertEqual(Course.objects.get(pk=self.course.pk).status, 'published')
+        self.assertFalse(Episode.objects.filter(course=self.course).exclude(status='published').exists())
+        # Nothing derived is refreshed before the commit
+        self.assertNotIn(key, get_catalog_index().search())
+        self.assertEqual(Enrollment.objects.get(course=self.course).total_episodes, 0)
+
+        with mock.patch('courses.publishing.schedule_course_total_hours') as schedule:
+            for callback in callbacks:
+                callback()
+        schedule.assert_called_once_with(self.course.id)
+        self.assertIn(key, get_catalog_index().search())
+        self.assertEqual(Enrollment.objects.get(course=self.course).total_episodes, 6)
+        self.roadmap.refresh_from_db()
+        self.assertEqual(self.roadmap.published_courses_count, 4)
+        self.assertEqual(self.roadmap.total_videos, 24)
+        latest = self.client.get('/api/v1/courses/etc/latest-courses/').json()
+        self.assertIn(self.course.id, [course['id'] for course in latest])
+
+    def test_scheduled_publishing(self):
+        publish_at = timezone.now() + timedelta(hours=2)
+        out = StringIO()
+        call_command('publish_courses', self.course.slug, '--at', publish_at.isoformat(), stdout=out)
+        self.assertIn('Scheduled 1 course(s)', out.getvalue())
+        self.assertEqual(Course.objects.get(pk=self.course.pk).status, 'draft')
+
+        task = PeriodicTask.objects.get(task='courses.tasks.publish_scheduled_courses')
+        self.assertTrue(task.one_off)
+        self.assertEqual(task.clocked.clocked_time, publish_at)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(publish_scheduled_courses(*json.loads(task.args)), 1)
+        self.assertEqual(Course.objects.get(pk=self.course.pk).status, 'published')
+
+        with self.assertRaises(CommandError):
+            call_command('publish_courses', self.course.slug, '--at', 'tomorrow')
+
+    def test_admin_action(self):
+        self.client.force_login(MyUser.objects.create_superuser(
+            username='admin', password='password', email='admin@example.com'))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/prag/courses/course/', {
+                'action': 'publish_selected_courses',
+                '_selected_action': [self.course.pk, self.courses[0].pk],
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Course.objects.get(pk=self.course.pk).status, 'published')
+        self.assertEqual(Enrollment.objects.get(course=self.course).total_episodes, 6)
+
+
+class TotalHoursDebounceTests(CatalogDataMixin, TestCase):
+    """Bursts of episode changes share one total hours recomputation per course"""
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+        patcher = mock.patch('courses.total_hours.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.course = self.courses[0]
+
+    def test_changes_are_coalesced(self):
+        with mock.patch('courses.tasks.update_course_total_hours.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                for episode in self.course.episodes.all():
+                    episode.duration = timedelta(minutes=20)
+                    episode.save()
+            schedule_course_total_hours(self.courses[1].id)
+        self.assertEqual(apply_async.call_args_list, [
+            mock.call((self.course.id,), countdown=TOTAL_HOURS_DEBOUNCE_SECONDS),
+            mock.call((self.courses[1].id,), countdown=TOTAL_HOURS_DEBOUNCE_SECONDS),
+        ])
+        self.assertEqual(get_total_hours_metrics(),
+                         {'requested': 7, 'scheduled': 2, 'coalesced': 5, 'executed': 0})
+
+        # The task counts every change made before it started
+        update_course_total_hours(self.course.id)
+        self.assertEqual(Course.objects.get(pk=self.course.pk).total_hours, 2)
+        self.assertEqual(get_total_hours_metrics()['executed'], 1)
+        # Changes made once it started queue a new run
+        with mock.patch('courses.tasks.update_course_total_hours.apply_async') as apply_async:
+            schedule_course_total_hours(self.course.id)
+        apply_async.assert_called_once()
+
+    def test_metrics_command(self):
+        with mock.patch('courses.tasks.update_course_total_hours.apply_async'):
+            for _ in range(4):
+                schedule_course_total_hours(self.course.id)
+        out = StringIO()
+        call_command('total_hours_metrics', '--reset', stdout=out)
+        self.assertIn('coalesced: 3', out.getvalue())
+        self.assertIn('75% of the requests were coalesced', out.getvalue())
+        self.assertEqual(get_total_hours_metrics()['requested'], 0)
+
+    def test_queued_directly_without_redis(self):
+        with mock.patch('courses.total_hours.get_redis',
+                        return_value=mock.Mock(set=mock.Mock(side_effect=RedisError('down')))), \
+                mock.patch('courses.tasks.update_course_total_hours.delay') as delay:
+            schedule_course_total_hours(self.course.id)
+            schedule_course_total_hours(self.course.id)
+        self.assertEqual(delay.call_args_list, [mock.call(self.course.id)] * 2)
+
+    def test_failed_queueing_clears_the_pending_flag(self):
+        with mock.patch('courses.tasks.update_course_total_hours.apply_async',
+                        side_effect=ConnectionError('broker down')), \
+                self.assertRaises(ConnectionError):
+            schedule_course_total_hours(self.course.id)
+        with mock.patch('courses.tasks.update_course_total_hours.apply_async') as apply_async:
+            schedule_course_total_hours(self.course.id)
+        apply_async.assert_called_once()
+
+
+class BackfillEpisodeMetadataTests(CatalogDataMixin, TestCase):
+    """The metadata backfill probes each episode once, even across interrupted runs"""
+
+    def setUp(self):
+        cache.clear()
+        self.timed = list(Episode.objects.filter(
+            course__in=self.courses[:2]).order_by('pk').values_list('pk', flat=True))
+        for pk in self.timed:
+            Episode.objects.filter(pk=pk).update(
+                content_url=f"https://example.com/{pk}.m3u8", duration=None)
+        Course.objects.filter(pk__in=[course.pk for course in self.courses]).update(total_hours=0)
+        text, document = self.courses[2].episodes.order_by('pk')[:2]
+        Episode.objects.filter(pk=text.pk).update(type='text', description='One two three')
+        Episode.objects.filter(pk=document.pk).update(type='file', content_url='https://example.com/a.pdf')
+        self.text, self.document = text, document
+        self.probed = []
+
+    def probe_durations(self, urls, concurrency=None):
+        if self.fail_after is not None and len(self.probed) >= self.fail_after:
+            raise RuntimeError('probe crashed')
+        self.probed.extend(urls)
+        return {url: timedelta(minutes=30) for url in urls}
+
+    def backfill(self, *args, fail_after=None):
+        self.fail_after = fail_after
+        out = StringIO()
+        with mock.patch('courses.management.commands.backfill_episode_metadata.get_video_durations',
+                        side_effect=self.probe_durations), \
+                mock.patch('courses.management.commands.backfill_episode_metadata.get_file_sizes',
+                           side_effect=lambda urls, concurrency=None: {url: 1024 for url in urls}):
+            call_command('backfill_episode_metadata', '--chunk-size', '6', *args, stdout=out)
+        return out.getvalue()
+
+    def test_fills_in_missing_metadata(self):
+        out = self.backfill()
+        self.assertIn('duration: 12 filled in, 0 failed', out)
+        self.assertEqual(len(self.probed), 12)
+        self.assertFalse(Episode.objects.filter(pk__in=self.timed, duration__isnull=True).exists())
+        self.assertEqual(Episode.objects.get(pk=self.text.pk).word_count, 3)
+        self.assertEqual(Episode.objects.get(pk=self.document.pk).file_size, 1024)
+        self.assertEqual([Course.objects.get(pk=course.pk).total_hours for course in self.courses],
+                         [3, 3, 0])
+        self.assertIsNone(cache.get(CHECKPOINT_KEY))
+        # Nothing is missing anymore
+        self.assertIn('Processed 0 episode(s)', self.backfill())
+
+    def test_interrupted_run_resumes(self):
+        with self.assertRaises(RuntimeError):
+            self.backfill('--field', 'duration', fail_after=6)
+        self.assertEqual(cache.get(CHECKPOINT_KEY)['last_pk'], self.timed[5])
+
+        out = self.backfill('--field', 'duration')
+        self.assertIn(f"Resuming after episode {self.timed[5]}", out)
+        # Every episode was probed once, the courses of both runs are recomputed
+        self.assertEqual(sorted(self.probed), sorted(
+            f"https://example.com/{pk}.m3u8" for pk in self.timed))
+        self.assertEqual([Course.objects.get(pk=course.pk).total_hours for course in self.courses[:2]],
+                         [3, 3])
+
+    def test_checkpoint_is_ignored_when_asked_or_for_other_fields(self):
+        with self.assertRaises(RuntimeError):
+            self.backfill('--field', 'duration', fail_after=6)
+        out = self.backfill('--field', 'word_count')
+        self.assertIn('Ignoring the checkpoint of a run for duration', out)
+        self.assertNotIn('Resuming', out)
+
+        with self.assertRaises(RuntimeError):
+            self.backfill('--field', 'duration', '--chunk-size', '3', fail_after=9)
+        self.assertEqual(cache.get(CHECKPOINT_KEY)['last_pk'], self.timed[8])
+        self.assertNotIn('Resuming', self.backfill('--field', 'duration', '--restart'))
+        self.assertFalse(Episode.objects.filter(pk__in=self.timed, duration__isnull=True).exists())
+
+
+class HLSPlaylistDurationTests(SimpleTestCase):
+    MASTER = '#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=800000\n480p/index.m3u8\n'
+    MEDIA = '#EXTM3U\n#EXT-X-TARGETDURATION:10\n#EXTINF:9.96,\na.ts\n#EXTINF:3.5,title\nb.ts\n#EXT-X-ENDLIST\n'
+
+    def fetch(self, playlists):
+        def get(url, timeout=None):
+            return mock.Mock(text=playlists[url], raise_for_status=mock.Mock())
+        return mock.patch('courses.utils.requests.get', side_effect=get)
+
+    def test_sums_segment_durations_of_the_first_variant(self):
+        with self.fetch({
+            'https://cdn.test/v/master.m3u8': self.MASTER,
+            'https://cdn.test/v/480p/index.m3u8': self.MEDIA,
+        }):
+            self.assertEqual(get_hls_playlist_duration('https://cdn.test/v/master.m3u8'),
+                             timedelta(seconds=13.46))
+
+    def test_rejects_other_content(self):
+        with self.fetch({'https://cdn.test/video.mp4': 'not a playlist'}):
+            self.assertIsNone(get_hls_playlist_duration('https://cdn.test/video.mp4'))
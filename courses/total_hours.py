@@ -0,0 +1,81 @@
+import logging
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Changes to a course's episodes within this many seconds share one
+# recomputation of its total hours
+TOTAL_HOURS_DEBOUNCE_SECONDS = getattr(settings, 'TOTAL_HOURS_DEBOUNCE_SECONDS', 10)
+# A pending flag outlives its task by this much at most, in case the task is lost
+PENDING_GRACE_SECONDS = 5 * 60
+
+METRICS_KEY = 'courses:total-hours:metrics'
+METRIC_NAMES = ['requested', 'scheduled', 'coalesced', 'executed']
+
+
+def _pending_key(course_id):
+    return f"courses:total-hours:pending:{course_id}"
+
+
+def schedule_course_total_hours(course_id):
+    """
+    Recompute the course's total hours once the current burst of changes is over.
+
+    The first call for a course queues update_course_total_hours with a
+    countdown and flags the course as pending in Redis. Calls made before
+    the task starts are coalesced into it. Without Redis the task is queued
+    right away, as before.
+    """
+    from .tasks import update_course_total_hours
+
+    try:
+        redis = get_redis()
+        is_first = redis.set(_pending_key(course_id), 1, nx=True,
+                             ex=TOTAL_HOURS_DEBOUNCE_SECONDS + PENDING_GRACE_SECONDS)
+        pipe = redis.pipeline()
+        pipe.hincrby(METRICS_KEY, 'requested', 1)
+        pipe.hincrby(METRICS_KEY, 'scheduled' if is_first else 'coalesced', 1)
+        pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Total hours debounce unavailable, queueing directly: {e}")
+        update_course_total_hours.delay(course_id)
+        return
+
+    if is_first:
+        try:
+            update_course_total_hours.apply_async(
+                (course_id,), countdown=TOTAL_HOURS_DEBOUNCE_SECONDS)
+        except Exception:
+            # Let the next change queue the task instead of waiting for the flag to expire
+            clear_pending_total_hours(course_id)
+            raise
+
+
+def clear_pending_total_hours(course_id):
+    """
+    Called when the recomputation starts, so that later changes queue a new one
+    """
+    try:
+        pipe = get_redis().pipeline()
+        pipe.delete(_pending_key(course_id))
+        pipe.hincrby(METRICS_KEY, 'executed', 1)
+        pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Could not clear pending total hours of course {course_id}: {e}")
+
+
+def get_total_hours_metrics():
+    """
+    Counters of total hours recomputations since the last reset: requested
+    by changes, scheduled as tasks, coalesced into a pending task, executed
+    """
+    values = get_redis().hmget(METRICS_KEY, METRIC_NAMES)
+    return {name: int(value or 0) for name, value in zip(METRIC_NAMES, values)}
+
+
+def reset_total_hours_metrics():
+    get_redis().delete(METRICS_KEY)
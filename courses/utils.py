@@ -2,15 +2,19 @@ import subprocess
 import json
 import logging
 from datetime import timedelta
+from urllib.parse import urljoin
+
+import requests
 
 logger = logging.getLogger(__name__)
 
-def get_hls_duration(hls_url):
+def get_hls_duration(hls_url, timeout=None):
     """
     Extract duration from an HLS stream using ffprobe
     
     Args:
         hls_url (str): The URL to the HLS stream
+        timeout (float): Seconds after which ffprobe is killed, no limit if None
         
     Returns:
         timedelta: The duration of the video as a Python timedelta object
@@ -24,7 +28,8 @@ def get_hls_duration(hls_url):
             '-show_format',
             hls_url
         ]
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+                                timeout=timeout)
         
         if result.returncode != 0:
             logger.error(f"ffprobe command failed: {result.stderr}")
@@ -36,11 +41,78 @@ def get_hls_duration(hls_url):
             logger.error(f"Duration not found in ffprobe output")
             return None
             
-        duration_seconds = int(data['format']['duration'])
+        duration_seconds = float(data['format']['duration'])
         duration = timedelta(seconds=duration_seconds)
         
         logger.info(f"Successfully extracted duration: {duration} from {hls_url}")
         return duration
+    except subprocess.TimeoutExpired:
+        logger.error(f"ffprobe timed out after {timeout}s for {hls_url}")
+        return None
     except Exception as e:
         logger.error(f"Error getting HLS duration: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+def get_hls_playlist_duration(hls_url, timeout=None, max_depth=2):
+    """
+    Extract duration from an HLS stream by summing the #EXTINF segment
+    durations of its media playlist, without downloading any segment
+
+    Args:
+        hls_url (str): The URL to the HLS master or media playlist
+        timeout (float): Seconds to wait for each playlist request
+
+    Returns:
+        timedelta: The duration of the video as a Python timedelta object
+        None: If the playlist could not be fetched or has no segments
+    """
+    try:
+        response = requests.get(hls_url, timeout=timeout)
+        response.raise_for_status()
+        lines = [line.strip() for line in response.text.splitlines() if line.strip()]
+        if not lines or lines[0] != '#EXTM3U':
+            logger.error(f"Not an HLS playlist: {hls_url}")
+            return None
+
+        duration_seconds = 0.0
+        segments = 0
+        for index, line in enumerate(lines):
+            if line.startswith('#EXT-X-STREAM-INF') and max_depth > 0:
+                # Master playlist: every variant has the duration of the video
+                variant = next((uri for uri in lines[index + 1:] if not uri.startswith('#')), None)
+                if variant is None:
+                    break
+                return get_hls_playlist_duration(urljoin(hls_url, variant), timeout, max_depth - 1)
+            if line.startswith('#EXTINF:'):
+                duration_seconds += float(line[len('#EXTINF:'):].split(',', 1)[0])
+                segments += 1
+
+        if not segments:
+            logger.error(f"No segments found in HLS playlist {hls_url}")
+            return None
+        return timedelta(seconds=duration_seconds)
+    except Exception as e:
+        logger.error(f"Error reading HLS playlist {hls_url}: {e}")
+        return None
+
+
+def get_remote_file_size(url, timeout=None):
+    """
+    Size in bytes of a remote file from the Content-Length of a HEAD request
+
+    Returns:
+        int: The size of the file
+        None: If the request failed or the server did not send a length
+    """
+    try:
+        response = requests.head(url, timeout=timeout, allow_redirects=True)
+        response.raise_for_status()
+        content_length = response.headers.get('Content-Length')
+        if content_length is None:
+            logger.error(f"No Content-Length for {url}")
+            return None
+        return int(content_length)
+    except Exception as e:
+        logger.error(f"Error getting the size of {url}: {e}")
+        return None
@@ -0,0 +1,97 @@
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from .utils import get_hls_duration, get_hls_playlist_duration, get_remote_file_size
+
+logger = logging.getLogger(__name__)
+
+# 'playlist' sums the #EXTINF durations of the HLS playlist and only runs
+# ffprobe when that fails, 'ffprobe' always runs ffprobe
+VIDEO_PROBE_METHOD = getattr(settings, 'VIDEO_PROBE_METHOD', 'playlist')
+# Seconds allowed to each request or ffprobe run
+VIDEO_PROBE_TIMEOUT = getattr(settings, 'VIDEO_PROBE_TIMEOUT', 30)
+# Probes running at the same time in get_video_durations() and get_file_sizes()
+VIDEO_PROBE_CONCURRENCY = getattr(settings, 'VIDEO_PROBE_CONCURRENCY', 8)
+
+# A manifest with the same ETag describes the same video. Without an ETag
+# the duration is only kept long enough for duplicates probed together.
+VIDEO_METADATA_CACHE_TIMEOUT = getattr(settings, 'VIDEO_METADATA_CACHE_TIMEOUT', 30 * 24 * 60 * 60)
+UNTAGGED_CACHE_TIMEOUT = 60 * 60
+
+
+def _duration_key(url, etag):
+    digest = hashlib.sha1(f"{url}\n{etag}".encode()).hexdigest()
+    return f"courses:video-duration:{digest}"
+
+
+def _manifest_etag(url, timeout):
+    try:
+        response = requests.head(url, timeout=timeout, allow_redirects=True)
+        if response.ok:
+            return response.headers.get('ETag', '')
+    except requests.RequestException as e:
+        logger.warning(f"Could not get the ETag of {url}: {e}")
+    return ''
+
+
+def probe_video_duration(url, method=None, timeout=None):
+    """Probe the duration of an HLS video, without the cache"""
+    method = method or VIDEO_PROBE_METHOD
+    timeout = timeout or VIDEO_PROBE_TIMEOUT
+    duration = None
+    if method == 'playlist':
+        duration = get_hls_playlist_duration(url, timeout=timeout)
+    if duration is None:
+        duration = get_hls_duration(url, timeout=timeout)
+    return duration
+
+
+def get_video_duration(url, method=None, timeout=None):
+    """
+    Duration of an HLS video, cached by content URL and manifest ETag so
+    episodes sharing a video (duplicates, cloned courses) are probed once
+    """
+    timeout = timeout or VIDEO_PROBE_TIMEOUT
+    etag = _manifest_etag(url, timeout)
+    key = _duration_key(url, etag)
+    seconds = cache.get(key)
+    if seconds is not None:
+        return timedelta(seconds=seconds)
+
+    duration = probe_video_duration(url, method, timeout)
+    if duration is not None:
+        cache.set(key, duration.total_seconds(),
+                  timeout=VIDEO_METADATA_CACHE_TIMEOUT if etag else UNTAGGED_CACHE_TIMEOUT)
+    return duration
+
+
+def _probe_all(probe, urls, concurrency):
+    urls = list(dict.fromkeys(url for url in urls if url))
+    if not urls:
+        return {}
+    workers = min(concurrency or VIDEO_PROBE_CONCURRENCY, len(urls))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(probe, urls))
+    return dict(zip(urls, results))
+
+
+def get_video_durations(urls, concurrency=None, method=None, timeout=None):
+    """
+    Durations of many HLS videos as {url: duration or None}.
+
+    Each distinct URL is probed once, with at most concurrency probes
+    running at the same time.
+    """
+    return _probe_all(lambda url: get_video_duration(url, method, timeout), urls, concurrency)
+
+
+def get_file_sizes(urls, concurrency=None, timeout=None):
+    """Sizes in bytes of many remote files as {url: size or None}, probed like get_video_durations()"""
+    timeout = timeout or VIDEO_PROBE_TIMEOUT
+    return _probe_all(lambda url: get_remote_file_size(url, timeout), urls, concurrency)
@@ -4,15 +4,18 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.views import APIView
 from rest_framework.pagination import PageNumberPagination  # Add this import
 from django.shortcuts import get_object_or_404
-from django.db.models import Count, Q, Case, When, Value, IntegerField
 from django.utils import timezone
 
 from .models import Course, Episode, RoadMap
-from .serializers import CourseSerializer, CourseDetailSerializer, EpisodeSerializer, RoadMapSerializer
+from .cache import (COURSE_LIST_TAG, ROADMAP_LIST_TAG, cached_response,
+                    course_data_tags, roadmap_data_tags)
+from .catalog import get_catalog_index
+from .entitlements import EntitlementContext
+from .outline import add_progress, get_course_outline, show_content_urls
+from .pagination import ContentCursorPagination, published_courses, published_roadmaps
+from .serializers import CourseSerializer, CourseDetailSerializer, RoadMapSerializer
 from enrollments.models import Enrollment, UserProgress
-from taxonomy.serializers import CategorySerializer
-from accounts.serializers import OrganizerSerializer
-from subscriptions.models import UserSubscription
+from enrollments.progress_buffer import buffer_heartbeat, record_synchronous_progress
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -26,13 +29,17 @@ class LatestRoadmapView(APIView):
     permission_classes = [AllowAny]  # Add this line to allow public access
 
     def get(self, request):
-        queryset = RoadMap.objects.filter(
+        return Response(cached_response('latest-roadmaps', self.build_payload),
+                        status=status.HTTP_200_OK)
+
+    def build_payload(self):
+        queryset = RoadMapSerializer.setup_eager_loading(RoadMap.objects.filter(
             status='published',
             published_at__lte=timezone.now()
-        ).order_by('-published_at')[:3]
+        )).order_by('-published_at')[:3]
 
-        serializer = RoadMapSerializer(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        data = RoadMapSerializer(queryset, many=True).data
+        return data, roadmap_data_tags(data) | {ROADMAP_LIST_TAG}
 
 
 class LatestCoursesView(APIView):
@@ -40,14 +47,18 @@ class LatestCoursesView(APIView):
     permission_classes = [AllowAny]  # Add this line to allow public access
 
     def get(self, request):
+        return Response(cached_response('latest-courses', self.build_payload),
+                        status=status.HTTP_200_OK)
+
+    def build_payload(self):
         # Get last 6 published courses ordered by published date
-        queryset = Course.objects.filter(
+        queryset = CourseSerializer.setup_eager_loading(Course.objects.filter(
             status='published',
             published_at__lte=timezone.now()
-        ).order_by('-published_at')[:6]
+        )).order_by('-published_at')[:6]
 
-        serializer = CourseSerializer(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        data = CourseSerializer(queryset, many=True).data
+        return data, course_data_tags(data) | {COURSE_LIST_TAG}
 
 
 class PopularCoursesView(APIView):
@@ -55,14 +66,19 @@ class PopularCoursesView(APIView):
     permission_classes = [AllowAny]  # Add this line to allow public access
 
     def get(self, request):
+        return Response(cached_response('popular-courses', self.build_payload),
+                        status=status.HTTP_200_OK)
+
+    def build_payload(self):
         # Get popular courses ordered by enrollment count
-        queryset = Course.objects.filter(
+        queryset = CourseSerializer.setup_eager_loading(Course.objects.filter(
             status='published',
             published_at__lte=timezone.now()
-        ).annotate(enrollment_count=Count('enrollments')).order_by('-enrollment_count')[:6]
+        )).order_by('-enrollment_count')[:6]
 
-        serializer = CourseSerializer(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Enrollments do not invalidate the list, it follows them within the cache timeout
+        data = CourseSerializer(queryset, many=True).data
+        return data, course_data_tags(data) | {COURSE_LIST_TAG}
 
 
 class RoadmapDetailView(APIView):
@@ -70,14 +86,19 @@ class RoadmapDetailView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, slug):
+        payload = cached_response(
+            f"roadmap:{slug}", lambda: self.build_payload(slug))
+        return Response(payload, status=status.HTTP_200_OK)
+
+    def build_payload(self, slug):
         roadmap = get_object_or_404(
-            RoadMap,
+            RoadMapSerializer.setup_eager_loading(RoadMap.objects.all()),
             slug=slug,
             status='published',
             published_at__lte=timezone.now()
         )
-        serializer = RoadMapSerializer(roadmap, context={'request': request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        data = RoadMapSerializer(roadmap).data
+        return data, roadmap_data_tags([data])
 
 
 class CourseListView(APIView):
@@ -94,183 +115,135 @@ class CourseListView(APIView):
         duration_filter = request.query_params.getlist('duration')
         sort_option = request.query_params.get('sort', 'default')
 
-        # Build base querysets
-        courses_queryset = Course.objects.filter(
-            status='published',
-            published_at__lte=timezone.now()
-        ).annotate(
-            enrollment_count=Count('enrollments')
-        ).prefetch_related('teachers', 'categories', 'organizers', 'tags')
-
-        roadmaps_queryset = RoadMap.objects.filter(
-            status='published',
-            published_at__lte=timezone.now()
-        ).prefetch_related('courses__categories', 'courses__organizers')
-
-        # Apply filtering to courses
-        if search_query:
-            courses_queryset = courses_queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(teachers__first_name__icontains=search_query) |
-                Q(teachers__last_name__icontains=search_query)
-            ).distinct()
-
-        if categories_filter:
-            courses_queryset = courses_queryset.filter(
-                categories__slug__in=categories_filter
-            ).distinct()
-
-        if organizers_filter:
-            courses_queryset = courses_queryset.filter(
-                organizers__organization_slug__in=organizers_filter
-            ).distinct()
-
-        if duration_filter:
-            duration_q = Q()
-            for duration in duration_filter:
-                if duration == 'upto30min':
-                    duration_q |= Q(total_hours__lte=0.5)
-                elif duration == '30min2hours':
-                    duration_q |= Q(total_hours__gt=0.5, total_hours__lte=2)
-                elif duration == '2to5hours':
-                    duration_q |= Q(total_hours__gt=2, total_hours__lte=5)
-                elif duration == 'morethan5hours':
-                    duration_q |= Q(total_hours__gt=5)
-            if duration_q:
-                courses_queryset = courses_queryset.filter(duration_q)
-
-        # Apply filtering to roadmaps
-        if search_query:
-            roadmaps_queryset = roadmaps_queryset.filter(
-                Q(name__icontains=search_query) |
-                Q(description__icontains=search_query)
-            ).distinct()
-
-        if categories_filter:
-            roadmaps_queryset = roadmaps_queryset.filter(
-                courses__categories__slug__in=categories_filter
-            ).distinct()
-
-        if organizers_filter:
-            roadmaps_queryset = roadmaps_queryset.filter(
-                courses__organizers__organization_slug__in=organizers_filter
-            ).distinct()
-
-        if duration_filter:
-            duration_q = Q()
-            for duration in duration_filter:
-                if duration == 'upto30min':
-                    duration_q |= Q(courses__total_hours__lte=0.5)
-                elif duration == '30min2hours':
-                    duration_q |= Q(courses__total_hours__gt=0.5,
-                                    courses__total_hours__lte=2)
-                elif duration == '2to5hours':
-                    duration_q |= Q(courses__total_hours__gt=2,
-                                    courses__total_hours__lte=5)
-                elif duration == 'morethan5hours':
-                    duration_q |= Q(courses__total_hours__gt=5)
-            if duration_q:
-                roadmaps_queryset = roadmaps_queryset.filter(
-                    duration_q).distinct()
-
-        # Apply sorting to querysets
-        if sort_option == 'newest':
-            courses_queryset = courses_queryset.order_by('-published_at')
-            roadmaps_queryset = roadmaps_queryset.order_by('-published_at')
-        elif sort_option == 'popular':
-            courses_queryset = courses_queryset.order_by('-enrollment_count')
-            # For roadmaps, order by sum of course enrollments (simplified approach)
-            roadmaps_queryset = roadmaps_queryset.annotate(
-                total_enrollments=Count('courses__enrollments')
-            ).order_by('-total_enrollments')
-        else:  # default
-            courses_queryset = courses_queryset.order_by('id')
-            roadmaps_queryset = roadmaps_queryset.order_by('id')
-
-        # Serialize data
-        courses_serializer = CourseSerializer(courses_queryset, many=True)
-        roadmaps_serializer = RoadMapSerializer(roadmaps_queryset, many=True)
-
-        courses_data = courses_serializer.data
-        for course in courses_data:
-            course['content_type'] = 'course'
-
-        roadmaps_data = roadmaps_serializer.data
-        for roadmap in roadmaps_data:
-            roadmap['content_type'] = 'roadmap'
-
-        # Filter by content type if specified
-        combined_content = []
-        if not types_filter or 'course' in types_filter:
-            combined_content.extend(courses_data)
-        if not types_filter or 'roadmap' in types_filter:
-            combined_content.extend(roadmaps_data)
-
-        # Sort combined content if needed (for mixed sorting of courses and roadmaps)
-        if sort_option == 'newest':
-            combined_content.sort(key=lambda x: x.get(
-                'published_at', ''), reverse=True)
-        elif sort_option == 'popular':
-            def get_popularity(item):
-                if item['content_type'] == 'course':
-                    return item.get('enrollment_count', 0)
-                else:  # roadmap
-                    return sum(course.get('enrollment_count', 0) for course in item.get('courses', []))
-            combined_content.sort(key=get_popularity, reverse=True)
-        elif sort_option == 'default':
-            combined_content.sort(key=lambda x: x.get('id', 0))
+        if self.use_cursor_pagination(request):
+            return self.get_cursor_page(
+                request, search_query, types_filter, categories_filter,
+                organizers_filter, duration_filter, sort_option)
+
+        # Filtering and sorting are answered by the in-memory catalog index,
+        # only the requested page is loaded from the database and serialized
+        catalog = get_catalog_index()
+        now = timezone.now()
+        content_keys = catalog.search(
+            search_query=search_query,
+            types=types_filter,
+            categories=categories_filter,
+            organizers=organizers_filter,
+            durations=duration_filter,
+            sort=sort_option,
+            now=now
+        )
 
         # Generate metadata (for all available options, not filtered)
-        all_courses = Course.objects.filter(
-            status='published',
-            published_at__lte=timezone.now()
-        ).prefetch_related('categories', 'organizers')
-
-        unique_categories = set()
-        unique_organizers = set()
-
-        for course in all_courses:
-            for category in course.categories.all():
-                unique_categories.add(category)
-            for org in course.organizers.all():
-                unique_organizers.add(org)
-
-        categories_data = CategorySerializer(unique_categories, many=True).data
-        organizers_data = OrganizerSerializer(
-            unique_organizers, many=True).data
+        metadata = catalog.facets(now=now)
+        metadata['types'] = ['course', 'roadmap']
 
         # Apply pagination
         paginator = self.pagination_class()
-        page = paginator.paginate_queryset(
-            combined_content, request, view=self)
+        page = paginator.paginate_queryset(content_keys, request, view=self)
 
         if page is not None:
             return paginator.get_paginated_response({
-                'content': page,
-                'metadata': {
-                    'categories': categories_data,
-                    'organizers': organizers_data,
-                    'types': ['course', 'roadmap']
-                }
+                'content': self.serialize_content(page),
+                'metadata': metadata
             })
 
         # Fallback without pagination
         return Response({
-            'content': combined_content,
-            'metadata': {
-                'categories': categories_data,
-                'organizers': organizers_data,
-                'types': ['course', 'roadmap']
-            }
+            'content': self.serialize_content(content_keys),
+            'metadata': metadata
         }, status=status.HTTP_200_OK)
 
+    def use_cursor_pagination(self, request):
+        return (
+            ContentCursorPagination.cursor_query_param in request.query_params or
+            request.query_params.get('paging') == 'cursor'
+        )
+
+    def get_cursor_page(self, request, search_query, types_filter, categories_filter,
+                        organizers_filter, duration_filter, sort_option):
+        """Page through the combined content with a keyset cursor computed in the database"""
+        filters = {
+            'search_query': search_query,
+            'categories': categories_filter,
+            'organizers': organizers_filter,
+            'durations': duration_filter,
+        }
+        courses_queryset = None
+        roadmaps_queryset = None
+        if not types_filter or 'course' in types_filter:
+            courses_queryset = published_courses(**filters)
+        if not types_filter or 'roadmap' in types_filter:
+            roadmaps_queryset = published_roadmaps(**filters)
+
+        paginator = ContentCursorPagination()
+        page = paginator.paginate(
+            request, courses_queryset, roadmaps_queryset, sort_option)
+
+        metadata = get_catalog_index().facets()
+        metadata['types'] = ['course', 'roadmap']
+        return paginator.get_paginated_response({
+            'content': self.serialize_content(page),
+            'metadata': metadata
+        })
+
+    def serialize_content(self, content_keys):
+        """Serialize the given (content_type, id) keys, preserving their order"""
+        course_ids = [obj_id for content_type,
+                      obj_id in content_keys if content_type == 'course']
+        roadmap_ids = [obj_id for content_type,
+                       obj_id in content_keys if content_type == 'roadmap']
+
+        serialized = {}
+        if course_ids:
+            courses = CourseSerializer.setup_eager_loading(
+                Course.objects.filter(id__in=course_ids))
+            for course_data in CourseSerializer(courses, many=True).data:
+                course_data['content_type'] = 'course'
+                serialized[('course', course_data['id'])] = course_data
+        if roadmap_ids:
+            roadmaps = RoadMapSerializer.setup_eager_loading(
+                RoadMap.objects.filter(id__in=roadmap_ids))
+            for roadmap_data in RoadMapSerializer(roadmaps, many=True).data:
+                roadmap_data['content_type'] = 'roadmap'
+                serialized[('roadmap', roadmap_data['id'])] = roadmap_data
+
+        return [serialized[key] for key in content_keys if key in serialized]
+
 
 class CourseDetailView(APIView):
-    """View to get course details and related courses"""
+    """
+    View to get course details and related courses.
+
+    The anonymous view of a course is cached and shared by everyone, the
+    fields that depend on the user are applied on top of it per request.
+    """
     permission_classes = [AllowAny]  # Add this line to allow public access
 
     def get(self, request, slug):
+        payload = cached_response(
+            f"course:{slug}", lambda: self.build_public_payload(slug))
+
+        response_payload = {
+            'course': payload['course'],
+            'related_courses': payload['related_courses']
+        }
+
+        if request.user.is_authenticated:
+            active_granting_subscription_data = self.apply_user_overlay(
+                request, payload['course'], payload['content_urls'])
+            if active_granting_subscription_data:
+                response_payload['active_granting_subscription'] = active_granting_subscription_data
+
+        return Response(response_payload, status=status.HTTP_200_OK)
+
+    def build_public_payload(self, slug):
+        """
+        Build the course as an anonymous user sees it.
+
+        The content URLs of the episodes that are not free previews are kept
+        aside, so they can be shown to users with subscription access.
+        """
         # Get the course by slug
         course = get_object_or_404(
             Course,
@@ -279,102 +252,70 @@ class CourseDetailView(APIView):
             published_at__lte=timezone.now()
         )
 
-        chapters_data = {}
-        episodes = Episode.objects.filter(
-            course=course, status='published').order_by('chapter__number', 'order')
+        outline = get_course_outline(course.id)
+        entitlements = EntitlementContext()
 
-        for episode in episodes:
-            chapter_id = episode.chapter.id
-
-            episode_serializer = EpisodeSerializer(
-                episode, context={'request': request})
-
-            if chapter_id not in chapters_data:
-                chapters_data[chapter_id] = {
-                    'id': episode.chapter.id,
-                    'title': episode.chapter.title,
-                    'number': episode.chapter.number,
-                    'episodes': []
-                }
-            chapters_data[chapter_id]['episodes'].append(
-                episode_serializer.data)
-
-        # Convert to list and sort by chapter number
-        chapter_list = list(chapters_data.values())
-        chapter_list.sort(key=lambda x: x['number'])
-
-        # Get related courses (same category, same teacher, or similar tags)
+        # Related courses (same category, same teacher, or similar tags) are
+        # precomputed by courses.related
         related_courses = Course.objects.filter(
-            Q(categories__in=course.categories.all()) |
-            Q(teachers__in=course.teachers.all()) |
-            Q(tags__in=course.tags.all()),
+            related_to_entries__course=course,
             status='published',
             published_at__lte=timezone.now()
-        ).exclude(id=course.id)
-
-        # Prioritize courses with same category, then same teacher, then same tags
-        related_courses = related_courses.annotate(
-            relevance_score=Case(
-                When(categories__in=course.categories.all(), then=Value(3)),
-                When(teachers__in=course.teachers.all(), then=Value(2)),
-                When(tags__in=course.tags.all(), then=Value(1)),
-                default=Value(0),
-                output_field=IntegerField()
-            )
-        ).filter(relevance_score__gt=0).order_by('-relevance_score', '-published_at').distinct()[:3]
-
-        # Check if user is enrolled in this course
-        is_enrolled = False
-        active_granting_subscription_data = None  # Initialize
-
-        if request.user.is_authenticated:
-            is_enrolled = Enrollment.objects.filter(
-                user=request.user,
-                course=course,
-                is_active=True
-            ).exists()
-
-            # Find active subscription that grants access to THIS course
-            granting_subscription = UserSubscription.objects.filter(
-                user=request.user,
-                is_active=True,
-                end_date__gt=timezone.now(),
-                subscription_plan__included_courses=course
-            ).order_by('-end_date').first()  # Get the one that ends latest
-
-            if granting_subscription:
-                now = timezone.now()
-                remaining_days = (granting_subscription.end_date -
-                                  now).days if granting_subscription.end_date > now else 0
-                active_granting_subscription_data = {
-                    'plan_name': granting_subscription.subscription_plan.name,
-                    'end_date': granting_subscription.end_date.isoformat(),
-                    'remaining_days': remaining_days,
-                    'plan_slug': granting_subscription.subscription_plan.slug
-                }
+        ).order_by('-related_to_entries__score', '-published_at')[:3]
 
         # Serialize course data
         serializer = CourseDetailSerializer(
-            # Ensure request is in context
-            course, context={'request': request, 'is_enrolled': is_enrolled})
+            course, context={'is_enrolled': False, 'entitlements': entitlements})
 
         # Serialize related courses
-        related_serializer = CourseSerializer(related_courses, many=True)
+        related_serializer = CourseSerializer(
+            CourseSerializer.setup_eager_loading(related_courses), many=True)
 
         course_response_data = serializer.data
         course_response_data.update({
-            'chapters': chapter_list,
+            'chapters': outline['chapters'],
         })
 
-        response_payload = {
+        payload = {
             'course': course_response_data,
-            'related_courses': related_serializer.data
+            'related_courses': related_serializer.data,
+            'content_urls': outline['content_urls'],
+        }
+        tags = course_data_tags([course_response_data]) | course_data_tags(
+            related_serializer.data)
+        return payload, tags
+
+    def apply_user_overlay(self, request, course_data, content_urls):
+        """
+        Apply the user's enrollment and subscription access to the cached course.
+
+        Returns the data of the subscription granting access to the course,
+        if any.
+        """
+        entitlements = EntitlementContext.for_request(request)
+        course_id = course_data['id']
+
+        course_data['is_enrolled'] = entitlements.is_enrolled(course_id)
+
+        has_access = entitlements.has_subscription_access(course_id)
+        course_data['is_accessible_via_subscription'] = has_access
+        if not has_access:
+            return None
+
+        show_content_urls(course_data['chapters'], content_urls)
+
+        # The active subscription granting access to THIS course that ends latest
+        granting_subscription = entitlements.granting_subscription(course_id)
+
+        now = timezone.now()
+        remaining_days = (granting_subscription['end_date'] -
+                          now).days if granting_subscription['end_date'] > now else 0
+        return {
+            'plan_name': granting_subscription['plan_name'],
+            'end_date': granting_subscription['end_date'].isoformat(),
+            'remaining_days': remaining_days,
+            'plan_slug': granting_subscription['plan_slug']
         }
-
-        if active_granting_subscription_data:
-            response_payload['active_granting_subscription'] = active_granting_subscription_data
-
-        return Response(response_payload, status=status.HTTP_200_OK)
 
 
 class OwnedCoursesView(APIView):
@@ -427,55 +368,25 @@ class DashboardCourseDetailView(APIView):
         # Update last accessed time
         enrollment.update_last_accessed()
 
-        # Get all episodes with progress info
-        episodes = Episode.objects.filter(
-            course=course,
-            status='published'
-        ).order_by('chapter__number', 'order')
-
-        # Group episodes by chapter
-        chapters_data = {}
-        for episode in episodes:
-            chapter_id = episode.chapter.id
-
-            # Get progress for this episode
-            progress, created = UserProgress.objects.get_or_create(
+        # Load all of the user's progress for this course in one query and
+        # add it to the cached outline
+        progress_by_episode = {
+            progress.episode_id: progress
+            for progress in UserProgress.objects.filter(
                 user=request.user,
-                episode=episode,
-                defaults={
-                    'progress_percentage': 0,
-                    'last_position': 0,
-                    'completed': False
-                }
+                episode__course=course
             )
+        }
+        chapters = get_course_outline(course.id)['chapters']
+        add_progress(chapters, progress_by_episode)
 
-            # Prepare episode data with progress
-            episode_data = EpisodeSerializer(episode).data
-            episode_data.update({
-                'progress': {
-                    'percentage': progress.progress_percentage,
-                    'last_position': progress.last_position,
-                    'completed': progress.completed,
-                    'completed_at': progress.completed_at
-                }
-            })
-
-            # Add to chapter data structure
-            if chapter_id not in chapters_data:
-                chapters_data[chapter_id] = {
-                    'id': episode.chapter.id,
-                    'title': episode.chapter.title,
-                    'number': episode.chapter.number,
-                    'episodes': []
-                }
-            chapters_data[chapter_id]['episodes'].append(episode_data)
-
-        # Convert to list and sort by chapter number
-        chapters = list(chapters_data.values())
-        chapters.sort(key=lambda x: x['number'])
+        # The dashboard shows the course without the user, so only free
+        # previews expose their content URL here
+        entitlements = EntitlementContext()
 
         # Prepare course data
-        course_serializer = CourseDetailSerializer(course)
+        course_serializer = CourseDetailSerializer(
+            course, context={'entitlements': entitlements})
         response_data = course_serializer.data
         response_data.update({
             'chapters': chapters,
@@ -516,8 +427,7 @@ class CourseEnrollmentView(APIView):
             }, status=status.HTTP_200_OK)
 
         # Check if course is accessible for free for this user (e.g., via subscription)
-        # The model method course.is_free_for_user(request.user) checks this
-        if not course.is_free_for_user(request.user):
+        if not EntitlementContext.for_request(request).has_subscription_access(course.id):
             return Response(
                 {"detail": "Course access not granted. Subscription required or course is not part of an active subscription."},
                 status=status.HTTP_403_FORBIDDEN
@@ -548,25 +458,36 @@ class UpdateProgressView(APIView):
         get_object_or_404(
             Enrollment,
             user=request.user,
-            course=episode.course,
+            course_id=episode.course_id,
             is_active=True
         )
 
+        # Update progress from request data
+        position = request.data.get('position', 0)
+        duration = request.data.get('duration', 0)
+        completed = request.data.get('completed', False)
+
+        # Plain heartbeats are coalesced in Redis and written in bulk by the
+        # flush_progress_heartbeats task, completions are applied right away
+        if not completed and duration > 0:
+            percentage = min(int((position / duration) * 100), 100)
+            if percentage <= UserProgress.COMPLETION_THRESHOLD:
+                buffered = buffer_heartbeat(
+                    request.user.id, episode.id, position, percentage)
+                if buffered is not None:
+                    return Response(buffered, status=status.HTTP_200_OK)
+
         # Get or create progress
         progress, created = UserProgress.objects.get_or_create(
             user=request.user,
             episode=episode
         )
 
-        # Update progress from request data
-        position = request.data.get('position', 0)
-        duration = request.data.get('duration', 0)
-        completed = request.data.get('completed', False)
-
         if completed:
             progress.mark_as_completed()
         elif duration > 0:
             progress.update_progress(position, duration)
+        record_synchronous_progress(progress)
 
         return Response({
             'progress_percentage': progress.progress_percentage,
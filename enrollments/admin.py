@@ -9,14 +9,14 @@ class EnrollmentAdmin(admin.ModelAdmin):
     list_filter = ('is_active', 'enrolled_at')
     search_fields = ('user__username', 'user__email', 'course__title')
     readonly_fields = ('enrolled_at', 'last_accessed_at',
-                       'completion_percentage')
+                       'completion_percentage', 'completed_episodes', 'total_episodes')
 
     fieldsets = (
         ('User Information', {
             'fields': ('user', 'course')
         }),
         ('Status Information', {
-            'fields': ('is_active', 'completion_percentage')
+            'fields': ('is_active', 'completion_percentage', 'completed_episodes', 'total_episodes')
         }),
         ('Timestamps', {
             'fields': ('enrolled_at', 'last_accessed_at'),
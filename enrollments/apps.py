@@ -5,3 +5,6 @@ class EnrollmentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'enrollments'
     verbose_name = 'مدیریت ثبت نام‌ها'
+
+    def ready(self):
+        import enrollments.signals
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from enrollments.models import Enrollment
+
+
+class Command(BaseCommand):
+    help = 'Recount the stored enrollment counts of courses and roadmaps used for popularity'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course',
+            dest='course_ids',
+            type=int,
+            action='append',
+            default=None,
+            help='Only rebuild this course ID and its roadmaps (can be repeated).',
+        )
+
+    def handle(self, *args, **options):
+        updated = Enrollment.rebuild_enrollment_counts(options['course_ids'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt enrollment counts of {updated} course(s)"))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from enrollments.models import Enrollment
+
+
+class Command(BaseCommand):
+    help = 'Recalculate the completion counters and percentages of enrollments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course',
+            dest='course_ids',
+            type=int,
+            action='append',
+            default=None,
+            help='Only repair enrollments of this course ID (can be repeated).',
+        )
+
+    def handle(self, *args, **options):
+        course_ids = options['course_ids']
+        if not course_ids:
+            course_ids = Enrollment.objects.order_by('course_id').values_list(
+                'course_id', flat=True).distinct()
+
+        total = 0
+        for course_id in course_ids:
+            updated = Enrollment.refresh_course_counters(course_id)
+            total += updated
+            self.stdout.write(
+                f"Course {course_id}: {updated} enrollment(s) refreshed")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Repaired completion counters of {total} enrollment(s)"))
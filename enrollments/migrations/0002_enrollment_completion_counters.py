@@ -0,0 +1,60 @@
+# Generated by Django 4.2 on 2026-10-17 06:05
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Floor, Least
+
+
+def populate_completion_counters(apps, schema_editor):
+    Enrollment = apps.get_model('enrollments', 'Enrollment')
+    Episode = apps.get_model('courses', 'Episode')
+    UserProgress = apps.get_model('enrollments', 'UserProgress')
+
+    course_ids = Enrollment.objects.values_list(
+        'course_id', flat=True).distinct()
+    for course_id in course_ids:
+        total_episodes = Episode.objects.filter(
+            course_id=course_id, status='published').count()
+        completed_episodes = UserProgress.objects.filter(
+            user=OuterRef('user'),
+            episode__course=OuterRef('course'),
+            episode__status='published',
+            completed=True
+        ).order_by().values('user').annotate(total=Count('id')).values('total')
+        Enrollment.objects.filter(course_id=course_id).update(
+            total_episodes=total_episodes,
+            completed_episodes=Coalesce(
+                Subquery(completed_episodes, output_field=models.PositiveIntegerField()), Value(0))
+        )
+        if total_episodes:
+            Enrollment.objects.filter(course_id=course_id).update(
+                completion_percentage=Least(
+                    Floor(F('completed_episodes') * 100 / total_episodes), Value(100))
+            )
+        else:
+            Enrollment.objects.filter(course_id=course_id).update(
+                completion_percentage=0)
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0011_course_excerpt'),
+        ('enrollments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='completed_episodes',
+            field=models.PositiveIntegerField(default=0, verbose_name='اپیزودهای تکمیل شده'),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='total_episodes',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد اپیزودها'),
+        ),
+        migrations.RunPython(populate_completion_counters,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-17 06:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enrollments', '0002_enrollment_completion_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['user', 'is_active'], name='enrollment_user_active_idx'),
+        ),
+    ]
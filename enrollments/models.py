@@ -1,11 +1,25 @@
 from django.db import models
+from django.db.models import Case, Count, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Floor, Least
+from django.db.models.lookups import GreaterThan
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
-from courses.models import Course, Episode
+from courses.models import Course, Episode, RoadMap
 
 User = get_user_model()
 
+
+def completion_percentage_expression(completed, total):
+    """Database expression of the completion percentage for the given counters"""
+    return Case(
+        When(GreaterThan(total, 0),
+             then=Least(Floor(completed * 100 / total), Value(100))),
+        default=Value(0),
+        output_field=models.PositiveSmallIntegerField()
+    )
+
+
 class Enrollment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='enrollments', verbose_name='کاربر')
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='enrollments', verbose_name='دوره')
@@ -13,43 +27,155 @@ class Enrollment(models.Model):
     is_active = models.BooleanField(default=True, verbose_name='فعال')
     last_accessed_at = models.DateTimeField(blank=True, null=True, verbose_name='آخرین دسترسی')
     completion_percentage = models.PositiveSmallIntegerField(default=0, verbose_name='درصد تکمیل')
+    # Counters behind completion_percentage, kept up to date incrementally
+    completed_episodes = models.PositiveIntegerField(default=0, verbose_name='اپیزودهای تکمیل شده')
+    total_episodes = models.PositiveIntegerField(default=0, verbose_name='تعداد اپیزودها')
 
     class Meta:
         verbose_name = 'ثبت نام'
         verbose_name_plural = 'ثبت نام‌ها'
         unique_together = ['user', 'course']
+        indexes = [
+            models.Index(fields=['user', 'is_active'],
+                         name='enrollment_user_active_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.course.title}"
 
+    def save(self, *args, **kwargs):
+        # Start the counters from the current state of the course
+        if self._state.adding:
+            self.total_episodes = Episode.objects.filter(
+                course_id=self.course_id, status='published').count()
+            self.completed_episodes = UserProgress.objects.filter(
+                user_id=self.user_id,
+                episode__course_id=self.course_id,
+                episode__status='published',
+                completed=True
+            ).count()
+            self.completion_percentage = self.calculate_percentage(
+                self.completed_episodes, self.total_episodes)
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def calculate_percentage(completed_episodes, total_episodes):
+        if total_episodes <= 0:
+            return 0
+        return min(int((completed_episodes / total_episodes) * 100), 100)
+
     @classmethod
     def get_enrollment_count(cls, course_id):
         return cls.objects.filter(course_id=course_id, is_active=True).count()
-    
+
+    @classmethod
+    def adjust_enrollment_counts(cls, course_id, delta):
+        """Add delta to the stored enrollment counts of a course and its roadmaps"""
+        if delta >= 0:
+            enrollment_count = F('enrollment_count') + delta
+        else:
+            # The column is unsigned on MySQL, so a count below -delta is set
+            # to 0 rather than subtracted from
+            enrollment_count = Case(
+                When(enrollment_count__gt=-delta, then=F('enrollment_count') - (-delta)),
+                default=Value(0),
+            )
+        Course.objects.filter(pk=course_id).update(enrollment_count=enrollment_count)
+        RoadMap.objects.filter(courses=course_id).update(enrollment_count=enrollment_count)
+
+    @classmethod
+    def rebuild_enrollment_counts(cls, course_ids=None):
+        """
+        Recount the stored enrollment counts of courses and their roadmaps.
+
+        Only the given courses (and the roadmaps containing them) are rebuilt
+        when course_ids is set. Returns the number of courses updated.
+        """
+        courses = Course.objects.all()
+        roadmaps = RoadMap.objects.all()
+        if course_ids is not None:
+            courses = courses.filter(pk__in=course_ids)
+            roadmaps = roadmaps.filter(
+                pk__in=RoadMap.courses.through.objects.filter(
+                    course_id__in=course_ids).values('roadmap_id'))
+
+        enrollments = cls.objects.filter(
+            course=OuterRef('pk')
+        ).order_by().values('course').annotate(total=Count('id')).values('total')
+        updated = courses.update(enrollment_count=Coalesce(
+            Subquery(enrollments, output_field=models.PositiveIntegerField()), Value(0)))
+
+        course_totals = Course.objects.filter(
+            roadmaps=OuterRef('pk')
+        ).order_by().values('roadmaps').annotate(total=Sum('enrollment_count')).values('total')
+        roadmaps.update(enrollment_count=Coalesce(
+            Subquery(course_totals, output_field=models.PositiveIntegerField()), Value(0)))
+        return updated
+
+    @classmethod
+    def refresh_course_counters(cls, course_id):
+        """
+        Recalculate the counters of every enrollment in a course in bulk.
+
+        Used when the set of published episodes of the course changes, and
+        to repair drifted counters. Returns the number of enrollments updated.
+        """
+        total_episodes = Episode.objects.filter(
+            course_id=course_id, status='published').count()
+        completed_episodes = UserProgress.objects.filter(
+            user=OuterRef('user'),
+            episode__course=OuterRef('course'),
+            episode__status='published',
+            completed=True
+        ).order_by().values('user').annotate(total=Count('id')).values('total')
+
+        enrollments = cls.objects.filter(course_id=course_id)
+        updated = enrollments.update(
+            total_episodes=total_episodes,
+            completed_episodes=Coalesce(
+                Subquery(completed_episodes, output_field=models.PositiveIntegerField()), Value(0))
+        )
+        enrollments.update(completion_percentage=completion_percentage_expression(
+            F('completed_episodes'), Value(total_episodes)))
+        return updated
+
     def update_last_accessed(self):
         """Update the last accessed timestamp to current time"""
         self.last_accessed_at = timezone.now()
         self.save(update_fields=['last_accessed_at'])
-    
+
+    def record_episode_completion(self):
+        """Count one more completed episode without recounting the course"""
+        # completion_percentage is assigned first: MySQL evaluates SET clauses
+        # left to right, so it must still see the old completed_episodes value
+        Enrollment.objects.filter(pk=self.pk).update(
+            completion_percentage=completion_percentage_expression(
+                F('completed_episodes') + 1, F('total_episodes')),
+            completed_episodes=F('completed_episodes') + 1
+        )
+        self.refresh_from_db(
+            fields=['completed_episodes', 'total_episodes', 'completion_percentage'])
+
     def update_completion_percentage(self):
-        """Calculate and update the completion percentage based on completed episodes"""
-        total_episodes = self.course.episodes.count()
-        if total_episodes == 0:
-            self.completion_percentage = 0
-            self.save(update_fields=['completion_percentage'])
-            return
-            
-        completed_episodes = UserProgress.objects.filter(
-            user=self.user,
-            episode__course=self.course,
+        """Recount the counters of this enrollment and update the completion percentage"""
+        self.total_episodes = Episode.objects.filter(
+            course_id=self.course_id, status='published').count()
+        self.completed_episodes = UserProgress.objects.filter(
+            user_id=self.user_id,
+            episode__course_id=self.course_id,
+            episode__status='published',
             completed=True
         ).count()
-        
-        self.completion_percentage = int((completed_episodes / total_episodes) * 100)
-        self.save(update_fields=['completion_percentage'])
+        self.completion_percentage = self.calculate_percentage(
+            self.completed_episodes, self.total_episodes)
+        self.save(update_fields=[
+                  'total_episodes', 'completed_episodes', 'completion_percentage'])
 
 
 class UserProgress(models.Model):
+    # Progress above this percentage marks the episode as completed
+    COMPLETION_THRESHOLD = 90
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='progress', verbose_name='کاربر')
     episode = models.ForeignKey(Episode, on_delete=models.CASCADE, related_name='user_progress', verbose_name='اپیزود')
     completed = models.BooleanField(default=False, verbose_name='تکمیل شده')
@@ -70,14 +196,26 @@ class UserProgress(models.Model):
     def mark_as_completed(self):
         """Mark episode as completed and update completion_at timestamp"""
         if not self.completed:
+            now = timezone.now()
+            # Only the request that flips the row counts the completion, so
+            # concurrent completions of the same episode count it once
+            marked = UserProgress.objects.filter(pk=self.pk, completed=False).update(
+                completed=True, progress_percentage=100, last_position=self.last_position,
+                completed_at=now, updated_at=now)
             self.completed = True
             self.progress_percentage = 100
-            self.completed_at = timezone.now()
-            self.save(update_fields=['completed', 'progress_percentage', 'completed_at'])
-            
-            # Update enrollment completion percentage
-            enrollment = Enrollment.objects.get(user=self.user, course=self.episode.course)
-            enrollment.update_completion_percentage()
+            if marked != 1:
+                return
+            self.completed_at = now
+            self.updated_at = now
+
+            # Update enrollment completion counters, only published episodes
+            # count towards the course total
+            if self.episode.status == 'published':
+                enrollment = Enrollment.objects.filter(
+                    user_id=self.user_id, course_id=self.episode.course_id).first()
+                if enrollment:
+                    enrollment.record_episode_completion()
     
     def update_progress(self, position, duration):
         """Update progress based on current position in video"""
@@ -86,7 +224,8 @@ class UserProgress(models.Model):
             self.progress_percentage = min(int((position / duration) * 100), 100)
             
             # If progress is > 90%, mark as completed
-            if self.progress_percentage > 90 and not self.completed:
+            if self.progress_percentage > self.COMPLETION_THRESHOLD and not self.completed:
                 self.mark_as_completed()
             else:
-                self.save(update_fields=['last_position', 'progress_percentage'])
\ No newline at end of file
+                # updated_at tells buffered heartbeats this write is newer
+                self.save(update_fields=['last_position', 'progress_percentage', 'updated_at'])
\ No newline at end of file
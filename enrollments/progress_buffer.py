@@ -0,0 +1,178 @@
+import logging
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from core.redis_client import get_redis
+from .models import UserProgress
+
+logger = logging.getLogger(__name__)
+
+DIRTY_SET_KEY = 'progress:dirty'
+# Buffered state outlives the flush interval by a wide margin, it only
+# expires once the learner stops watching
+STATE_TTL = 24 * 60 * 60
+
+
+def _state_key(user_id, episode_id):
+    return f"progress:{user_id}:{episode_id}"
+
+
+def _is_completed(redis, key, user_id, episode_id):
+    """Completion flag of the buffered state, loaded from the database once"""
+    completed = redis.hget(key, 'completed')
+    if completed is None:
+        completed = '1' if UserProgress.objects.filter(
+            user_id=user_id, episode_id=episode_id, completed=True).exists() else '0'
+        redis.hset(key, 'completed', completed)
+    return completed == '1'
+
+
+def buffer_heartbeat(user_id, episode_id, position, percentage):
+    """
+    Store the latest player position for a later bulk flush.
+
+    Returns the buffered state as a dict, or None when Redis is unavailable
+    and the caller has to write the progress synchronously.
+    """
+    key = _state_key(user_id, episode_id)
+    try:
+        redis = get_redis()
+        pipe = redis.pipeline()
+        pipe.hset(key, mapping={
+            'position': int(position),
+            'percentage': percentage,
+            'updated_at': timezone.now().timestamp(),
+        })
+        pipe.expire(key, STATE_TTL)
+        pipe.sadd(DIRTY_SET_KEY, f"{user_id}:{episode_id}")
+        pipe.execute()
+        completed = _is_completed(redis, key, user_id, episode_id)
+    except RedisError as e:
+        logger.warning(
+            f"Progress buffer unavailable, writing heartbeat directly: {e}")
+        return None
+    return {'progress_percentage': percentage, 'completed': completed}
+
+
+def record_synchronous_progress(progress):
+    """
+    Mirror a progress row written directly (e.g. a completion) into the buffer.
+
+    This keeps an older buffered heartbeat from overwriting it on the next
+    flush.
+    """
+    key = _state_key(progress.user_id, progress.episode_id)
+    try:
+        pipe = get_redis().pipeline()
+        pipe.srem(DIRTY_SET_KEY, f"{progress.user_id}:{progress.episode_id}")
+        pipe.hset(key, mapping={
+            'position': progress.last_position,
+            'percentage': progress.progress_percentage,
+            'completed': '1' if progress.completed else '0',
+            'updated_at': timezone.now().timestamp(),
+        })
+        pipe.expire(key, STATE_TTL)
+        pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Could not update progress buffer: {e}")
+
+
+def flush_buffered_progress(batch_size=None):
+    """
+    Write buffered heartbeats to UserProgress in bulk.
+
+    Returns the number of (user, episode) pairs flushed. A heartbeat that
+    arrives while a batch is flushed marks its pair dirty again, so it is
+    picked up by the next batch instead of being lost.
+    """
+    batch_size = batch_size or settings.PROGRESS_FLUSH_BATCH_SIZE
+    redis = get_redis()
+    flushed = 0
+
+    while True:
+        members = redis.spop(DIRTY_SET_KEY, batch_size)
+        if not members:
+            break
+
+        pairs = []
+        for member in members:
+            user_id, episode_id = member.split(':')
+            pairs.append((int(user_id), int(episode_id)))
+
+        pipe = redis.pipeline()
+        for user_id, episode_id in pairs:
+            pipe.hmget(_state_key(user_id, episode_id),
+                       'position', 'percentage', 'updated_at')
+        states = {}
+        for pair, (position, percentage, updated_at) in zip(pairs, pipe.execute()):
+            if position is None:
+                continue  # Expired before it could be flushed
+            states[pair] = (int(position), int(percentage),
+                            float(updated_at))
+
+        try:
+            _write_progress(states)
+        except Exception:
+            # Put the batch back so a failed write is retried on the next run
+            redis.sadd(DIRTY_SET_KEY, *members)
+            raise
+        flushed += len(states)
+
+        if len(members) < batch_size:
+            break
+
+    return flushed
+
+
+def _write_progress(states):
+    if not states:
+        return
+
+    user_ids = {user_id for user_id, _ in states}
+    episode_ids = {episode_id for _, episode_id in states}
+    existing = {
+        (progress.user_id, progress.episode_id): progress
+        for progress in UserProgress.objects.filter(
+            user_id__in=user_ids, episode_id__in=episode_ids)
+        if (progress.user_id, progress.episode_id) in states
+    }
+
+    to_update = []
+    to_create = []
+    for (user_id, episode_id), (position, percentage, updated_at) in states.items():
+        updated_at = datetime.fromtimestamp(updated_at, tz=dt_timezone.utc)
+        progress = existing.get((user_id, episode_id))
+        if progress is None:
+            to_create.append(UserProgress(
+                user_id=user_id,
+                episode_id=episode_id,
+                last_position=position,
+                progress_percentage=percentage,
+            ))
+            continue
+        # The row is only written if the heartbeat is newer, a synchronous
+        # write (e.g. a completion) may have landed since the state was
+        # popped. A completed row keeps its percentage.
+        newer_row = Q(updated_at__gt=updated_at)
+        progress.last_position = Case(
+            When(newer_row, then=F('last_position')), default=Value(position))
+        progress.progress_percentage = Case(
+            When(newer_row | Q(completed=True), then=F('progress_percentage')),
+            default=Value(percentage))
+        progress.updated_at = Case(
+            When(newer_row, then=F('updated_at')), default=Value(updated_at))
+        to_update.append(progress)
+
+    if to_update:
+        UserProgress.objects.bulk_update(
+            to_update, ['last_position', 'progress_percentage', 'updated_at'])
+    if to_create:
+        # A row created concurrently by a completion wins over the heartbeat
+        UserProgress.objects.bulk_create(to_create, ignore_conflicts=True)
+
+    logger.info(
+        f"Flushed {len(to_update)} updated and {len(to_create)} new progress rows")
@@ -0,0 +1,40 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from courses.models import Episode
+from .models import Enrollment
+
+
+def _schedule_counter_refresh(course_id):
+    from .tasks import refresh_course_enrollment_counters
+    transaction.on_commit(
+        lambda: refresh_course_enrollment_counters.delay(course_id))
+
+
+@receiver(post_save, sender=Episode)
+def refresh_counters_on_episode_status_change(sender, instance, created, **kwargs):
+    """Fan out a counter refresh when an episode is published or unpublished"""
+    was_published = getattr(instance, '_loaded_status', None) == 'published'
+    is_published = instance.status == 'published'
+    if was_published != is_published:
+        _schedule_counter_refresh(instance.course_id)
+
+
+@receiver(post_delete, sender=Episode)
+def refresh_counters_on_episode_delete(sender, instance, **kwargs):
+    """Fan out a counter refresh when a published episode is deleted"""
+    if instance.status == 'published':
+        _schedule_counter_refresh(instance.course_id)
+
+
+@receiver(post_save, sender=Enrollment)
+def increment_enrollment_counts(sender, instance, created, **kwargs):
+    """Count new enrollments (including those created by paid orders) towards popularity"""
+    if created:
+        Enrollment.adjust_enrollment_counts(instance.course_id, 1)
+
+
+@receiver(post_delete, sender=Enrollment)
+def decrement_enrollment_counts(sender, instance, **kwargs):
+    Enrollment.adjust_enrollment_counts(instance.course_id, -1)
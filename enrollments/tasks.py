@@ -0,0 +1,31 @@
+import logging
+from celery import shared_task
+
+from .progress_buffer import flush_buffered_progress
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def flush_progress_heartbeats():
+    """
+    Periodic task writing buffered video progress heartbeats to the database
+    """
+    flushed = flush_buffered_progress()
+    if flushed:
+        logger.info(f"Flushed {flushed} buffered progress heartbeats")
+    return flushed
+
+
+@shared_task
+def refresh_course_enrollment_counters(course_id):
+    """
+    Recalculate the completion counters of every enrollment in a course after
+    one of its episodes was published, unpublished or deleted
+    """
+    from .models import Enrollment
+
+    updated = Enrollment.refresh_course_counters(course_id)
+    logger.info(
+        f"Refreshed completion counters of {updated} enrollments in course {course_id}")
+    return updated
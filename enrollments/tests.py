@@ -1,3 +1,181 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+import fakeredis
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import MyUser
+from core.testing import CatalogDataMixin
+from courses.models import Course, RoadMap
+from .models import Enrollment, UserProgress
+from .progress_buffer import buffer_heartbeat, flush_buffered_progress
+
+
+class ProgressBufferTests(CatalogDataMixin, TestCase):
+    """Video heartbeats are buffered in Redis and written in bulk"""
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+        patcher = mock.patch('enrollments.progress_buffer.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.episodes = list(self.courses[0].episodes.order_by('id'))
+        self.client.force_login(self.user)
+
+    def heartbeat(self, episode, position, duration=100, **data):
+        return self.client.post(f"/api/v1/courses/episodes/{episode.id}/progress/",
+                                {'position': position, 'duration': duration, **data},
+                                content_type='application/json')
+
+    def progress(self, episode):
+        return UserProgress.objects.get(user=self.user, episode=episode)
+
+    def test_heartbeats_are_flushed_in_bulk(self):
+        for position in (10, 20, 30):
+            response = self.heartbeat(self.episodes[0], position)
+        self.assertEqual(response.json(), {'progress_percentage': 30, 'completed': False})
+        self.heartbeat(self.episodes[1], 50)
+        self.assertFalse(UserProgress.objects.exists())
+
+        self.assertEqual(flush_buffered_progress(), 2)
+        self.assertEqual(self.progress(self.episodes[0]).last_position, 30)
+        self.assertEqual(self.progress(self.episodes[1]).progress_percentage, 50)
+        # Nothing is left to flush
+        self.assertEqual(flush_buffered_progress(), 0)
+
+        self.heartbeat(self.episodes[0], 40)
+        with self.assertNumQueries(2):
+            flush_buffered_progress()
+        self.assertEqual(self.progress(self.episodes[0]).progress_percentage, 40)
+
+    def test_completions_are_written_right_away(self):
+        self.heartbeat(self.episodes[0], 30)
+        response = self.heartbeat(self.episodes[0], 30, completed=True)
+        self.assertEqual(response.json(), {'progress_percentage': 100, 'completed': True})
+        self.assertEqual(flush_buffered_progress(), 0)
+        self.assertEqual(self.progress(self.episodes[0]).progress_percentage, 100)
+
+    def test_flush_keeps_completed_rows(self):
+        progress = UserProgress.objects.create(user=self.user, episode=self.episodes[0])
+        progress.mark_as_completed()
+        # A heartbeat sent after the completion, e.g. rewinding the video
+        self.assertTrue(buffer_heartbeat(self.user.id, self.episodes[0].id, 30, 30)['completed'])
+
+        flush_buffered_progress()
+        progress.refresh_from_db()
+        self.assertTrue(progress.completed)
+        self.assertEqual(progress.progress_percentage, 100)
+        self.assertEqual(progress.last_position, 30)
+
+    def test_flush_keeps_newer_synchronous_writes(self):
+        progress = UserProgress.objects.create(user=self.user, episode=self.episodes[0])
+        with mock.patch('enrollments.progress_buffer.timezone.now',
+                        return_value=timezone.now() - timedelta(seconds=5)):
+            buffer_heartbeat(self.user.id, self.episodes[0].id, 20, 20)
+        # Written after the heartbeat, while the flush has already taken it
+        progress.update_progress(95, 100)
+
+        flush_buffered_progress()
+        progress.refresh_from_db()
+        self.assertTrue(progress.completed)
+        self.assertEqual((progress.last_position, progress.progress_percentage), (95, 100))
+
+
+class CompletionCounterTests(CatalogDataMixin, TestCase):
+    """Enrollment completion counters are kept up to date without recounting"""
+
+    def setUp(self):
+        self.course = self.courses[0]
+        self.episodes = list(self.course.episodes.order_by('id'))
+        self.enrollment = Enrollment.objects.get(user=self.user, course=self.course)
+
+    def complete(self, episode):
+        progress, _ = UserProgress.objects.get_or_create(user=self.user, episode=episode)
+        progress.mark_as_completed()
+        return progress
+
+    def counters(self):
+        self.enrollment.refresh_from_db()
+        return (self.enrollment.completed_episodes, self.enrollment.total_episodes,
+                self.enrollment.completion_percentage)
+
+    def test_completions_are_counted(self):
+        self.assertEqual(self.counters(), (0, 6, 0))
+        self.complete(self.episodes[0])
+        self.complete(self.episodes[1])
+        self.assertEqual(self.counters(), (2, 6, 33))
+
+    def test_mark_as_completed_is_idempotent(self):
+        first = UserProgress.objects.create(user=self.user, episode=self.episodes[0])
+        # A concurrent request loaded the same row before it was completed
+        second = UserProgress.objects.get(pk=first.pk)
+        first.mark_as_completed()
+        second.mark_as_completed()
+        first.mark_as_completed()
+        self.assertTrue(second.completed)
+        self.assertEqual(self.counters(), (1, 6, 16))
+
+    def test_publishing_changes_refresh_the_counters(self):
+        self.complete(self.episodes[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.episodes[0].status = 'draft'
+            self.episodes[0].save()
+        self.assertEqual(self.counters(), (0, 5, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.episodes[0].status = 'published'
+            self.episodes[0].save()
+            self.episodes[5].delete()
+        self.assertEqual(self.counters(), (1, 5, 20))
+
+    def test_counters_match_a_recount(self):
+        for episode in self.episodes[:4]:
+            self.complete(episode)
+        counters = self.counters()
+        self.enrollment.update_completion_percentage()
+        self.assertEqual(self.counters(), counters)
+
+
+class EnrollmentCountTests(CatalogDataMixin, TestCase):
+    """Stored enrollment counts of courses and roadmaps, used to rank popularity"""
+
+    def setUp(self):
+        # The roadmap was created after its courses' enrollments
+        Enrollment.rebuild_enrollment_counts()
+
+    def counts(self):
+        return (Course.objects.get(pk=self.courses[0].pk).enrollment_count,
+                RoadMap.objects.get(pk=self.roadmap.pk).enrollment_count)
+
+    def test_enrollments_are_counted(self):
+        self.assertEqual(self.counts(), (1, 3))
+        other = MyUser.objects.create_user(
+            email='other@example.com', username='other', password='password')
+        enrollment = Enrollment.objects.create(user=other, course=self.courses[0])
+        self.assertEqual(self.counts(), (2, 4))
+        enrollment.delete()
+        self.assertEqual(self.counts(), (1, 3))
+
+    def test_counts_never_go_below_zero(self):
+        Enrollment.adjust_enrollment_counts(self.courses[0].id, -5)
+        self.assertEqual(self.counts(), (0, 0))
+        Enrollment.adjust_enrollment_counts(self.courses[0].id, -1)
+        self.assertEqual(self.counts(), (0, 0))
+        Enrollment.adjust_enrollment_counts(self.courses[0].id, 2)
+        self.assertEqual(self.counts(), (2, 2))
+
+    def test_rebuild_command_repairs_drift(self):
+        Course.objects.update(enrollment_count=9)
+        RoadMap.objects.update(enrollment_count=0)
+        out = StringIO()
+        call_command('rebuild_enrollment_counts', '--course', str(self.courses[0].id), stdout=out)
+        self.assertIn('1 course(s)', out.getvalue())
+        # The roadmap sums its courses, the others are not rebuilt yet
+        self.assertEqual(self.counts(), (1, 19))
 
-# Create your tests here.
+        call_command('rebuild_enrollment_counts', stdout=StringIO())
+        self.assertEqual(self.counts(), (1, 3))
+        self.assertEqual(self.create_course().enrollment_count, 0)
@@ -16,6 +16,9 @@ echo "Starting entrypoint script..."
 echo "Running database migrations..."
 python manage.py migrate --noinput
 
+echo "Building the search index if it is empty..."
+python manage.py rebuild_search_index --if-empty
+
 echo "Collecting static files..."
 python manage.py collectstatic --noinput --clear
 
@@ -0,0 +1,181 @@
+import bisect
+import heapq
+import logging
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from accounts.models import Teacher
+from blog.models import Post
+from core.local_index import LocalIndex
+from courses.models import Course, RoadMap
+from .normalization import ZWNJ, normalize_phrase
+
+logger = logging.getLogger(__name__)
+
+AUTOCOMPLETE_VERSION_KEY = 'search:autocomplete-index:version'
+
+# Rebuild at least this often, popularity (enrollments, views) changes
+# without a signal
+AUTOCOMPLETE_INDEX_TTL = getattr(settings, 'AUTOCOMPLETE_INDEX_TTL', 300)
+
+MAX_SUGGESTIONS = 20
+
+# Suggestions of prefixes up to this length are ranked when the index is built,
+# they match too many keys to rank them per keystroke. Longer prefixes are
+# ranked on first use and remembered until the index is rebuilt.
+PRECOMPUTED_PREFIX_LENGTH = 3
+MAX_REMEMBERED_PREFIXES = 10000
+
+
+class AutocompleteIndex:
+    """
+    In-memory prefix index of the titles shown in search-as-you-type.
+
+    Every suggestion is indexed under its normalized title (and latin title)
+    starting at each word, in one sorted list searched with bisect. Lookups
+    never touch the database; only visible items are indexed and the index
+    expires when the next scheduled item is due.
+    """
+
+    def __init__(self):
+        self.expires_at = None
+        # Serialized suggestions and their popularity, by position
+        self.suggestions = []
+        self.popularity = []
+        # Sorted (key, from the first word, suggestion position) tuples
+        self.keys = []
+        self.precomputed = {}
+
+    @classmethod
+    def build(cls):
+        index = cls()
+        now = timezone.now()
+        index._add_courses(now)
+        index._add_roadmaps(now)
+        index._add_teachers(now)
+        index._add_posts(now)
+        index.keys.sort()
+        index._precompute()
+        logger.info(
+            f"Built autocomplete index with {len(index.suggestions)} suggestions")
+        return index
+
+    def _visible(self, published_at, now):
+        """Whether an item is shown now, the index expires when a scheduled one is due"""
+        if published_at is None:
+            return False
+        if published_at > now:
+            if self.expires_at is None or published_at < self.expires_at:
+                self.expires_at = published_at
+            return False
+        return True
+
+    def _add(self, suggestion_type, obj_id, title, slug, popularity, texts):
+        position = len(self.suggestions)
+        self.suggestions.append({
+            'type': suggestion_type, 'id': obj_id, 'title': title, 'slug': slug})
+        self.popularity.append(popularity)
+        keys = set()
+        # Words joined by a zero-width non-joiner also match typed apart
+        phrases = {normalize_phrase(variant) for text in texts
+                   for variant in (text, (text or '').replace(ZWNJ, ' '))}
+        for phrase in phrases:
+            words = phrase.split(' ') if phrase else []
+            for start in range(len(words)):
+                # The trailing space lets a completed last word match, see suggest()
+                key = ' '.join(words[start:]) + ' '
+                if (key, start == 0) not in keys:
+                    keys.add((key, start == 0))
+                    self.keys.append((key, start == 0, position))
+
+    def _add_courses(self, now):
+        for course_id, title, latin_title, slug, enrollment_count, published_at in Course.objects.filter(
+                status='published').values_list(
+                'id', 'title', 'latin_title', 'slug', 'enrollment_count', 'published_at'):
+            if self._visible(published_at, now):
+                self._add('course', course_id, title, slug,
+                          enrollment_count, [title, latin_title])
+
+    def _add_roadmaps(self, now):
+        for roadmap_id, name, slug, enrollment_count, published_at in RoadMap.objects.filter(
+                status='published').values_list('id', 'name', 'slug', 'enrollment_count', 'published_at'):
+            if self._visible(published_at, now):
+                self._add('roadmap', roadmap_id, name, slug,
+                          enrollment_count, [name])
+
+    def _add_teachers(self, now):
+        # Teachers of visible courses, as popular as their courses together
+        teachers = Teacher.objects.filter(
+            teaching_courses__status='published',
+            teaching_courses__published_at__lte=now
+        ).annotate(
+            popularity=Sum('teaching_courses__enrollment_count')
+        ).values_list('id', 'first_name', 'last_name', 'slug', 'popularity')
+        for teacher_id, first_name, last_name, slug, popularity in teachers:
+            name = f"{first_name} {last_name}".strip()
+            self._add('teacher', teacher_id, name, slug, popularity or 0, [name])
+
+    def _add_posts(self, now):
+        for post_id, title, slug, views_count, published_at in Post.objects.filter(
+                status='published').values_list('id', 'title', 'slug', 'views_count', 'published_at'):
+            if self._visible(published_at, now):
+                self._add('post', post_id, title, slug, views_count, [title])
+
+    def _rank(self, matches, limit):
+        """Best suggestions first: titles starting with the query, then the most popular"""
+        best = heapq.nsmallest(limit, matches.items(), key=lambda item: (
+            not item[1], -self.popularity[item[0]], item[0]))
+        return [position for position, _ in best]
+
+    def _matches(self, prefix):
+        """{suggestion position: whether its title starts with the prefix}"""
+        matches = {}
+        start = bisect.bisect_left(self.keys, (prefix,))
+        end = bisect.bisect_left(self.keys, (prefix + '\uffff',), start)
+        for index in range(start, end):
+            _, from_start, position = self.keys[index]
+            matches[position] = matches.get(position, False) or from_start
+        return matches
+
+    def _precompute(self):
+        prefixes = {key[:length] for key, _, _ in self.keys
+                    for length in range(1, PRECOMPUTED_PREFIX_LENGTH + 1)}
+        self.precomputed = {
+            prefix: self._rank(self._matches(prefix), MAX_SUGGESTIONS) for prefix in prefixes
+        }
+
+    def is_expired(self):
+        """A scheduled item became visible since the index was built"""
+        return self.expires_at is not None and timezone.now() >= self.expires_at
+
+    def suggest(self, query, limit=10):
+        """Return up to limit serialized suggestions for the typed query"""
+        prefix = normalize_phrase(query)
+        if not prefix:
+            return []
+        limit = min(limit, MAX_SUGGESTIONS)
+        # A trailing space means the last word is complete
+        if query[-1:].isspace():
+            prefix += ' '
+        positions = self.precomputed.get(prefix)
+        if positions is None:
+            positions = self._rank(self._matches(prefix), MAX_SUGGESTIONS)
+            if len(self.precomputed) < MAX_REMEMBERED_PREFIXES:
+                self.precomputed[prefix] = positions
+        return [self.suggestions[position] for position in positions[:limit]]
+
+
+_autocomplete_index = LocalIndex(
+    AUTOCOMPLETE_VERSION_KEY, AutocompleteIndex.build, AUTOCOMPLETE_INDEX_TTL)
+
+
+def get_autocomplete_index():
+    """Return this process' autocomplete index, rebuilding it if it is outdated"""
+    return _autocomplete_index.get()
+
+
+def invalidate_autocomplete_index():
+    """Mark the autocomplete index as outdated in every process sharing the cache"""
+    _autocomplete_index.invalidate()
@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+_backend = None
+
+
+def get_search_backend():
+    """Return this process' search backend, configured by the SEARCH_BACKEND setting"""
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.SEARCH_BACKEND)()
+    return _backend
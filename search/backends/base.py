@@ -0,0 +1,99 @@
+import math
+from collections import Counter, namedtuple
+
+# A searchable object: its terms are {term: weighted frequency}
+IndexedDocument = namedtuple(
+    'IndexedDocument', ['doc_type', 'object_id', 'published_at', 'terms', 'length'])
+
+
+class SearchBackend:
+    """
+    Inverted index of the searchable content, ranked with BM25.
+
+    Backends store the documents and their postings. search() ranks what
+    get_postings() returns, so every backend ranks results the same way.
+    """
+    k1 = 1.2
+    b = 0.75
+    # The last query word, which may still be typed, also matches longer
+    # terms starting with it, at a lower weight
+    prefix_match_weight = 0.5
+    min_prefix_length = 2
+
+    def index_documents(self, documents):
+        """Add or replace the given IndexedDocuments"""
+        raise NotImplementedError
+
+    def remove_documents(self, doc_type, object_ids):
+        raise NotImplementedError
+
+    def clear(self, doc_types):
+        raise NotImplementedError
+
+    def count(self, doc_types):
+        raise NotImplementedError
+
+    def get_stats(self, doc_types):
+        """Return the number of documents of the given types and their average length"""
+        raise NotImplementedError
+
+    def get_postings(self, terms, prefixes, doc_types):
+        """
+        Return the postings of the given terms and of the terms starting with
+        one of the prefixes, as (term, doc_type, object_id, frequency,
+        document length, published_at) tuples
+        """
+        raise NotImplementedError
+
+    def search(self, query_terms, doc_types, now):
+        """
+        Return the (doc_type, object_id) keys of the documents published by
+        now that match every query term, best match first
+        """
+        if not query_terms:
+            return []
+        # Only the last word is matched as a prefix, the words before it are
+        # complete and a prefix scan would load many unrelated postings
+        *exact, last = query_terms
+        prefixes = []
+        if len(last) >= self.min_prefix_length:
+            prefixes.append(last)
+        else:
+            exact.append(last)
+
+        postings = list(self.get_postings(exact, prefixes, doc_types))
+        total, average_length = self.get_stats(doc_types)
+        if not postings or not total:
+            return []
+
+        # Every (term, document) pair is posted once
+        document_frequency = Counter(posting[0] for posting in postings)
+
+        scores = {}
+        for term, doc_type, object_id, frequency, length, published_at in postings:
+            if published_at is None or published_at > now:
+                continue
+            frequency_in_corpus = document_frequency[term]
+            idf = math.log(
+                1 + (total - frequency_in_corpus + 0.5) / (frequency_in_corpus + 0.5))
+            norm = 1 - self.b + self.b * length / (average_length or 1)
+            term_score = idf * frequency * (self.k1 + 1) / (frequency + self.k1 * norm)
+
+            matches = scores.setdefault((doc_type, object_id), {})
+            for query_term in query_terms:
+                if term == query_term:
+                    weight = 1
+                elif query_term in prefixes and term.startswith(query_term):
+                    weight = self.prefix_match_weight
+                else:
+                    continue
+                # Each query term counts with its best matching term
+                matches[query_term] = max(
+                    matches.get(query_term, 0), term_score * weight)
+
+        ranked = [
+            (sum(matches.values()), key) for key, matches in scores.items()
+            if len(matches) == len(query_terms)
+        ]
+        ranked.sort(key=lambda item: (-item[0], item[1]))
+        return [key for _, key in ranked]
@@ -0,0 +1,79 @@
+from django.db import transaction
+from django.db.models import Avg, Count, Q
+
+from .base import SearchBackend
+from ..models import SearchDocument, SearchPosting
+
+
+class DatabaseBackend(SearchBackend):
+    """Index stored in the SearchDocument and SearchPosting tables, shared by every process"""
+    batch_size = 500
+
+    def _documents_q(self, keys):
+        object_ids = {}
+        for doc_type, object_id in keys:
+            object_ids.setdefault(doc_type, []).append(object_id)
+        condition = Q(pk__in=[])
+        for doc_type, ids in object_ids.items():
+            condition |= Q(doc_type=doc_type, object_id__in=ids)
+        return condition
+
+    def index_documents(self, documents):
+        documents = list(documents)
+        for start in range(0, len(documents), self.batch_size):
+            batch = documents[start:start + self.batch_size]
+            keys = [(document.doc_type, document.object_id) for document in batch]
+            with transaction.atomic():
+                SearchDocument.objects.filter(self._documents_q(keys)).delete()
+                SearchDocument.objects.bulk_create([
+                    SearchDocument(
+                        doc_type=document.doc_type,
+                        object_id=document.object_id,
+                        published_at=document.published_at,
+                        length=document.length,
+                    ) for document in batch
+                ])
+                # bulk_create() does not return primary keys on MySQL
+                document_ids = {
+                    (doc_type, object_id): pk for pk, doc_type, object_id in
+                    SearchDocument.objects.filter(self._documents_q(keys)).values_list(
+                        'pk', 'doc_type', 'object_id')
+                }
+                SearchPosting.objects.bulk_create([
+                    SearchPosting(
+                        term=term,
+                        document_id=document_ids[(document.doc_type, document.object_id)],
+                        frequency=frequency,
+                    )
+                    for document in batch for term, frequency in document.terms.items()
+                ], batch_size=1000)
+
+    def remove_documents(self, doc_type, object_ids):
+        if object_ids:
+            SearchDocument.objects.filter(
+                doc_type=doc_type, object_id__in=object_ids).delete()
+
+    def clear(self, doc_types):
+        SearchPosting.objects.filter(document__doc_type__in=doc_types).delete()
+        SearchDocument.objects.filter(doc_type__in=doc_types).delete()
+
+    def count(self, doc_types):
+        return SearchDocument.objects.filter(doc_type__in=doc_types).count()
+
+    def get_stats(self, doc_types):
+        stats = SearchDocument.objects.filter(doc_type__in=doc_types).aggregate(
+            total=Count('id'), average_length=Avg('length'))
+        return stats['total'], stats['average_length'] or 0
+
+    def get_postings(self, terms, prefixes, doc_types):
+        condition = Q(term__in=terms) if terms else Q(pk__in=[])
+        for prefix in prefixes:
+            # Terms are normalized to lowercase already; unlike startswith,
+            # istartswith is a plain LIKE that MySQL answers from the index
+            condition |= Q(term__istartswith=prefix)
+        return SearchPosting.objects.filter(
+            condition, document__doc_type__in=doc_types
+        ).values_list(
+            'term', 'document__doc_type', 'document__object_id', 'frequency',
+            'document__length', 'document__published_at'
+        )
@@ -0,0 +1,94 @@
+import bisect
+import threading
+
+from .base import SearchBackend
+
+
+class MemoryBackend(SearchBackend):
+    """
+    Pure-Python index kept in this process, for tests and development.
+
+    Every process has its own copy, which only sees the changes made in the
+    same process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._documents = {}
+        self._postings = {}
+        self._totals = {}
+        # Sorted terms for prefix lookups, rebuilt lazily after changes
+        self._sorted_terms = []
+        self._terms_changed = False
+
+    def _remove(self, key):
+        document = self._documents.pop(key, None)
+        if document is None:
+            return
+        for term in document.terms:
+            documents = self._postings[term]
+            documents.pop(key, None)
+            if not documents:
+                del self._postings[term]
+                self._terms_changed = True
+        totals = self._totals[document.doc_type]
+        totals[0] -= 1
+        totals[1] -= document.length
+
+    def index_documents(self, documents):
+        with self._lock:
+            for document in documents:
+                key = (document.doc_type, document.object_id)
+                self._remove(key)
+                self._documents[key] = document
+                for term, frequency in document.terms.items():
+                    if term not in self._postings:
+                        self._postings[term] = {}
+                        self._terms_changed = True
+                    self._postings[term][key] = frequency
+                totals = self._totals.setdefault(document.doc_type, [0, 0])
+                totals[0] += 1
+                totals[1] += document.length
+
+    def remove_documents(self, doc_type, object_ids):
+        with self._lock:
+            for object_id in object_ids:
+                self._remove((doc_type, object_id))
+
+    def clear(self, doc_types):
+        with self._lock:
+            for key in [key for key in self._documents if key[0] in doc_types]:
+                self._remove(key)
+
+    def count(self, doc_types):
+        return sum(self._totals.get(doc_type, [0, 0])[0] for doc_type in doc_types)
+
+    def get_stats(self, doc_types):
+        count = length = 0
+        for doc_type in doc_types:
+            totals = self._totals.get(doc_type, [0, 0])
+            count += totals[0]
+            length += totals[1]
+        return count, (length / count if count else 0)
+
+    def get_postings(self, terms, prefixes, doc_types):
+        with self._lock:
+            if self._terms_changed:
+                self._sorted_terms = sorted(self._postings)
+                self._terms_changed = False
+
+            matched = {term for term in terms if term in self._postings}
+            for prefix in prefixes:
+                index = bisect.bisect_left(self._sorted_terms, prefix)
+                while index < len(self._sorted_terms) and self._sorted_terms[index].startswith(prefix):
+                    matched.add(self._sorted_terms[index])
+                    index += 1
+
+            postings = []
+            for term in matched:
+                for key, frequency in self._postings[term].items():
+                    if key[0] in doc_types:
+                        document = self._documents[key]
+                        postings.append((term, key[0], key[1], frequency,
+                                         document.length, document.published_at))
+            return postings
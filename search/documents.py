@@ -0,0 +1,82 @@
+from collections import Counter
+
+from blog.models import Post
+from courses.models import Course, RoadMap
+from .backends.base import IndexedDocument
+from .normalization import tokenize
+
+
+class DocumentType:
+    """How a model is indexed: which objects are searchable and the text they contain"""
+    doc_type = None
+    model = None
+    # Fields whose change requires reindexing an object
+    indexed_fields = ('status', 'published_at')
+
+    def get_queryset(self):
+        """The searchable objects, anything else is removed from the index"""
+        return self.model.objects.filter(status='published')
+
+    def get_fields(self, obj):
+        """Return (text, weight) pairs, the terms of a field count weight times"""
+        raise NotImplementedError
+
+    def build(self, obj):
+        terms = Counter()
+        for text, weight in self.get_fields(obj):
+            for term in tokenize(text):
+                terms[term] += weight
+        return IndexedDocument(
+            self.doc_type, obj.pk, obj.published_at, dict(terms), sum(terms.values()))
+
+
+class CourseDocument(DocumentType):
+    doc_type = 'course'
+    model = Course
+    indexed_fields = DocumentType.indexed_fields + (
+        'title', 'latin_title', 'excerpt', 'description')
+
+    def get_queryset(self):
+        return super().get_queryset().prefetch_related('teachers')
+
+    def get_fields(self, course):
+        teachers = ' '.join(
+            f"{teacher.first_name} {teacher.last_name}" for teacher in course.teachers.all())
+        return [
+            (course.title, 3),
+            (course.latin_title, 3),
+            (teachers, 2),
+            (course.excerpt, 1),
+            (course.description, 1),
+        ]
+
+
+class RoadMapDocument(DocumentType):
+    doc_type = 'roadmap'
+    model = RoadMap
+    indexed_fields = DocumentType.indexed_fields + ('name', 'description')
+
+    def get_fields(self, roadmap):
+        return [
+            (roadmap.name, 3),
+            (roadmap.description, 1),
+        ]
+
+
+class PostDocument(DocumentType):
+    doc_type = 'post'
+    model = Post
+    indexed_fields = DocumentType.indexed_fields + ('title', 'excerpt', 'content')
+
+    def get_fields(self, post):
+        return [
+            (post.title, 3),
+            (post.excerpt, 2),
+            (post.content, 1),
+        ]
+
+
+DOCUMENT_TYPES = {
+    document_type.doc_type: document_type
+    for document_type in (CourseDocument(), RoadMapDocument(), PostDocument())
+}
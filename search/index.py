@@ -0,0 +1,64 @@
+import logging
+
+from django.utils import timezone
+
+from .backends import get_search_backend
+from .documents import DOCUMENT_TYPES
+from .normalization import tokenize_query
+
+logger = logging.getLogger(__name__)
+
+
+def search(query, doc_types=None, now=None):
+    """
+    Return the (doc_type, object_id) keys of the published documents that
+    match every word of the query, best match first
+    """
+    terms = tokenize_query(query)
+    if not terms:
+        return []
+    return get_search_backend().search(
+        terms, list(doc_types or DOCUMENT_TYPES), now or timezone.now())
+
+
+def search_ids(query, doc_type, now=None):
+    """Ids of the matching objects of one type, best match first"""
+    return [object_id for _, object_id in search(query, [doc_type], now)]
+
+
+def update_objects(doc_type, object_ids):
+    """Reindex the given objects, removing the ones that are no longer searchable"""
+    document_type = DOCUMENT_TYPES[doc_type]
+    documents = [
+        document_type.build(obj)
+        for obj in document_type.get_queryset().filter(pk__in=object_ids)
+    ]
+    indexed = {document.object_id for document in documents}
+    backend = get_search_backend()
+    backend.remove_documents(
+        doc_type, [object_id for object_id in object_ids if object_id not in indexed])
+    backend.index_documents(documents)
+
+
+def remove_objects(doc_type, object_ids):
+    get_search_backend().remove_documents(doc_type, list(object_ids))
+
+
+def rebuild_index(doc_types=None, batch_size=500):
+    """Rebuild the index of the given document types from scratch, returns the number indexed"""
+    backend = get_search_backend()
+    indexed = 0
+    for doc_type in doc_types or DOCUMENT_TYPES:
+        document_type = DOCUMENT_TYPES[doc_type]
+        backend.clear([doc_type])
+        batch = []
+        for obj in document_type.get_queryset().order_by('pk').iterator(chunk_size=batch_size):
+            batch.append(document_type.build(obj))
+            if len(batch) == batch_size:
+                backend.index_documents(batch)
+                indexed += len(batch)
+                batch = []
+        backend.index_documents(batch)
+        indexed += len(batch)
+        logger.info(f"Rebuilt the search index of {doc_type}")
+    return indexed
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from search.backends import get_search_backend
+from search.documents import DOCUMENT_TYPES
+from search.index import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of courses, roadmaps and blog posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', action='append', dest='doc_types', choices=list(DOCUMENT_TYPES),
+                            help='Only rebuild this document type (can be repeated)')
+        parser.add_argument('--if-empty', action='store_true',
+                            help='Only rebuild when the index has no documents yet')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        doc_types = options['doc_types'] or list(DOCUMENT_TYPES)
+        if options['if_empty'] and get_search_backend().count(doc_types):
+            self.stdout.write('Search index is not empty, skipping')
+            return
+        indexed = rebuild_index(doc_types, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {indexed} document(s)"))
@@ -0,0 +1,44 @@
+# Generated by Django 4.2 on 2026-10-17 06:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_type', models.CharField(max_length=20, verbose_name='نوع')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='شناسه')),
+                ('published_at', models.DateTimeField(blank=True, null=True, verbose_name='تاریخ انتشار')),
+                ('length', models.PositiveIntegerField(default=0, verbose_name='طول')),
+            ],
+            options={
+                'verbose_name': 'سند جستجو',
+                'verbose_name_plural': 'اسناد جستجو',
+                'unique_together': {('doc_type', 'object_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='واژه')),
+                ('frequency', models.PositiveIntegerField(verbose_name='تکرار')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='search.searchdocument', verbose_name='سند')),
+            ],
+            options={
+                'verbose_name': 'واژه جستجو',
+                'verbose_name_plural': 'واژه\u200cهای جستجو',
+                'unique_together': {('term', 'document')},
+            },
+        ),
+    ]
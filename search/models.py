@@ -0,0 +1,35 @@
+from django.db import models
+
+
+class SearchDocument(models.Model):
+    """An indexed course, roadmap or blog post, maintained by the database search backend"""
+    doc_type = models.CharField(max_length=20, verbose_name='نوع')
+    object_id = models.PositiveBigIntegerField(verbose_name='شناسه')
+    published_at = models.DateTimeField(
+        null=True, blank=True, verbose_name='تاریخ انتشار')
+    # Number of (weighted) terms, used to normalize BM25 scores
+    length = models.PositiveIntegerField(default=0, verbose_name='طول')
+
+    class Meta:
+        verbose_name = 'سند جستجو'
+        verbose_name_plural = 'اسناد جستجو'
+        unique_together = ['doc_type', 'object_id']
+
+    def __str__(self):
+        return f"{self.doc_type}:{self.object_id}"
+
+
+class SearchPosting(models.Model):
+    """Occurrences of a term in a search document"""
+    term = models.CharField(max_length=64, verbose_name='واژه')
+    document = models.ForeignKey(
+        SearchDocument, on_delete=models.CASCADE, related_name='postings', verbose_name='سند')
+    frequency = models.PositiveIntegerField(verbose_name='تکرار')
+
+    class Meta:
+        verbose_name = 'واژه جستجو'
+        verbose_name_plural = 'واژه‌های جستجو'
+        unique_together = ['term', 'document']
+
+    def __str__(self):
+        return f"{self.term} ({self.document})"
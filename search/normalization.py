@@ -0,0 +1,80 @@
+import re
+
+ZWNJ = '\u200c'
+
+# Arabic letter variants, Persian/Arabic digits and joiners folded to one form
+CHARACTER_MAP = str.maketrans({
+    'ي': 'ی',
+    'ى': 'ی',
+    'ئ': 'ی',
+    'ك': 'ک',
+    'ة': 'ه',
+    'ۀ': 'ه',
+    'أ': 'ا',
+    'إ': 'ا',
+    'ٱ': 'ا',
+    'آ': 'ا',
+    'ؤ': 'و',
+    **{persian: str(digit) for digit, persian in enumerate('۰۱۲۳۴۵۶۷۸۹')},
+    **{arabic: str(digit) for digit, arabic in enumerate('٠١٢٣٤٥٦٧٨٩')},
+    '\u200d': None,  # Zero-width joiner
+    '\u0640': None,  # Tatweel
+})
+
+# Harakat, tanwin, shadda, sukun and the superscript alef
+DIACRITICS_RE = re.compile('[\u064b-\u065f\u0670]')
+
+# Words joined by a zero-width non-joiner stay one token
+WORD_RE = re.compile(rf'[\w{ZWNJ}]+')
+
+STOPWORDS = frozenset({
+    'و', 'در', 'به', 'از', 'که', 'را', 'با', 'این', 'ان', 'برای', 'یا', 'تا',
+    'the', 'and', 'of', 'to', 'in', 'for', 'a', 'an',
+})
+
+MAX_TERM_LENGTH = 64
+
+
+def normalize(text):
+    """Fold letter variants, digits and diacritics and lowercase the text"""
+    text = DIACRITICS_RE.sub('', (text or '').translate(CHARACTER_MAP))
+    return text.lower()
+
+
+def _words(text):
+    for word in WORD_RE.findall(normalize(text)):
+        word = word.strip(ZWNJ)
+        if word:
+            yield word
+
+
+def tokenize(text):
+    """
+    Split text into index terms.
+
+    A word written with a zero-width non-joiner (e.g. "کتاب‌ها") is indexed
+    both joined ("کتابها") and as its parts ("کتاب", "ها"), so it matches
+    however the query writes it.
+    """
+    tokens = []
+    for word in _words(text):
+        parts = [part for part in word.split(ZWNJ) if part]
+        tokens.append(''.join(parts))
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return [token[:MAX_TERM_LENGTH] for token in tokens if token not in STOPWORDS]
+
+
+def normalize_phrase(text):
+    """Normalized words of the text joined by single spaces, for prefix matching"""
+    return ' '.join(word.replace(ZWNJ, '') for word in _words(text))
+
+
+def tokenize_query(text):
+    """Split a search query into terms, keeping each word joined"""
+    terms = []
+    for word in _words(text):
+        term = word.replace(ZWNJ, '')[:MAX_TERM_LENGTH]
+        if term not in STOPWORDS and term not in terms:
+            terms.append(term)
+    return terms
@@ -0,0 +1,91 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import Teacher
+from courses.models import Course
+from .autocomplete import invalidate_autocomplete_index
+from .documents import DOCUMENT_TYPES
+from .index import remove_objects, update_objects
+
+MODEL_DOCUMENT_TYPES = {
+    document_type.model: document_type for document_type in DOCUMENT_TYPES.values()
+}
+
+# Fields shown or matched by the autocomplete suggestions
+AUTOCOMPLETE_FIELDS = {
+    'title', 'latin_title', 'name', 'slug', 'first_name', 'last_name', 'status', 'published_at',
+}
+
+
+def schedule_index_update(doc_type, object_ids):
+    """Reindex the objects once the current transaction is committed"""
+    object_ids = list(object_ids)
+    if object_ids:
+        transaction.on_commit(lambda: update_objects(doc_type, object_ids))
+
+
+def update_search_document(sender, instance, update_fields=None, **kwargs):
+    document_type = MODEL_DOCUMENT_TYPES[sender]
+    if update_fields and not set(update_fields) & set(document_type.indexed_fields):
+        return
+    schedule_index_update(document_type.doc_type, [instance.pk])
+
+
+def remove_search_document(sender, instance, **kwargs):
+    doc_type = MODEL_DOCUMENT_TYPES[sender].doc_type
+    object_id = instance.pk
+    transaction.on_commit(lambda: remove_objects(doc_type, [object_id]))
+
+
+for model in MODEL_DOCUMENT_TYPES:
+    post_save.connect(update_search_document, sender=model,
+                      dispatch_uid=f"search_update_{model._meta.label_lower}")
+    post_delete.connect(remove_search_document, sender=model,
+                        dispatch_uid=f"search_remove_{model._meta.label_lower}")
+
+
+@receiver(m2m_changed, sender=Course.teachers.through)
+def update_course_teachers(sender, instance, action, reverse, pk_set, **kwargs):
+    """Course documents contain the names of their teachers"""
+    if action == 'pre_clear' and reverse:
+        # The cleared courses are unknown after the clear
+        instance._search_cleared_courses = list(
+            instance.teaching_courses.values_list('id', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        course_ids = [instance.pk]
+    elif action == 'post_clear':
+        course_ids = getattr(instance, '_search_cleared_courses', [])
+    else:
+        course_ids = pk_set
+    schedule_index_update('course', course_ids)
+
+
+@receiver(post_save, sender=Teacher)
+def update_teacher_courses(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields and not {'first_name', 'last_name'} & set(update_fields)):
+        return
+    schedule_index_update(
+        'course', instance.teaching_courses.values_list('id', flat=True))
+
+
+def refresh_autocomplete(sender, update_fields=None, **kwargs):
+    if update_fields and not AUTOCOMPLETE_FIELDS & set(update_fields):
+        return
+    transaction.on_commit(invalidate_autocomplete_index)
+
+
+for model in [*MODEL_DOCUMENT_TYPES, Teacher]:
+    post_save.connect(refresh_autocomplete, sender=model,
+                      dispatch_uid=f"autocomplete_save_{model._meta.label_lower}")
+    post_delete.connect(refresh_autocomplete, sender=model,
+                        dispatch_uid=f"autocomplete_delete_{model._meta.label_lower}")
+
+
+@receiver(m2m_changed, sender=Course.teachers.through)
+def refresh_autocomplete_teachers(sender, action, **kwargs):
+    # Teachers are suggested while they have a visible course
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(invalidate_autocomplete_index)
@@ -0,0 +1,101 @@
+from django.test import TestCase
+
+from core.testing import CatalogDataMixin
+from .autocomplete import invalidate_autocomplete_index
+from .index import rebuild_index, search, update_objects
+from .normalization import normalize, tokenize
+
+
+class NormalizationTests(TestCase):
+
+    def test_arabic_letters_and_digits_are_folded(self):
+        self.assertEqual(normalize('كتاب پايتون ۱۲'), normalize('کتاب پایتون 12'))
+
+    def test_zero_width_non_joiner_words(self):
+        # The joined word and its parts are indexed
+        self.assertEqual(tokenize('کتاب‌ها'), ['کتابها', 'کتاب', 'ها'])
+
+
+class SearchTests(CatalogDataMixin, TestCase):
+
+    def setUp(self):
+        # Changes made inside test transactions never reach the on_commit
+        # updates, the tests rebuild the index instead
+        rebuild_index()
+
+    def test_ranking_and_filters(self):
+        course = self.courses[0]
+        course.title = 'آموزش برنامه‌نویسی پایتون'
+        course.save()
+        self.posts[0].title = 'کتاب پایتون'
+        self.posts[0].save()
+        rebuild_index()
+
+        self.assertEqual(search('پايتون', ['course']), [('course', course.id)])
+        self.assertEqual(search('برنامه نویسی'), [('course', course.id)])
+        # Prefixes match longer words
+        self.assertEqual(search('پای', ['post']), [('post', self.posts[0].id)])
+
+        course.status = 'draft'
+        course.save()
+        update_objects('course', [course.id])
+        self.assertEqual(search('پایتون'), [('post', self.posts[0].id)])
+
+    def test_only_the_last_word_matches_as_a_prefix(self):
+        course = self.courses[0]
+        course.title = 'Advanced Kubernetes'
+        course.save()
+        update_objects('course', [course.id])
+
+        self.assertEqual(search('advanced kube', ['course']), [('course', course.id)])
+        # Words before the last one are complete
+        self.assertEqual(search('kube advanced', ['course']), [])
+        self.assertEqual(search('kubernetes advanced', ['course']), [('course', course.id)])
+
+    def test_list_views_search(self):
+        course = self.courses[1]
+        self.teacher.first_name = 'Rumi'
+        self.teacher.save()
+        rebuild_index()
+        response = self.client.get('/api/v1/courses/?search=rumi')
+        self.assertEqual(
+            {item['id'] for item in response.json()['results']['content']},
+            {c.id for c in self.courses})
+
+        course.title = 'Django Rumi'
+        course.save()
+        update_objects('course', [course.id])
+        response = self.client.get('/api/v1/courses/?search=django rumi&paging=cursor')
+        self.assertEqual(
+            [item['id'] for item in response.json()['results']['content']], [course.id])
+
+        response = self.client.get(f"/api/v1/blog/?search={self.posts[2].title}")
+        self.assertEqual(
+            [post['id'] for post in response.json()['posts']], [self.posts[2].id])
+
+
+class AutocompleteTests(CatalogDataMixin, TestCase):
+
+    def test_suggestions(self):
+        course = self.courses[2]
+        course.title = 'آموزش برنامه\u200cنویسی'
+        course.enrollment_count = 5
+        course.save()
+        invalidate_autocomplete_index()
+        url = '/api/v1/search/autocomplete/'
+
+        response = self.client.get(url, {'q': 'برنامه نو'})
+        self.assertEqual(
+            [(item['type'], item['id']) for item in response.json()['results']],
+            [('course', course.id)])
+
+        # Titles starting with the query first, then the most popular
+        response = self.client.get(url, {'q': 'cour', 'limit': 2})
+        self.assertEqual(
+            [item['id'] for item in response.json()['results']],
+            [course.id, self.courses[0].id])
+        response = self.client.get(url, {'q': 'teacher o'})
+        self.assertEqual(response.json()['results'][0]['slug'], self.teacher.slug)
+
+        with self.assertNumQueries(0):
+            self.client.get(url, {'q': 'post'})
@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import AutocompleteView
+
+app_name = 'search'
+
+urlpatterns = [
+    path('autocomplete/', AutocompleteView.as_view(), name='autocomplete'),
+]
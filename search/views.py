@@ -0,0 +1,26 @@
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .autocomplete import MAX_SUGGESTIONS, get_autocomplete_index
+
+
+class AutocompleteView(APIView):
+    """Search-as-you-type suggestions of courses, roadmaps, teachers and posts"""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    default_limit = 8
+
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        limit = max(1, min(limit, MAX_SUGGESTIONS))
+
+        return Response({
+            'query': query,
+            'results': get_autocomplete_index().suggest(query, limit),
+        }, status=status.HTTP_200_OK)
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-17 06:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0003_alter_subscriptionplan_description'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usersubscription',
+            index=models.Index(fields=['user', 'is_active', 'end_date'], name='usersub_user_active_end_idx'),
+        ),
+    ]
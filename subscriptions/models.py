@@ -94,6 +94,11 @@ class UserSubscription(models.Model):
     class Meta:
         verbose_name = 'اشتراک کاربر'
         verbose_name_plural = 'اشتراک‌های کاربر'
+        indexes = [
+            # Active subscriptions of a user: is_active=True, end_date__gt=now
+            models.Index(fields=['user', 'is_active', 'end_date'],
+                         name='usersub_user_active_end_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.subscription_plan.name}"